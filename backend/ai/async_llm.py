@@ -0,0 +1,95 @@
+"""Async LLM execution on one shared event loop per process.
+
+Chunk fan-out in question and code generation used to start a 16-thread
+pool per call, each thread blocking on a socket. Instead, coroutines are run
+on a single background event loop with an async client, and a process-wide
+semaphore bounds how many LLM requests are in flight at once. Synchronous
+code (the Django views) calls ``run_sync`` and blocks only its own thread.
+Requests themselves are made by ``ai.llm.achat``.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+import httpx
+from openai import AsyncOpenAI
+from django.conf import settings
+
+_state = {'loop': None, 'thread': None, 'client': None, 'semaphore': None}
+_state_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _state_lock
+    _state.update(loop=None, thread=None, client=None, semaphore=None)
+    _state_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its thread on first use."""
+    loop = _state['loop']
+    if loop is not None and _state['thread'].is_alive():
+        return loop
+    with _state_lock:
+        if _state['loop'] is None or not _state['thread'].is_alive():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name='llm-event-loop', daemon=True)
+            thread.start()
+            _state.update(loop=loop, thread=thread, client=None, semaphore=None)
+        return _state['loop']
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedule ``coro`` on the shared loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro, timeout: float = None):
+    """Run ``coro`` on the shared loop and block until it returns."""
+    return submit(coro).result(timeout)
+
+
+def get_async_client() -> AsyncOpenAI:
+    # Only called from the loop thread, so no locking is needed
+    if _state['client'] is None:
+        base_url = getattr(settings, 'LLM_BASE_URL', "https://api.deepseek.com")
+        timeout = httpx.Timeout(
+            getattr(settings, 'LLM_TIMEOUT', 120),
+            connect=getattr(settings, 'LLM_CONNECT_TIMEOUT', 10)
+        )
+        _state['client'] = AsyncOpenAI(
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            base_url=base_url,
+            timeout=timeout,
+            # Retries happen in ai.llm, behind the rate limiter and circuit breaker
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                base_url=base_url,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=getattr(settings, 'LLM_POOL_MAX_CONNECTIONS', 64),
+                    max_keepalive_connections=getattr(settings, 'LLM_POOL_MAX_KEEPALIVE', 32),
+                    keepalive_expiry=getattr(settings, 'LLM_KEEPALIVE_EXPIRY', 60),
+                ),
+            ),
+        )
+    return _state['client']
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    if _state['semaphore'] is None:
+        _state['semaphore'] = asyncio.Semaphore(getattr(settings, 'LLM_MAX_CONCURRENCY', 32))
+    return _state['semaphore']
+
+
+def gather_sync(coros, timeout: float = None) -> list:
+    """Run coroutines concurrently on the shared loop and return their results in order."""
+    async def gather():
+        return await asyncio.gather(*coros)
+    return run_sync(gather(), timeout)
@@ -0,0 +1,188 @@
+import re
+import zlib
+from functools import lru_cache
+
+from .constants import (
+    SUMMARIZATION_MODEL, BART_CHUNK_TOKENS, LLM_CHUNK_TOKENS, CHARS_PER_TOKEN,
+    CHUNK_MIN_FILL, CHUNK_BREAK_EVERY
+)
+
+# Token budget and tokenizer for every model we chunk text for. The chat LLM
+# has no local tokenizer, so its tokens are estimated from character counts.
+CHUNK_TARGETS = {
+    'bart': {'tokenizer': SUMMARIZATION_MODEL, 'max_tokens': BART_CHUNK_TOKENS},
+    'llm': {'tokenizer': None, 'max_tokens': LLM_CHUNK_TOKENS},
+}
+
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str):
+    """Return a cached fast tokenizer, or None if it cannot be loaded."""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(name, use_fast=True)
+    except Exception as e:
+        print(f"Could not load tokenizer '{name}', estimating tokens: {str(e)}")
+        return None
+
+
+def _token_counter(target: str):
+    """Return a function mapping a list of strings to their token counts."""
+    name = CHUNK_TARGETS[target]['tokenizer']
+    tokenizer = get_tokenizer(name) if name else None
+    if tokenizer is None:
+        return lambda texts: [max(1, -(-len(t) // CHARS_PER_TOKEN)) for t in texts]
+
+    def count(texts):
+        if not texts:
+            return []
+        encoded = tokenizer(list(texts), add_special_tokens=False)['input_ids']
+        return [len(ids) for ids in encoded]
+    return count
+
+
+def count_tokens(text: str, target: str = 'bart') -> int:
+    return _token_counter(target)([text])[0]
+
+
+def _split_long_sentence(sentence: str, tokens: int, max_tokens: int) -> list:
+    """Split a sentence that is over budget on word boundaries."""
+    words = sentence.split()
+    parts = -(-tokens // max_tokens)
+    per_part = -(-len(words) // parts)
+    return [' '.join(words[i:i + per_part]) for i in range(0, len(words), per_part)]
+
+
+def _units(text: str, count, max_tokens: int, continues_paragraph: bool = False):
+    """Yield (sentence, tokens, starts_paragraph) units under budget.
+
+    With ``continues_paragraph`` the first paragraph of ``text`` is the rest
+    of one that started in earlier text.
+    """
+    first_paragraph = True
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        sentences = _SENTENCE_SPLIT.split(paragraph)
+        first = not (continues_paragraph and first_paragraph)
+        first_paragraph = False
+        for sentence, tokens in zip(sentences, count(sentences)):
+            if tokens > max_tokens:
+                pieces = _split_long_sentence(sentence, tokens, max_tokens)
+                piece_tokens = count(pieces)
+            else:
+                pieces, piece_tokens = [sentence], [tokens]
+            for piece, piece_count in zip(pieces, piece_tokens):
+                yield piece, piece_count, first
+                first = False
+
+
+def _join(units: list) -> str:
+    out = []
+    for sentence, _, starts_paragraph in units:
+        if out:
+            out.append('\n\n' if starts_paragraph else ' ')
+        out.append(sentence)
+    return ''.join(out)
+
+
+def _is_break(unit) -> bool:
+    """Whether a chunk may end before ``unit``, decided by its content alone."""
+    sentence, _, starts_paragraph = unit
+    return starts_paragraph or zlib.crc32(sentence.encode('utf-8')) % CHUNK_BREAK_EVERY == 0
+
+
+def _pack(units, max_tokens: int, overlap_tokens: int):
+    """Pack units into chunks of at most ``max_tokens``, yielding each when it ends.
+
+    A chunk ends at the first content-defined break (see ``_is_break``)
+    after it holds CHUNK_MIN_FILL of the budget, or when the next unit
+    would not fit. Boundaries therefore depend on the text around them
+    rather than on everything before, and chunks after an edit come out the
+    same as before it, so their cached summaries are reused.
+    """
+    min_tokens = int(max_tokens * CHUNK_MIN_FILL)
+    current, current_tokens, new_tokens = [], 0, 0
+    for unit in units:
+        # One token of slack per unit for the whitespace joining sentences
+        full = current_tokens + unit[1] + 1 > max_tokens
+        # Overlap carried from the previous chunk doesn't count towards the fill
+        if current and (full or (new_tokens >= min_tokens and _is_break(unit))):
+            yield _join(current)
+            carried, carried_tokens = [], 0
+            for previous in reversed(current):
+                if carried_tokens + previous[1] + 1 > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[1] + 1
+            while carried and carried_tokens + unit[1] + 1 > max_tokens:
+                carried_tokens -= carried.pop(0)[1] + 1
+            current, current_tokens, new_tokens = carried, carried_tokens, 0
+        current.append(unit)
+        current_tokens += unit[1] + 1
+        new_tokens += unit[1] + 1
+    if current:
+        yield _join(current)
+
+
+def chunk_text(text: str, target: str = 'bart', max_tokens: int = None, overlap_tokens: int = 0) -> list:
+    """Split text into chunks within the token budget of ``target``.
+
+    Whole sentences are packed into each chunk, keeping paragraph breaks,
+    until a content-defined break point once it holds CHUNK_MIN_FILL of
+    the budget, or until the next sentence would exceed ``max_tokens``. With
+    ``overlap_tokens`` the trailing sentences of a chunk (up to that many
+    tokens) are repeated at the start of the next one for context.
+    """
+    if not text or not text.strip():
+        return []
+    max_tokens = max_tokens or CHUNK_TARGETS[target]['max_tokens']
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    return list(_pack(_units(text, _token_counter(target), max_tokens), max_tokens, overlap_tokens))
+
+
+def _last_match(pattern, text: str):
+    match = None
+    for match in pattern.finditer(text):
+        pass
+    return match
+
+
+def _stream_units(pieces, count, max_tokens: int, window_chars: int):
+    buffer, continues = "", False
+    for piece in pieces:
+        buffer += piece
+        # Everything before the last paragraph break is complete
+        match = _last_match(_PARAGRAPH_SPLIT, buffer)
+        if match:
+            yield from _units(buffer[:match.start()], count, max_tokens, continues)
+            buffer, continues = buffer[match.end():], False
+        if len(buffer) > window_chars:
+            # A paragraph longer than the window is cut after its last
+            # complete sentence, or at the last whitespace if it has none
+            match = _last_match(_SENTENCE_SPLIT, buffer) or _last_match(_WHITESPACE, buffer)
+            if match:
+                yield from _units(buffer[:match.start()], count, max_tokens, continues)
+                buffer, continues = buffer[match.end():], True
+    yield from _units(buffer, count, max_tokens, continues)
+
+
+def iter_chunks(pieces, target: str = 'bart', max_tokens: int = None, overlap_tokens: int = 0,
+                window_chars: int = None):
+    """Lazily chunk text arriving as an iterable of ``pieces`` (pages, paragraphs...).
+
+    Yields the same chunks as ``chunk_text(''.join(pieces))``, each as soon
+    as it is full, holding on to at most about ``window_chars`` characters
+    of unchunked text. Only paragraphs longer than the window may be split
+    differently.
+    """
+    max_tokens = max_tokens or CHUNK_TARGETS[target]['max_tokens']
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    window_chars = window_chars or max_tokens * CHARS_PER_TOKEN * 4
+    units = _stream_units(pieces, _token_counter(target), max_tokens, window_chars)
+    yield from _pack(units, max_tokens, overlap_tokens)
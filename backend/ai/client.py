@@ -1,12 +1,90 @@
 import os
+import threading
+
+import httpx
 from openai import OpenAI
 from django.conf import settings
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_ai_client():
+# One client per process and endpoint. OpenAI clients are thread-safe and
+# keep an httpx connection pool, so sharing them lets concurrent calls reuse
+# warm keep-alive connections instead of doing a TLS handshake each time.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Connections inherited from the parent must not be shared with it
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def build_client(base_url: str, api_key: str, verify=True) -> OpenAI:
+    """Create an OpenAI-compatible client with a tuned connection pool."""
+    timeout = httpx.Timeout(
+        getattr(settings, 'LLM_TIMEOUT', 120),
+        connect=getattr(settings, 'LLM_CONNECT_TIMEOUT', 10)
+    )
+    http_client = httpx.Client(
+        base_url=base_url,
+        timeout=timeout,
+        verify=verify,
+        limits=httpx.Limits(
+            max_connections=getattr(settings, 'LLM_POOL_MAX_CONNECTIONS', 64),
+            max_keepalive_connections=getattr(settings, 'LLM_POOL_MAX_KEEPALIVE', 32),
+            keepalive_expiry=getattr(settings, 'LLM_KEEPALIVE_EXPIRY', 60),
+        ),
+    )
     return OpenAI(
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url="https://api.deepseek.com"
-    )
\ No newline at end of file
+        api_key=api_key,
+        base_url=base_url,
+        timeout=timeout,
+        # Retries happen in ai.llm, behind the rate limiter and circuit breaker
+        max_retries=0,
+        http_client=http_client,
+    )
+
+
+def llm_timeout(purpose: str) -> float:
+    """Per-request timeout in seconds for a kind of LLM call, from LLM_TIMEOUTS."""
+    timeouts = getattr(settings, 'LLM_TIMEOUTS', {})
+    return timeouts.get(purpose, getattr(settings, 'LLM_TIMEOUT', 120))
+
+
+def get_ai_client(timeout: float = None) -> OpenAI:
+    """Return the shared LLM client of this process.
+
+    ``timeout`` (seconds) applies to requests made through the returned
+    client; it shares the connection pool of the process-wide client.
+    """
+    base_url = getattr(settings, 'LLM_BASE_URL', "https://api.deepseek.com")
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    key = (os.getpid(), base_url, api_key)
+
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = build_client(base_url, api_key)
+                _clients[key] = client
+
+    if timeout is not None:
+        return client.with_options(timeout=timeout)
+    return client
+
+
+def close_ai_clients():
+    """Close the pooled connections of every client created by this process."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
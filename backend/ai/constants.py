@@ -9,6 +9,22 @@ CODE_DIFFICULTIES = ["E", "M", "H"]  # Easy, Medium, Hard
 QUESTIONS_PER_LEVEL = 2
 MAX_CHUNK_SIZE = 4000
 
+SUMMARIZATION_MODEL = "facebook/bart-large-cnn"
+# Small CPU sentence-embedding model used to pre-grade open answers
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Token budgets per chunk. BART accepts 1024 tokens including special tokens;
+# the chat LLM budget keeps prompts the size MAX_CHUNK_SIZE used to produce.
+CHARS_PER_TOKEN = 4
+BART_CHUNK_TOKENS = 1000
+LLM_CHUNK_TOKENS = MAX_CHUNK_SIZE // CHARS_PER_TOKEN
+# Chunks end at content-defined points so an edit early in a document does
+# not move every later boundary: once a chunk holds CHUNK_MIN_FILL of its
+# budget, it ends before the next paragraph or before a sentence whose hash
+# is divisible by CHUNK_BREAK_EVERY.
+CHUNK_MIN_FILL = 0.75
+CHUNK_BREAK_EVERY = 8
+
 DISTRIBUTIONS = {
    'Beginner': {'true_false': 40, 'choice': 30, 'multiple_choice': 20, 'open': 10},
    'Base Knowledge': {'true_false': 30, 'choice': 35, 'multiple_choice': 25, 'open': 10},
@@ -65,6 +81,9 @@ Material Excerpt:
 {chunk}
 """
 
+# Bump when ANSWER_COMPARISON_TEMPLATE changes so cached grades are not reused
+GRADING_PROMPT_VERSION = 1
+
 ANSWER_COMPARISON_TEMPLATE = """
 Compare a user's answer with the correct answer and determine if they are semantically equivalent.
 
@@ -81,6 +100,34 @@ Rules for comparison:
 Please only return true or false, nothing more (all lowercase)
 """
 
+# Bump when BATCH_ANSWER_COMPARISON_TEMPLATE or BATCH_ANSWER_ITEM_TEMPLATE
+# changes; batch verdicts are cached apart from single-prompt ones
+BATCH_GRADING_PROMPT_VERSION = 1
+
+BATCH_ANSWER_COMPARISON_TEMPLATE = """
+Compare each user's answer with its correct answer and determine if they are semantically equivalent.
+
+Rules for comparison:
+   - Focus on key concepts and main ideas
+   - Ignore minor grammatical differences
+   - Accept different phrasings that convey the same meaning
+   - Be somewhat lenient but ensure core understanding is demonstrated
+   - Judge every item on its own
+
+Items:
+{items}
+
+Return exactly one line per item, in the form number|verdict, where verdict is true or false (all lowercase), nothing more.
+
+example output:
+1|true
+2|false
+"""
+
+BATCH_ANSWER_ITEM_TEMPLATE = """{index}.
+- Correct Answer: {answer}
+- User's Answer: {user_answer}"""
+
 CODE_COMPARISON_TEMPLATE = """
 Compare a user's code solution with the expected solution, using the problem statement as the primary evaluation guide.
 
@@ -159,8 +206,13 @@ Format each challenge as:
 Problem Statement: [Clear, specific task]
 Solution: [Complete, working code]
 Template: [Starter code with TODO]
+Tests: [3 to 6 lines of: expression calling the solution => expected result as a JSON literal]
 Difficulty: [One of: {difficulties}]
 
+Tests are run automatically against the user's code, so each expression must be a single
+{programming_language} expression that only uses names defined by the template, and the expected
+result must be valid JSON (true/false/null, numbers, "strings", [lists], {{objects}}).
+
 (Output difficulty onlt as it is: E|M|H)
 
 Separate challenges with '=============='
@@ -171,20 +223,61 @@ Material Context:
 Example:
 Problem Statement: Implement a function to validate email addresses
 Solution:
-Class Solution:
+class Solution:
    def validate_email(self, email):
       import re
       pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
       return bool(re.match(pattern, email))
 Template:
-Class Solution:
+class Solution:
    def validate_email(self, email):
       # TODO: Implement email validation
       pass
+Tests:
+Solution().validate_email("user@example.com") => true
+Solution().validate_email("user.name@mail.example.org") => true
+Solution().validate_email("invalid-email") => false
+Solution().validate_email("") => false
 Difficulty: E
 ==============
 """
 
+CODE_DIFFICULTY_NAMES = {"E": "Easy", "M": "Medium", "H": "Hard"}
+
+CODE_GENERATION_JSON_TEMPLATE = """
+Generate {num_codes} {difficulty_name} coding challenges for {programming_language}.
+
+Requirements:
+1. Each challenge must be practical and testable
+2. Include edge cases and error handling
+3. Focus on real-world applications
+4. In problem statements, when you mention function names, classes, attributes, etc., wrap them in `backticks`.
+Also wrap titles if any with * (like *amazing*).
+5. Make some sections like Description, Requirements, Input, Output, etc. (Do not wrap them with anything, just make them in new lines)
+6. The template is the solution with the bodies to implement replaced by TODO comments
+7. Give 3 to 6 tests per challenge. Each "call" is a single {programming_language} expression that only uses
+names defined by the template; "expected" is the JSON value it must return.
+{avoid}
+Return a JSON object in exactly this shape:
+{{"problems": [{{"problem_statement": "...", "solution": "...", "template": "...",
+  "tests": [{{"call": "...", "expected": ...}}]}}]}}
+
+Material Context:
+{chunk}
+"""
+
+CODE_HINT_TEMPLATE = """
+A student's {programming_language} solution failed some automated tests. Give a short hint that helps them
+find the problem without giving away the solution.
+
+Problem Statement: {problem_statement}
+User's Solution: {user_solution}
+Failed tests:
+{failures}
+
+Return only the hint, at most 3 sentences.
+"""
+
 CODE_SUMMARY_TEMPLATE = """
 Create a programming-focused summary for {language} challenges.
 Extract:
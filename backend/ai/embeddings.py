@@ -0,0 +1,156 @@
+"""Sentence embeddings for pre-grading open answers on the CPU.
+
+Most open answers are clearly right or clearly wrong. Before an answer
+goes to the LLM, the reference and student answers are embedded and their
+cosine similarity is compared with two thresholds:
+
+- at or above GRADING_EMBEDDING_ACCEPT the answer is marked correct,
+- at or below GRADING_EMBEDDING_REJECT it is marked wrong,
+- anything in between is escalated to the LLM.
+
+Reference embeddings are stored on the ``Question`` and all missing
+embeddings of a quiz are computed in one batched forward pass. Short
+reference answers ("O(n)", "TCP") are always escalated, because embeddings
+barely tell them apart from near misses.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+
+from api.models import Question
+from .constants import EMBEDDING_MODEL
+from .model_manager import model_manager
+from .summary_cache import normalize_text
+
+
+class SentenceEmbedder:
+    """Mean-pooled, L2-normalized embeddings from a transformers encoder."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name, torch_dtype=torch.float32)
+        self.model.eval()
+
+    def encode(self, texts: list, batch_size: int = 64):
+        """Return a float32 numpy array of shape (len(texts), dim)."""
+        import numpy as np
+        import torch
+
+        vectors = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                batch = self.tokenizer(
+                    texts[start:start + batch_size], padding=True, truncation=True,
+                    max_length=256, return_tensors='pt')
+                hidden = self.model(**batch).last_hidden_state
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+                vectors.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+        return np.concatenate(vectors).astype(np.float32)
+
+
+model_manager.register(EMBEDDING_MODEL, lambda: SentenceEmbedder(EMBEDDING_MODEL))
+
+
+def embedding_key(answer: str) -> str:
+    payload = f"{EMBEDDING_MODEL}\n{normalize_text(answer)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PreGrader:
+    """Decides open answers by embedding similarity and counts what it saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {'accepted': 0, 'rejected': 0, 'escalated': 0, 'errors': 0}
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'GRADING_EMBEDDING_ENABLED', True)
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._stats[name] += amount
+
+    def pregrade(self, items: list):
+        """Split ``items`` of (Question, user_answer) into decided and escalated.
+
+        Returns ``({question_pk: bool}, [(question, user_answer), ...])``.
+        """
+        if not items or not self.enabled:
+            return {}, list(items)
+
+        min_words = getattr(settings, 'GRADING_EMBEDDING_MIN_WORDS', 4)
+        candidates = [(question, user_answer) for question, user_answer in items
+                      if len(question.answer.split()) >= min_words]
+        escalated = [(question, user_answer) for question, user_answer in items
+                     if len(question.answer.split()) < min_words]
+        if not candidates:
+            self._count(escalated=len(escalated))
+            return {}, escalated
+
+        try:
+            similarities = self._similarities(candidates)
+        except Exception as e:
+            print(f"Embedding pre-grading failed, escalating to the LLM: {str(e)}")
+            self._count(errors=1, escalated=len(items))
+            return {}, list(items)
+
+        accept = getattr(settings, 'GRADING_EMBEDDING_ACCEPT', 0.85)
+        reject = getattr(settings, 'GRADING_EMBEDDING_REJECT', 0.35)
+        decided = {}
+        for (question, user_answer), similarity in zip(candidates, similarities):
+            if similarity >= accept:
+                decided[question.pk] = True
+            elif similarity <= reject:
+                decided[question.pk] = False
+            else:
+                escalated.append((question, user_answer))
+
+        accepted = sum(decided.values())
+        self._count(accepted=accepted, rejected=len(decided) - accepted, escalated=len(escalated))
+        return decided, escalated
+
+    def _similarities(self, items: list) -> list:
+        """Cosine similarity of each answer pair, with one encoder call per quiz."""
+        import numpy as np
+
+        stale = []
+        for question, _ in items:
+            key = embedding_key(question.answer)
+            if question.answer_embedding is None or question.answer_embedding_key != key:
+                question.answer_embedding_key = key
+                stale.append(question)
+
+        texts = [question.answer for question in stale]
+        texts += [" ".join(a) if isinstance(a, list) else str(a) for _, a in items]
+        vectors = model_manager.get(EMBEDDING_MODEL).encode(texts)
+
+        for question, vector in zip(stale, vectors[:len(stale)]):
+            question.answer_embedding = vector.tobytes()
+        if stale:
+            Question.objects.bulk_update(stale, ['answer_embedding', 'answer_embedding_key'])
+
+        references = np.stack([
+            np.frombuffer(bytes(question.answer_embedding), dtype=np.float32)
+            for question, _ in items
+        ])
+        answers = vectors[len(stale):]
+        return (references * answers).sum(axis=1).tolist()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            decided = self._stats['accepted'] + self._stats['rejected']
+            total = decided + self._stats['escalated']
+            return {
+                **self._stats,
+                'llm_calls_avoided': decided / total if total else 0.0,
+                'enabled': self.enabled,
+            }
+
+
+pregrader = PreGrader()
@@ -0,0 +1,77 @@
+"""Whole-quiz grading.
+
+Closed question types have canonical answers ("a", "a,c", "True"), so they
+are graded here without any model call. Open questions are first
+pre-graded by embedding similarity (``ai.embeddings``) and only the
+ambiguous ones go to the LLM through ``ai.services.grade_open_answers``.
+"""
+import re
+
+from .embeddings import pregrader
+from .services import grade_open_answers
+
+CLOSED_QUESTION_TYPES = ('choice', 'multiple_choice', 'true_false')
+
+_OPTION_SEPARATORS = re.compile(r'[,|;\s]+')
+
+
+def normalize_options(answer) -> frozenset:
+    """Turn "a, c", "c|a" or ["A", "c)"] into {'a', 'c'}."""
+    if isinstance(answer, (list, tuple)):
+        answer = ",".join(str(part) for part in answer)
+    options = (option.strip().strip(').').casefold()
+               for option in _OPTION_SEPARATORS.split(str(answer or "")))
+    return frozenset(option for option in options if option)
+
+
+def grade_closed_answer(question_type: str, answer: str, user_answer) -> bool:
+    """Order-insensitive exact match of the chosen options against ``answer``."""
+    expected = normalize_options(answer)
+    given = normalize_options(user_answer)
+    if question_type in ('choice', 'true_false') and len(given) != 1:
+        return False
+    return bool(expected) and given == expected
+
+
+def grade_quiz(questions: list, user_answers: dict, use_cache: bool = True) -> dict:
+    """Grade every question of a quiz and compute the score.
+
+    ``user_answers`` maps question id to the submitted answer; missing
+    answers count as wrong. Returns ``{'score': 0-100, 'correct': n,
+    'total': n, 'results': [{'id', 'question_type', 'is_correct'}, ...]}``.
+    """
+    results = {}
+    open_questions = []
+    for question in questions:
+        user_answer = user_answers.get(question.pk)
+        if question.question_type in CLOSED_QUESTION_TYPES:
+            results[question.pk] = grade_closed_answer(
+                question.question_type, question.answer, user_answer)
+        elif not user_answer:
+            results[question.pk] = False
+        else:
+            open_questions.append((question, user_answer))
+
+    decided, open_questions = pregrader.pregrade(open_questions)
+    results.update(decided)
+
+    if open_questions:
+        grades = grade_open_answers(
+            [(question.answer, user_answer) for question, user_answer in open_questions],
+            use_cache=use_cache)
+        for (question, _), grade in zip(open_questions, grades):
+            verdict = grade['is_correct']
+            results[question.pk] = verdict if isinstance(verdict, bool) else verdict.strip().lower() == 'true'
+
+    correct = sum(results.values())
+    total = len(questions)
+    return {
+        'score': round(correct / total * 100, 2) if total else 0,
+        'correct': correct,
+        'total': total,
+        'results': [
+            {'id': question.pk, 'question_type': question.question_type,
+             'is_correct': results[question.pk]}
+            for question in questions
+        ],
+    }
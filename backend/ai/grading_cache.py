@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .constants import BATCH_GRADING_PROMPT_VERSION, GRADING_PROMPT_VERSION
+from .summary_cache import normalize_text
+
+PROMPT_VERSIONS = {
+    'single': GRADING_PROMPT_VERSION,
+    'batch': BATCH_GRADING_PROMPT_VERSION,
+}
+
+
+def make_key(answer: str, user_answer: str, template: str = 'single') -> str:
+    """Hash of the normalized answer pair and the prompt ``template`` ("single"
+    or "batch") that graded it; case and layout don't change the grade."""
+    payload = json.dumps({
+        'template': template,
+        'prompt_version': PROMPT_VERSIONS[template],
+        'answer': normalize_text(answer).casefold(),
+        'user_answer': normalize_text(user_answer).casefold(),
+    }, sort_keys=True)
+    return 'grading:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GradingCache:
+    """Open-answer grades stored in the Django cache named by GRADING_CACHE_ALIAS.
+
+    Expiry and eviction are left to the backend: entries live for
+    GRADING_CACHE_TTL seconds, and the ``grading`` cache in settings bounds
+    its size (LocMemCache evicts least recently used entries). Cache errors
+    never fail grading; the lookup counts as a miss instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'bypasses': 0, 'errors': 0}
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'GRADING_CACHE_ENABLED', True)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'GRADING_CACHE_TTL', 7 * 24 * 60 * 60)
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, 'GRADING_CACHE_ALIAS', 'default')]
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key, *fallbacks):
+        """The grade cached under ``key``, else under the first of ``fallbacks`` holding one."""
+        if not self.enabled:
+            return None
+        try:
+            if fallbacks:
+                found = self.backend.get_many([key, *fallbacks])
+                value = next((found[k] for k in (key, *fallbacks) if found.get(k) is not None), None)
+            else:
+                value = self.backend.get(key)
+        except Exception as e:
+            print(f"Grading cache lookup failed: {str(e)}")
+            self._count('errors')
+            value = None
+        self._count('misses' if value is None else 'hits')
+        return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            print(f"Grading cache write failed: {str(e)}")
+            self._count('errors')
+            return
+        self._count('writes')
+
+    def record_bypass(self):
+        self._count('bypasses')
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+                'enabled': self.enabled,
+            }
+
+
+grading_cache = GradingCache()
@@ -0,0 +1,282 @@
+"""Durable job queue backed by the ``BackgroundJob`` table.
+
+The web tier calls ``enqueue``; worker processes (see ``ai.worker``) claim
+queued jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several workers
+never pick the same row, run the registered handler and store its result.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import BackgroundJob
+
+_handlers = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by handlers for failures that retrying cannot fix."""
+
+
+def register_handler(kind):
+    """Decorator registering ``func(job)`` as the handler for ``kind`` jobs.
+
+    The handler returns a JSON-serializable result stored on the job.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def get_handler(kind):
+    return _handlers.get(kind)
+
+
+def enqueue(kind: str, payload: dict, timeout: int = None, max_attempts: int = None) -> BackgroundJob:
+    return BackgroundJob.objects.create(
+        kind=kind,
+        payload=payload,
+        timeout_seconds=timeout or getattr(settings, 'AI_JOB_TIMEOUT', 30 * 60),
+        max_attempts=max_attempts or getattr(settings, 'AI_JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def claim_next(worker_id: str, kinds=None, job_id=None):
+    """Lock the oldest queued job, mark it running for ``worker_id`` and return it.
+
+    ``job_id`` claims that specific job instead, if it is still queued.
+    """
+    with transaction.atomic():
+        queryset = BackgroundJob.objects.select_for_update(
+            skip_locked=True).filter(status='Q')
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        if job_id is not None:
+            queryset = queryset.filter(pk=job_id)
+        job = queryset.order_by('created_at').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        job.status = 'R'
+        job.attempts += 1
+        job.worker_id = worker_id
+        job.started_at = now
+        job.heartbeat_at = now
+        job.error = ""
+        job.save(update_fields=['status', 'attempts', 'worker_id', 'started_at',
+                                'heartbeat_at', 'error', 'updated_at'])
+        return job
+
+
+def heartbeat(job_id):
+    BackgroundJob.objects.filter(pk=job_id, status='R').update(heartbeat_at=timezone.now())
+
+
+def set_progress(job, stage: str, progress: int) -> bool:
+    """Report how far a running job got, e.g. ``set_progress(job, 'extracting', 10)``."""
+    return _finish(job, stage=stage, progress=progress)
+
+
+def _finish(job, **fields) -> bool:
+    """Apply ``fields`` to a running job only if ``job.worker_id`` still owns it.
+
+    Guards against a worker that was presumed dead (and whose job was
+    recovered) writing over the job after it was re-queued.
+    """
+    fields['updated_at'] = timezone.now()
+    updated = BackgroundJob.objects.filter(
+        pk=job.pk, status='R', worker_id=job.worker_id).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return bool(updated)
+
+
+def complete(job, result) -> bool:
+    return _finish(job, status='D', result=result, progress=100, finished_at=timezone.now())
+
+
+def fail(job, error: str, retry: bool = True) -> bool:
+    """Record a failure; the job is re-queued while it has attempts left."""
+    if retry and job.attempts < job.max_attempts:
+        return _finish(job, status='Q', error=error, worker_id="", stage="", progress=0)
+    return _finish(job, status='F', error=error, finished_at=timezone.now())
+
+
+def run_job(job, heartbeat_interval: float = None):
+    """Run the handler for a claimed job and record its outcome.
+
+    With ``heartbeat_interval`` a background thread keeps ``heartbeat_at``
+    fresh so the job is not mistaken for one whose worker died.
+    """
+    handler = get_handler(job.kind)
+    if handler is None:
+        fail(job, f"No handler registered for job kind '{job.kind}'", retry=False)
+        return job
+
+    done = threading.Event()
+    if heartbeat_interval:
+        def beat():
+            while not done.wait(heartbeat_interval):
+                try:
+                    heartbeat(job.pk)
+                except Exception as e:
+                    print(f"Heartbeat for job {job.pk} failed: {str(e)}")
+            connection.close()
+
+        threading.Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True).start()
+
+    try:
+        result = handler(job)
+    except PermanentJobError as e:
+        print(f"Job {job.pk} ({job.kind}) failed permanently: {str(e)}")
+        fail(job, str(e), retry=False)
+        return job
+    except Exception as e:
+        print(f"Job {job.pk} ({job.kind}) failed: {str(e)}")
+        fail(job, str(e))
+        return job
+    finally:
+        done.set()
+    complete(job, result)
+    return job
+
+
+_inline = {'executor': None, 'pid': None, 'pending': set()}
+_inline_lock = threading.Lock()
+
+
+def _inline_executor() -> ThreadPoolExecutor:
+    """This process's executor for inline jobs, AI_INLINE_JOB_WORKERS threads wide."""
+    with _inline_lock:
+        if _inline['executor'] is None or _inline['pid'] != os.getpid():
+            _inline.update(
+                executor=ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'AI_INLINE_JOB_WORKERS', 2),
+                    thread_name_prefix='inline-job',
+                ),
+                pid=os.getpid(),
+                pending=set(),
+            )
+        return _inline['executor']
+
+
+def _retry_delay(job) -> float:
+    return getattr(settings, 'AI_JOB_RETRY_DELAY', 5) * max(job.attempts, 1)
+
+
+def _run_inline(job_id):
+    claimed = None
+    try:
+        claimed = claim_next(f"inline:{os.getpid()}:{threading.get_ident()}", job_id=job_id)
+        if claimed is not None:
+            run_job(claimed, heartbeat_interval=getattr(settings, 'AI_JOB_HEARTBEAT', 15))
+    except Exception as e:
+        print(f"Error running job {job_id} inline: {str(e)}")
+    finally:
+        with _inline_lock:
+            _inline['pending'].discard(job_id)
+        connection.close()
+    if claimed is not None and claimed.status == 'Q':
+        # The retry waits on a timer, not on one of the executor's threads
+        run_in_background(claimed, delay=_retry_delay(claimed))
+
+
+def run_in_background(job, delay: float = 0):
+    """Run ``job`` in this process, after ``delay`` seconds.
+
+    Used when no worker pool is configured, so queued work still starts
+    right away and reports progress through the same job row. Jobs share a
+    bounded executor, so at most AI_INLINE_JOB_WORKERS run at once and the
+    rest wait their turn. No worker would claim a re-queued job, so
+    retryable failures are run again after AI_JOB_RETRY_DELAY seconds per
+    attempt made. A job already waiting or running here is not added twice.
+    """
+    executor = _inline_executor()
+    with _inline_lock:
+        if job.pk in _inline['pending']:
+            return
+        _inline['pending'].add(job.pk)
+    if not delay:
+        executor.submit(_run_inline, job.pk)
+        return
+    timer = threading.Timer(delay, lambda: _inline_executor().submit(_run_inline, job.pk))
+    timer.daemon = True
+    timer.start()
+
+
+_inline_recovery = threading.Event()
+
+
+def _resumable_jobs(recovered) -> list:
+    """Queued jobs nothing is about to run: those just recovered, and those
+    left untouched for longer than their retry delay."""
+    now = timezone.now()
+    return [
+        job for job in BackgroundJob.objects.filter(status='Q').order_by('created_at')
+        if job.pk in recovered or (now - job.updated_at).total_seconds() >= _retry_delay(job)
+    ]
+
+
+def start_inline_recovery():
+    """Without a worker pool, resume jobs that a stopped web process left behind.
+
+    Only runs with AI_INLINE_JOB_RECOVERY on and SUMMARY_QUEUE_ENABLED off;
+    the worker pool recovers jobs itself. A daemon thread runs at startup
+    and every AI_JOB_STALE_AFTER / 2 seconds: it re-queues running jobs that
+    stopped sending heartbeats (``recover_stale_jobs``) and hands those,
+    plus queued jobs idle for longer than their retry delay, to
+    ``run_in_background``. Jobs waiting out a retry delay are left alone.
+    Several web processes may do this at once; claiming a job is exclusive.
+    """
+    if (getattr(settings, 'SUMMARY_QUEUE_ENABLED', False)
+            or not getattr(settings, 'AI_INLINE_JOB_RECOVERY', False)
+            or _inline_recovery.is_set()):
+        return
+    _inline_recovery.set()
+    from ai import tasks  # noqa: F401  registers the job handlers
+
+    interval = getattr(settings, 'AI_JOB_STALE_AFTER', 120) / 2
+
+    def loop():
+        while True:
+            try:
+                recovered = _requeue_stale_jobs()
+                for job in _resumable_jobs(recovered):
+                    run_in_background(job)
+            except Exception as e:
+                print(f"Error recovering background jobs: {str(e)}")
+            finally:
+                connection.close()
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name="job-recovery", daemon=True).start()
+
+
+def _requeue_stale_jobs(stale_after: int = None) -> set:
+    stale_after = timedelta(seconds=stale_after or getattr(settings, 'AI_JOB_STALE_AFTER', 120))
+    now = timezone.now()
+    recovered = set()
+    # Only a handful of jobs run at once (one per worker), so check in Python
+    for job in BackgroundJob.objects.filter(status='R'):
+        if job.started_at and now - job.started_at > timedelta(seconds=job.timeout_seconds):
+            error = "Job timed out"
+        elif job.heartbeat_at is None or now - job.heartbeat_at > stale_after:
+            error = "Worker stopped responding"
+        else:
+            continue
+        if fail(job, error):
+            print(f"Recovered job {job.pk} ({job.kind}): {error}")
+            recovered.add(job.pk)
+    return recovered
+
+
+def recover_stale_jobs(stale_after: int = None) -> int:
+    """Re-queue running jobs whose worker stopped sending heartbeats or that
+    ran past their timeout. Returns the number of jobs recovered."""
+    return len(_requeue_stale_jobs(stale_after))
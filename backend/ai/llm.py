@@ -0,0 +1,338 @@
+"""Central layer for chat completion calls.
+
+Every LLM request goes through ``chat`` (blocking) or ``achat`` (async),
+which apply, per process and shared by all threads and the event loop:
+
+- a token-bucket rate limiter on requests/minute and tokens/minute,
+- jittered exponential retry on 429, 5xx, timeouts and connection errors,
+  honouring ``Retry-After``,
+- a circuit breaker that fails fast with ``LLMUnavailable`` while the
+  provider keeps failing.
+
+Each call site names a policy from LLM_POLICIES that sets its retry budget
+and which LLM_TIMEOUTS entry applies to it.
+"""
+import asyncio
+import random
+import threading
+import time
+
+import openai
+from django.conf import settings
+
+from .client import get_ai_client, llm_timeout
+from .constants import CHARS_PER_TOKEN
+
+DEFAULT_POLICY = {
+    'purpose': 'generation',
+    'max_retries': 3,
+    'base_delay': 1.0,
+    'max_delay': 30.0,
+    'expected_output_tokens': 1000,
+}
+
+
+class LLMUnavailable(Exception):
+    """The provider is failing or throttling and the call was given up."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute``."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount) -> float:
+        """Take ``amount`` tokens and return how long to wait before using them.
+
+        The balance may go negative; later callers then wait longer, which
+        queues them fairly without holding the lock while sleeping.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def reserve(self, estimated_tokens) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real usage is known."""
+        if actual_tokens is None:
+            return
+        if actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+        elif actual_tokens > estimated_tokens:
+            self.tokens.reserve(actual_tokens - estimated_tokens)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive provider failures and
+    lets a single trial call through after ``reset_timeout`` seconds."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+        raise LLMUnavailable("LLM provider circuit is open, failing fast")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """End a trial call that says nothing about the provider's health
+        (throttled, or rejected as a bad request) without changing the state."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def _limiter() -> RateLimiter:
+    with _shared_lock:
+        if 'limiter' not in _shared:
+            _shared['limiter'] = RateLimiter(
+                getattr(settings, 'LLM_REQUESTS_PER_MINUTE', 300),
+                getattr(settings, 'LLM_TOKENS_PER_MINUTE', 500000),
+            )
+        return _shared['limiter']
+
+
+def _breaker() -> CircuitBreaker:
+    with _shared_lock:
+        if 'breaker' not in _shared:
+            _shared['breaker'] = CircuitBreaker(
+                getattr(settings, 'LLM_CIRCUIT_FAILURE_THRESHOLD', 5),
+                getattr(settings, 'LLM_CIRCUIT_RESET_SECONDS', 30),
+            )
+        return _shared['breaker']
+
+
+def is_circuit_open() -> bool:
+    """Whether calls are currently being failed fast without reaching the provider."""
+    return _breaker().state == 'open'
+
+
+def get_policy(site: str) -> dict:
+    return {**DEFAULT_POLICY, **getattr(settings, 'LLM_POLICIES', {}).get(site, {})}
+
+
+def _is_retryable(error) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _is_provider_failure(error) -> bool:
+    # Throttling means the provider is up; only outages trip the breaker
+    return _is_retryable(error) and not isinstance(error, openai.RateLimitError)
+
+
+def _retry_delay(error, attempt, policy) -> float:
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), policy['max_delay'])
+        except ValueError:
+            pass
+    # Full jitter keeps threads that failed together from retrying together
+    return random.uniform(0, min(policy['max_delay'], policy['base_delay'] * 2 ** attempt))
+
+
+def _estimate_tokens(prompt, policy) -> int:
+    return len(prompt) // CHARS_PER_TOKEN + policy['expected_output_tokens']
+
+
+def _usage_tokens(response):
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', None)
+
+
+def _request(prompt, temperature, policy, extra):
+    return dict(
+        model="deepseek-chat",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        timeout=llm_timeout(policy['purpose']),
+        **extra
+    )
+
+
+def _on_failure(error, site, attempt, policy, breaker) -> float:
+    """Record a failed attempt and return how long to wait before retrying.
+
+    Re-raises errors that are not worth retrying and raises LLMUnavailable
+    once the retry budget of the policy is spent.
+    """
+    # Only provider failures and real responses move the breaker; a 429 or
+    # a 4xx must not reset the count of consecutive outages
+    if _is_provider_failure(error):
+        breaker.record_failure()
+    else:
+        breaker.release_trial()
+    if not _is_retryable(error):
+        raise error
+    if attempt == policy['max_retries']:
+        raise LLMUnavailable(f"{site}: giving up after {attempt + 1} attempts: {str(error)}") from error
+    wait = _retry_delay(error, attempt, policy)
+    print(f"LLM call '{site}' failed ({str(error)}), retrying in {wait:.1f}s")
+    return wait
+
+
+def chat(site: str, prompt: str, temperature: float, **extra) -> str:
+    """Send one user prompt under the policy of ``site`` and return the reply text.
+
+    Raises LLMUnavailable when the circuit is open or retries are exhausted.
+    """
+    policy = get_policy(site)
+    limiter, breaker = _limiter(), _breaker()
+    estimated = _estimate_tokens(prompt, policy)
+    client = get_ai_client()
+
+    for attempt in range(policy['max_retries'] + 1):
+        breaker.allow()
+        delay = limiter.reserve(estimated)
+        if delay:
+            time.sleep(delay)
+        try:
+            response = client.chat.completions.create(**_request(prompt, temperature, policy, extra))
+        except Exception as e:
+            time.sleep(_on_failure(e, site, attempt, policy, breaker))
+            continue
+        breaker.record_success()
+        limiter.settle(estimated, _usage_tokens(response))
+        return response.choices[0].message.content
+
+
+async def achat(site: str, prompt: str, temperature: float, **extra) -> str:
+    """Async counterpart of ``chat`` for the shared event loop (see ai.async_llm)."""
+    from .async_llm import get_async_client, get_semaphore
+
+    policy = get_policy(site)
+    limiter, breaker = _limiter(), _breaker()
+    estimated = _estimate_tokens(prompt, policy)
+
+    for attempt in range(policy['max_retries'] + 1):
+        breaker.allow()
+        delay = limiter.reserve(estimated)
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            async with get_semaphore():
+                response = await get_async_client().chat.completions.create(
+                    **_request(prompt, temperature, policy, extra))
+        except Exception as e:
+            await asyncio.sleep(_on_failure(e, site, attempt, policy, breaker))
+            continue
+        breaker.record_success()
+        limiter.settle(estimated, _usage_tokens(response))
+        return response.choices[0].message.content
+
+
+async def astream_chat(site: str, prompt: str, temperature: float, **extra):
+    """Like ``achat``, but an async generator yielding the reply as it arrives.
+
+    Attempts are retried until the first text arrives; a failure after that
+    is raised, since the caller has already consumed part of the reply.
+    """
+    from .async_llm import get_async_client, get_semaphore
+
+    policy = get_policy(site)
+    limiter, breaker = _limiter(), _breaker()
+    estimated = _estimate_tokens(prompt, policy)
+
+    for attempt in range(policy['max_retries'] + 1):
+        breaker.allow()
+        delay = limiter.reserve(estimated)
+        if delay:
+            await asyncio.sleep(delay)
+        received = False
+        used = None
+        try:
+            async with get_semaphore():
+                # Usage arrives in a last chunk without choices
+                stream = await get_async_client().chat.completions.create(
+                    **_request(prompt, temperature, policy, extra), stream=True,
+                    stream_options={'include_usage': True})
+                async for chunk in stream:
+                    used = _usage_tokens(chunk) or used
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        received = True
+                        yield text
+        except Exception as e:
+            if received:
+                if _is_provider_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release_trial()
+                raise
+            await asyncio.sleep(_on_failure(e, site, attempt, policy, breaker))
+            continue
+        breaker.record_success()
+        limiter.settle(estimated, used)
+        return
+
+
+def get_stats() -> dict:
+    limiter, breaker = _limiter(), _breaker()
+    return {
+        'circuit': breaker.state,
+        'consecutive_failures': breaker.failures,
+        'request_tokens_available': round(limiter.requests.tokens, 1),
+        'llm_tokens_available': round(limiter.tokens.tokens),
+    }
@@ -0,0 +1,139 @@
+"""Content-addressed store of extracted material text.
+
+Uploads are hashed with SHA-256 before they are stored. If a
+``MaterialContent`` row with that hash and the current version exists,
+ingestion skips extraction and summarization and the new ``Material``
+references the row; otherwise the ingest job stores its results under the
+hash for the next upload of the same file. The version is a digest of the
+settings the results depend on (``ai.services.ingestion_params``: PDF
+engines, summarizer model, backend and parameters, summary budget), so
+changing them makes earlier rows misses instead of serving stale text.
+Rows count the materials referencing them and are deleted, with their
+summary levels, when the last of those materials is deleted.
+
+Reference counts are only changed with single UPDATE statements, and a row
+is deleted in the same transaction as the UPDATE that brought it to zero,
+so a concurrent upload either takes its reference first or finds no row.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, ProtectedError, Sum
+
+from api.models import MaterialContent, MaterialSummaryLevel
+from .chunking import count_tokens
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stored': 0, 'released': 0, 'deleted': 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'MATERIAL_DEDUP_ENABLED', True)
+
+
+def hash_upload(upload) -> str:
+    """SHA-256 of an uploaded file, read in chunks; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def get_version() -> str:
+    """Digest of the settings that stored extraction results depend on."""
+    from .services import ingestion_params
+
+    payload = json.dumps(ingestion_params(), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _acquire(content_id) -> bool:
+    return MaterialContent.objects.filter(pk=content_id).update(ref_count=F('ref_count') + 1) == 1
+
+
+def acquire(sha256: str, version: str):
+    """Take a reference to the content stored for ``sha256`` at ``version``, or return None."""
+    content = MaterialContent.objects.filter(sha256=sha256, version=version).only('pk').first()
+    # The row may be deleted between the lookup and the update
+    if content is None or not _acquire(content.pk):
+        _count('misses')
+        return None
+    _count('hits')
+    return content
+
+
+def store(sha256: str, version: str, material: str, summarized_material: str, levels: list,
+          size: int = 0):
+    """Store extraction results under ``sha256`` and ``version`` and return the row, referenced once.
+
+    ``levels`` are the summary texts, most detailed first. If another
+    upload of the same file was stored first, a reference to that row is
+    returned instead.
+    """
+    try:
+        with transaction.atomic():
+            content = MaterialContent.objects.create(
+                sha256=sha256,
+                version=version,
+                material=material,
+                summarized_material=summarized_material,
+                size=size,
+                ref_count=1
+            )
+            MaterialSummaryLevel.objects.bulk_create([
+                MaterialSummaryLevel(
+                    content=content,
+                    level=number,
+                    text=text,
+                    token_count=count_tokens(text, target='llm')
+                )
+                for number, text in enumerate(levels, start=1)
+            ])
+    except IntegrityError:
+        content = acquire(sha256, version)
+        if content is None:
+            raise
+        return content
+    _count('stored')
+    return content
+
+
+def release(content_id):
+    """Drop one reference, deleting the content once nothing references it."""
+    _count('released')
+    try:
+        with transaction.atomic():
+            # The UPDATE locks the row until commit, so no reference can be
+            # taken between reading the count and deleting
+            MaterialContent.objects.filter(pk=content_id, ref_count__gt=0).update(
+                ref_count=F('ref_count') - 1)
+            content = MaterialContent.objects.select_for_update().filter(pk=content_id, ref_count=0).first()
+            if content is None:
+                return
+            content.delete()
+    except ProtectedError:
+        # A material still points at it, so the count was off; keep the row
+        print(f"Material content {content_id} has no references but is still in use")
+        return
+    _count('deleted')
+
+
+def get_stats() -> dict:
+    totals = MaterialContent.objects.aggregate(contents=Count('pk'), references=Sum('ref_count'))
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            **_stats,
+            'hit_rate': _stats['hits'] / lookups if lookups else 0.0,
+            'contents': totals['contents'],
+            'references': totals['references'] or 0,
+        }
@@ -0,0 +1,231 @@
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process, 0 when it cannot be read."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes everywhere else
+        return usage if sys.platform == 'darwin' else usage * 1024
+    except Exception:
+        return 0
+
+
+def _model_size_bytes(obj) -> int:
+    """Size of the tensors held by a model or a transformers pipeline."""
+    model = getattr(obj, 'model', obj)
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except Exception:
+        return 0
+
+
+def _release_accelerator_memory():
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    elif getattr(torch.backends, 'mps', None) and torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+
+
+class _Entry:
+    def __init__(self, model, size_bytes, load_seconds):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.last_used = time.monotonic()
+
+
+class ModelManager:
+    """Process-wide cache of loaded models.
+
+    Models are registered by name with a loader callable and loaded on first
+    use. Loaded models stay resident and are reused across requests until they
+    have been idle for longer than ``idle_ttl`` seconds, or until the least
+    recently used ones have to make room under ``memory_budget_mb``.
+    """
+
+    def __init__(self, memory_budget_mb=None, idle_ttl=None):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_ttl = idle_ttl
+        self._loaders = {}
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._reaper = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'loads': 0,
+            'evictions': 0,
+            'load_seconds_total': 0.0,
+        }
+
+    @property
+    def budget_bytes(self):
+        budget = self.memory_budget_mb
+        if budget is None:
+            budget = getattr(settings, 'AI_MODEL_MEMORY_BUDGET_MB', 4096)
+        return int(budget * 1024 * 1024) if budget else 0
+
+    @property
+    def ttl(self):
+        ttl = self.idle_ttl
+        if ttl is None:
+            ttl = getattr(settings, 'AI_MODEL_IDLE_TTL', 15 * 60)
+        return ttl
+
+    def register(self, name, loader):
+        """Register ``loader`` as the factory for the model called ``name``."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Return the loaded model ``name``, loading it if it is not resident."""
+        with self._lock:
+            entry = self._touch(name)
+            if entry is not None:
+                self._stats['hits'] += 1
+                return entry.model
+            if name not in self._loaders:
+                raise KeyError(f"No model registered under '{name}'")
+            load_lock = self._load_locks[name]
+
+        # Load outside the manager lock so other models stay available,
+        # but only once per model even if many requests arrive together.
+        with load_lock:
+            with self._lock:
+                entry = self._touch(name)
+                if entry is not None:
+                    self._stats['hits'] += 1
+                    return entry.model
+                self._stats['misses'] += 1
+                loader = self._loaders[name]
+
+            print(f"Loading model '{name}'...")
+            rss_before = _current_rss_bytes()
+            started = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - started
+            size_bytes = _model_size_bytes(model) or max(
+                0, _current_rss_bytes() - rss_before)
+            print(f"Model '{name}' loaded in {load_seconds:.2f}s "
+                  f"({size_bytes / (1024 * 1024):.0f} MB)")
+
+            with self._lock:
+                self._models[name] = _Entry(model, size_bytes, load_seconds)
+                self._stats['loads'] += 1
+                self._stats['load_seconds_total'] += load_seconds
+                self._enforce_budget(keep=name)
+            self._ensure_reaper()
+            return model
+
+    def unload(self, name):
+        """Drop the model ``name`` from memory. Returns True if it was loaded."""
+        with self._lock:
+            entry = self._models.pop(name, None)
+        if entry is None:
+            return False
+        print(f"Unloading model '{name}'")
+        del entry
+        gc.collect()
+        _release_accelerator_memory()
+        return True
+
+    def evict_idle(self):
+        """Unload every model that has been idle for longer than the TTL."""
+        ttl = self.ttl
+        if not ttl:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, entry in self._models.items()
+                    if now - entry.last_used > ttl]
+        for name in idle:
+            if self.unload(name):
+                with self._lock:
+                    self._stats['evictions'] += 1
+        return idle
+
+    def clear(self):
+        with self._lock:
+            names = list(self._models)
+        for name in names:
+            self.unload(name)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+                'resident_bytes': sum(e.size_bytes for e in self._models.values()),
+                'process_rss_bytes': _current_rss_bytes(),
+                'memory_budget_bytes': self.budget_bytes,
+                'idle_ttl_seconds': self.ttl,
+                'models': {
+                    name: {
+                        'size_bytes': entry.size_bytes,
+                        'load_seconds': round(entry.load_seconds, 3),
+                        'idle_seconds': round(now - entry.last_used, 1),
+                    }
+                    for name, entry in self._models.items()
+                },
+            }
+
+    def _touch(self, name):
+        entry = self._models.get(name)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            self._models.move_to_end(name)
+        return entry
+
+    def _enforce_budget(self, keep):
+        budget = self.budget_bytes
+        if not budget:
+            return
+        while len(self._models) > 1 and sum(e.size_bytes for e in self._models.values()) > budget:
+            name = next(iter(self._models))
+            if name == keep:
+                break
+            self._models.pop(name)
+            self._stats['evictions'] += 1
+            print(f"Evicted model '{name}' to stay within memory budget")
+        gc.collect()
+        _release_accelerator_memory()
+
+    def _ensure_reaper(self):
+        if not self.ttl or (self._reaper is not None and self._reaper.is_alive()):
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(1, min(self.ttl, 60)))
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    print(f"Error evicting idle models: {str(e)}")
+
+        self._reaper = threading.Thread(
+            target=reap, name='model-manager-reaper', daemon=True)
+        self._reaper.start()
+
+
+model_manager = ModelManager()
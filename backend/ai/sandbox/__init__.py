@@ -0,0 +1,360 @@
+"""Local execution of coding-exercise submissions against their test cases.
+
+Every submission runs in its own short-lived process, jailed by
+``launch.py`` in new user, mount, network and PID namespaces: no network, a
+read-only root holding only the interpreter, a private tmpfs working
+directory, and CPU time, memory, file size, open file and process limits.
+Where the jail cannot be set up (no unprivileged user namespaces, for
+example) submissions are not run at all: ``is_supported`` turns False and
+callers grade with the LLM instead.
+
+The sandbox only reports the value of each test call, on a dedicated file
+descriptor; whether a test passed is decided here, against expected values
+that never enter the sandbox, so code that writes its own report can at
+most claim values it could have returned anyway.
+
+Starting an interpreter is most of the cost of a run, so ``SandboxPool``
+keeps SANDBOX_WARM_WORKERS processes per language pre-started and blocked
+on stdin; a submission takes one and a replacement is started in the
+background. Processes are never reused, so one submission cannot leave
+state behind for the next.
+"""
+import atexit
+import json
+import math
+import os
+import queue
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+_HERE = Path(__file__).resolve().parent
+_SYSTEM_PATHS = ('/usr', '/bin', '/sbin', '/lib', '/lib32', '/lib64')
+# RLIMIT_NPROC counts threads: node needs four with a one-thread V8 pool,
+# plus the watchdog that enforces the vm timeout
+_PROCESS_LIMITS = {'python': 1, 'javascript': 5}
+_unavailable = set()
+
+LANGUAGE_ALIASES = {
+    'python': 'python', 'python3': 'python', 'py': 'python',
+    'javascript': 'javascript', 'js': 'javascript', 'node': 'javascript',
+}
+
+
+class SandboxUnavailable(RuntimeError):
+    """The jail could not be set up, so the submission was not run."""
+
+
+def normalize_language(language: str):
+    """Map a course language ("Python", "JavaScript", ...) to a runner name, or None."""
+    return LANGUAGE_ALIASES.get((language or "").strip().lower())
+
+
+def is_supported(language: str) -> bool:
+    language = normalize_language(language)
+    # The jail is built from Linux namespaces
+    if language in _unavailable or not sys.platform.startswith('linux'):
+        return False
+    if language == 'javascript':
+        return shutil.which('node') is not None
+    return language == 'python'
+
+
+def _interpreter(language: str):
+    """The interpreter's real path and the install prefix the jail must expose."""
+    if language == 'python':
+        return os.path.realpath(sys.executable), sys.base_prefix
+    node = os.path.realpath(shutil.which('node'))
+    return node, os.path.dirname(os.path.dirname(node))
+
+
+def _harness_argv(language: str, memory_mb: int) -> list:
+    executable, _ = _interpreter(language)
+    if language == 'python':
+        return [executable, '-I', '-S', str(_HERE / 'harness.py')]
+    return [executable, f'--max-old-space-size={memory_mb}', '--v8-pool-size=1', str(_HERE / 'harness.js')]
+
+
+def _readonly_paths(language: str) -> list:
+    _, prefix = _interpreter(language)
+    paths = [path for path in _SYSTEM_PATHS if os.path.lexists(path)]
+    for path in (prefix, str(_HERE), *getattr(settings, 'SANDBOX_READONLY_PATHS', [])):
+        path = os.path.realpath(path)
+        if not any(path == system or path.startswith(system + '/') for system in _SYSTEM_PATHS):
+            paths.append(path)
+    return paths
+
+
+def _matches(actual, expected) -> bool:
+    if isinstance(actual, bool) or isinstance(expected, bool):
+        return actual is expected
+    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+        return math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9)
+    if isinstance(actual, list) and isinstance(expected, list):
+        return len(actual) == len(expected) and all(map(_matches, actual, expected))
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(_matches(actual[k], expected[k]) for k in actual)
+    return actual == expected
+
+
+def _score(report: bytes, tests: list):
+    """Grade the sandbox's report of call values against ``tests``, or None if it is malformed."""
+    try:
+        report = json.loads(report)
+        status, error, outcomes = report['status'], report['error'], report['tests']
+    except (ValueError, RecursionError, KeyError, TypeError):
+        return None
+    if status not in ('ok', 'error', 'timeout') or not isinstance(outcomes, list):
+        return None
+
+    results = []
+    for test, outcome in zip(tests, outcomes):
+        outcome = outcome if isinstance(outcome, dict) else {}
+        test_error = str(outcome.get('error') or "")[:500]
+        time_ms = outcome.get('time_ms')
+        results.append({
+            'passed': not test_error and _matches(outcome.get('value'), json.loads(test['expected'])),
+            'error': test_error,
+            'time_ms': time_ms if isinstance(time_ms, (int, float)) else 0,
+        })
+    return {'status': status, 'error': str(error)[:500], 'tests': results}
+
+
+def _tmp_root():
+    root = getattr(settings, 'SANDBOX_TMP_ROOT', None)
+    if root:
+        return str(root)
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class _Sandbox:
+    def __init__(self, process, workdir, result, stderr):
+        self.process = process
+        self.workdir = workdir
+        self.result = result
+        self.stderr = stderr
+        self.ready = False
+        self.exited = False
+
+    def wait_ready(self, timeout) -> bool:
+        """Wait for launch.py to report the jail complete.
+
+        False if it did not within ``timeout``, or exited without doing so
+        (``exited`` is then set).
+        """
+        if not self.ready:
+            readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+            if readable:
+                self.ready = self.process.stdout.read(1) == b'1'
+                self.exited = not self.ready
+        return self.ready
+
+    def read(self, file, limit) -> bytes:
+        file.seek(0)
+        return file.read(limit)
+
+    def stop(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+
+    def kill(self):
+        self.stop()
+        self.result.close()
+        self.stderr.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class SandboxPool:
+    def __init__(self, warm_workers: int = None):
+        self._warm_workers = warm_workers
+        self._warm = {}
+        self._lock = threading.Lock()
+        self._refill = ThreadPoolExecutor(max_workers=2, thread_name_prefix='sandbox-refill')
+        self._slots = threading.BoundedSemaphore(getattr(settings, 'SANDBOX_MAX_CONCURRENCY', 4))
+        self._stats = {'runs': 0, 'cold_starts': 0, 'timeouts': 0, 'errors': 0, 'jail_failures': 0}
+
+    @property
+    def warm_workers(self):
+        if self._warm_workers is not None:
+            return self._warm_workers
+        return getattr(settings, 'SANDBOX_WARM_WORKERS', 2)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _spawn(self, language) -> _Sandbox:
+        cpu_seconds = getattr(settings, 'SANDBOX_CPU_SECONDS', 5)
+        memory_mb = getattr(settings, 'SANDBOX_MEMORY_MB', 256)
+        file_mb = getattr(settings, 'SANDBOX_FILE_MB', 1)
+        workdir = tempfile.mkdtemp(prefix='sandbox-', dir=_tmp_root())
+        # The jail's root is mounted over this directory, visible only inside
+        root = os.path.join(workdir, 'root')
+        os.mkdir(root)
+        result = open(os.path.join(workdir, 'result'), 'w+b')
+        stderr = open(os.path.join(workdir, 'stderr'), 'w+b')
+        argv = [
+            sys.executable, '-I', '-S', str(_HERE / 'launch.py'),
+            '--cpu', str(cpu_seconds),
+            '--memory', str(memory_mb if language == 'python' else 0),
+            '--file', str(file_mb),
+            '--processes', str(_PROCESS_LIMITS[language]),
+            '--tmpfs', str(getattr(settings, 'SANDBOX_TMPFS_MB', 16)),
+            '--result-fd', str(result.fileno()),
+            '--root', root,
+            *(arg for path in _readonly_paths(language) for arg in ('--ro', path)),
+            '--', *_harness_argv(language, memory_mb),
+        ]
+        process = subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            pass_fds=(result.fileno(),),
+            cwd=workdir,
+            env={'PATH': os.environ.get('PATH', '/usr/bin:/bin'), 'LANG': 'C.UTF-8'},
+            start_new_session=True,
+        )
+        return _Sandbox(process, workdir, result, stderr)
+
+    def _queue(self, language) -> queue.Queue:
+        with self._lock:
+            return self._warm.setdefault(language, queue.Queue())
+
+    def _top_up(self, language):
+        warm = self._queue(language)
+        while warm.qsize() < self.warm_workers:
+            warm.put(self._spawn(language))
+
+    def _take(self, language) -> _Sandbox:
+        warm = self._queue(language)
+        while True:
+            try:
+                sandbox = warm.get_nowait()
+            except queue.Empty:
+                self._count('cold_starts')
+                sandbox = self._spawn(language)
+                break
+            if sandbox.process.poll() is None:
+                break
+            sandbox.kill()
+
+        if not sandbox.wait_ready(getattr(settings, 'SANDBOX_WALL_TIMEOUT', 15)):
+            error = sandbox.read(sandbox.stderr, 2000).decode(errors='replace').strip()
+            sandbox.kill()
+            self._count('jail_failures')
+            if sandbox.exited:
+                # Not retried: the host does not allow the jail, and running
+                # the code without it is not an option
+                _unavailable.add(language)
+                print(f"Sandbox disabled for {language}, submissions will be graded by the LLM: {error}")
+            raise SandboxUnavailable(error or f"The {language} sandbox did not start")
+
+        if self.warm_workers:
+            self._refill.submit(self._top_up, language)
+        return sandbox
+
+    def prestart(self, languages=('python', 'javascript')):
+        """Start the warm processes now instead of on the first submission."""
+        for language in languages:
+            if is_supported(language):
+                self._top_up(language)
+
+    def run(self, language: str, code: str, tests: list) -> dict:
+        """Run ``code`` against ``tests`` ([{'call', 'expected'}, ...]).
+
+        Returns ``{'status', 'error', 'passed', 'total', 'tests', 'time_ms'}``
+        where status is ok, error (the code did not load or the process
+        died) or timeout. Raises SandboxUnavailable if the jail could not
+        be set up.
+        """
+        language = normalize_language(language)
+        test_timeout = getattr(settings, 'SANDBOX_TEST_TIMEOUT', 2)
+        wall_timeout = getattr(settings, 'SANDBOX_WALL_TIMEOUT', 15)
+        output_limit = getattr(settings, 'SANDBOX_FILE_MB', 1) * 1024 * 1024
+        request = json.dumps({
+            'code': code,
+            'calls': [test['call'] for test in tests],
+            'test_timeout': test_timeout,
+        }).encode()
+
+        with self._slots:
+            sandbox = self._take(language)
+            started = time.perf_counter()
+            try:
+                sandbox.process.communicate(request, timeout=wall_timeout)
+                timed_out = False
+            except subprocess.TimeoutExpired:
+                timed_out = True
+            finally:
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+                returncode = sandbox.process.poll()
+                sandbox.stop()
+            try:
+                report = sandbox.read(sandbox.result, output_limit)
+                stderr = sandbox.read(sandbox.stderr, output_limit).decode(errors='replace')
+            finally:
+                sandbox.kill()
+
+        if timed_out:
+            result = {'status': 'timeout', 'error': "Time limit exceeded", 'tests': []}
+        else:
+            result = _score(report, tests)
+        if result is None:
+            if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+                error = "CPU time limit exceeded"
+            else:
+                error = stderr.strip()[-500:] or f"Process exited with code {returncode}"
+            result = {'status': 'error', 'error': error, 'tests': []}
+
+        self._count('runs')
+        if result['status'] != 'ok':
+            self._count('timeouts' if result['status'] == 'timeout' else 'errors')
+        result['passed'] = sum(1 for test in result['tests'] if test['passed'])
+        result['total'] = len(tests)
+        result['time_ms'] = elapsed_ms
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            queues = list(self._warm.values())
+            self._warm = {}
+        for warm in queues:
+            while not warm.empty():
+                warm.get_nowait().kill()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                'warm': {language: warm.qsize() for language, warm in self._warm.items()},
+            }
+
+
+_pool = {'instance': None, 'pid': None}
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SandboxPool:
+    """Return this process's sandbox pool, creating it on first use."""
+    with _pool_lock:
+        if _pool['instance'] is None or _pool['pid'] != os.getpid():
+            _pool.update(instance=SandboxPool(), pid=os.getpid())
+            atexit.register(_pool['instance'].shutdown)
+        return _pool['instance']
+
+
+def run_tests(language: str, code: str, tests: list) -> dict:
+    return get_pool().run(language, code, tests)
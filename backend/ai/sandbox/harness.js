@@ -0,0 +1,67 @@
+// JavaScript test harness, started by launch.py inside a sandbox process.
+//
+// Same protocol as harness.py: one JSON submission on stdin, the values of
+// the test calls as JSON on file descriptor 3. Student code runs in a fresh
+// vm context so that each test call, a script in that context, sees the
+// classes and functions the submission declared, and so that the vm timeout
+// applies. The context is not a security boundary; isolation comes from the
+// jail launch.py puts this process in.
+const fs = require("fs");
+const vm = require("vm");
+
+const RESULT_FD = 3;
+
+function toJson(value) {
+  const text = JSON.stringify(value);
+  return text === undefined ? null : JSON.parse(text);
+}
+
+function describe(error) {
+  return error && error.name ? `${error.name}: ${error.message}` : String(error);
+}
+
+function main(input) {
+  const request = JSON.parse(input);
+  const timeout = Math.round(request.test_timeout * 1000);
+  const silent = () => {};
+  // Promise callbacks run inside the timed script, not after it returns
+  const context = vm.createContext(
+    { console: { log: silent, error: silent, warn: silent, info: silent } },
+    { microtaskMode: "afterEvaluate" },
+  );
+  const result = { status: "ok", error: "", tests: [] };
+
+  try {
+    vm.runInContext(request.code, context, { filename: "submission.js", timeout });
+  } catch (error) {
+    const timedOut = error && error.code === "ERR_SCRIPT_EXECUTION_TIMEOUT";
+    result.status = timedOut ? "timeout" : "error";
+    result.error = timedOut ? "Loading the code timed out" : describe(error);
+  }
+
+  if (result.status === "ok") {
+    for (const call of request.calls) {
+      const started = process.hrtime.bigint();
+      let value = null;
+      let error = "";
+      try {
+        value = toJson(vm.runInContext(call, context, { timeout }));
+      } catch (e) {
+        error = e && e.code === "ERR_SCRIPT_EXECUTION_TIMEOUT" ? "Timed out" : describe(e);
+      }
+      result.tests.push({
+        value,
+        error: error.slice(0, 500),
+        time_ms: Number(process.hrtime.bigint() - started) / 1e6,
+      });
+    }
+  }
+
+  fs.writeSync(RESULT_FD, JSON.stringify(result));
+  process.exit(0);
+}
+
+let input = "";
+process.stdin.setEncoding("utf8");
+process.stdin.on("data", (chunk) => (input += chunk));
+process.stdin.on("end", () => main(input));
@@ -0,0 +1,87 @@
+"""Python test harness, started by launch.py inside a sandbox process.
+
+Reads one submission as JSON on stdin (``code``, ``calls``, ``test_timeout``),
+runs the code and evaluates each ``call`` expression. Writes the values, as
+JSON, to file descriptor 3; the parent compares them with the expected
+values, which never enter the sandbox. The process is started ahead of time
+and blocks on stdin until a submission arrives, so interpreter start-up is
+off the request path.
+"""
+import io
+import json
+import os
+import signal
+import sys
+import time
+
+RESULT_FD = 3
+
+
+class TestTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise TestTimeout()
+
+
+def _to_json(value):
+    # Tuples become lists and sets sorted lists, as they would in JSON
+    if isinstance(value, set):
+        value = sorted(value, key=repr)
+    return json.loads(json.dumps(value, default=repr))
+
+
+def _describe(error) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+def _run_timed(timeout, func):
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def main():
+    request = json.loads(sys.stdin.read())
+    results = os.fdopen(RESULT_FD, 'w')
+
+    sys.stdin = io.StringIO()
+    sys.stdout = sys.stderr = io.StringIO()
+    signal.signal(signal.SIGALRM, _on_alarm)
+    timeout = request['test_timeout']
+    namespace = {'__name__': '__submission__'}
+    result = {'status': 'ok', 'error': "", 'tests': []}
+
+    try:
+        _run_timed(timeout, lambda: exec(compile(request['code'], '<submission>', 'exec'), namespace))
+    except TestTimeout:
+        result.update(status='timeout', error="Loading the code timed out")
+    except BaseException as e:
+        result.update(status='error', error=_describe(e))
+    else:
+        for call in request['calls']:
+            started = time.perf_counter()
+            value = None
+            try:
+                value, error = _to_json(_run_timed(timeout, lambda: eval(call, namespace))), ""
+            except TestTimeout:
+                error = "Timed out"
+            except BaseException as e:
+                error = _describe(e)
+            result['tests'].append({
+                'value': value,
+                'error': error[:500],
+                'time_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+    results.write(json.dumps(result))
+    results.flush()
+    # Skip interpreter teardown; the parent is waiting for the process to exit
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
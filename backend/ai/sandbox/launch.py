@@ -0,0 +1,279 @@
+"""Jail this process, apply the sandbox limits, then exec the language harness.
+
+    python -I -S launch.py --cpu S --memory MB --file MB --processes N --tmpfs MB
+        --result-fd FD --root DIR [--ro PATH ...] -- harness argv...
+
+The harness runs in new user, mount, network, PID, IPC and UTS namespaces:
+
+- no network: the network namespace is empty, not even loopback is up;
+- the filesystem is a read-only tmpfs root built in DIR, holding only the
+  ``--ro`` paths (bind-mounted read-only at their usual locations), the
+  /dev/null, zero, random and urandom devices, and a writable tmpfs at
+  /work of ``--tmpfs`` MB that is also the working directory;
+- it runs as an unprivileged uid with no capabilities and no_new_privs;
+- RLIMIT_NPROC caps processes and threads, and the process is PID 1 of its
+  namespace, so everything it starts dies with it.
+
+Once the jail is complete a single byte is written to stdout, which is then
+pointed at /dev/null; the parent waits for that byte before it sends a
+submission. Results are written to file descriptor 3 (``--result-fd`` is
+moved there). If any step of the jail fails, nothing is executed and the
+process exits with JAIL_FAILED before signalling readiness, so a submission
+never runs with weaker isolation than this.
+
+A MEMORY of 0 leaves the address space unlimited: V8 reserves far more
+virtual memory than it uses, so node is capped with --max-old-space-size
+instead.
+"""
+import argparse
+import ctypes
+import os
+import platform
+import resource
+import signal
+import sys
+
+JAIL_FAILED = 125
+RESULT_FD = 3
+SANDBOX_UID = 1000
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_NOATIME = 0x400
+MS_NODIRATIME = 0x800
+MS_BIND = 0x1000
+MS_MOVE = 0x2000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+MNT_DETACH = 0x2
+
+SYS_PIVOT_ROOT = {'x86_64': 155, 'aarch64': 41}
+
+PR_SET_PDEATHSIG = 1
+PR_SET_NO_NEW_PRIVS = 38
+
+DEVICES = ('null', 'zero', 'random', 'urandom')
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _mount(source, target, fstype, flags, data=None):
+    _check(_libc.mount(
+        source.encode() if source else None,
+        target.encode(),
+        fstype.encode() if fstype else None,
+        ctypes.c_ulong(flags),
+        data.encode() if data else None,
+    ), f"mount {target}")
+
+
+def _locked_flags(path):
+    # Flags of the source mount that a user namespace may not clear on remount
+    flag = os.statvfs(path).f_flag
+    mapping = ((os.ST_NOSUID, MS_NOSUID), (os.ST_NODEV, MS_NODEV), (os.ST_NOEXEC, MS_NOEXEC),
+               (os.ST_NOATIME, MS_NOATIME), (os.ST_NODIRATIME, MS_NODIRATIME),
+               (os.ST_RELATIME, MS_RELATIME))
+    return sum(mount_flag for stat_flag, mount_flag in mapping if flag & stat_flag)
+
+
+def _bind(source, target, extra_flags=MS_NOSUID | MS_NODEV):
+    _mount(source, target, None, MS_BIND | MS_REC)
+    _mount(None, target, None,
+           MS_REMOUNT | MS_BIND | MS_RDONLY | extra_flags | _locked_flags(target))
+
+
+def _outer_ids():
+    # Root maps the sandbox uid to nobody; anyone else can only map itself
+    if os.getuid() == 0:
+        return 65534, 65534
+    return os.getuid(), os.getgid()
+
+
+def _write_id_maps(proc, pid, ready):
+    # Runs in a helper left in the parent namespace: a process cannot map
+    # its own new namespace to a uid other than its own
+    if not os.read(ready, 1):
+        os._exit(1)
+    outer_uid, outer_gid = _outer_ids()
+    try:
+        for name, line in (('setgroups', 'deny'),
+                           ('uid_map', f'{SANDBOX_UID} {outer_uid} 1'),
+                           ('gid_map', f'{SANDBOX_UID} {outer_gid} 1')):
+            file = os.open(f'{pid}/{name}', os.O_WRONLY, dir_fd=proc)
+            try:
+                os.write(file, line.encode())
+            finally:
+                os.close(file)
+    except OSError:
+        os._exit(1)
+    os._exit(0)
+
+
+def enter_namespaces(flags, proc):
+    """Unshare the user namespace and ``flags``, mapping one unprivileged uid and gid.
+
+    ``proc`` is a descriptor of /proc, which may no longer be mounted.
+    """
+    ready, notify = os.pipe()
+    pid = os.getpid()
+    helper = os.fork()
+    if not helper:
+        os.close(notify)
+        _write_id_maps(proc, pid, ready)
+    os.close(ready)
+    try:
+        _check(_libc.unshare(CLONE_NEWUSER | flags), "unshare")
+        os.write(notify, b'1')
+    finally:
+        os.close(notify)
+        _, status = os.waitpid(helper, 0)
+    if status:
+        raise OSError(f"could not map the sandbox uid for process {pid}")
+
+
+def _pivot_root(root):
+    number = SYS_PIVOT_ROOT.get(platform.machine())
+    if number is None:
+        raise OSError(f"pivot_root is not supported on {platform.machine()}")
+    os.chdir(root)
+    _check(_libc.syscall(number, b'.', b'.'), "pivot_root")
+    # The old root is stacked under the new one; detach it entirely
+    _check(_libc.umount2(b'.', MNT_DETACH), "umount old root")
+    os.chdir('/')
+
+
+def build_root(root, readonly_paths, tmpfs_mb, owner):
+    """Make ``root`` a read-only tmpfs holding the allowed paths, and pivot into it.
+
+    ``owner`` is the uid and gid that own /work, as seen by the namespace
+    doing the mounts.
+    """
+    _mount(None, '/', None, MS_REC | MS_PRIVATE)
+    _mount('tmpfs', root, 'tmpfs', MS_NOSUID | MS_NODEV, 'size=1m,mode=0755')
+
+    for path in readonly_paths:
+        target = root + path
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), target)
+            continue
+        if os.path.isdir(path):
+            os.makedirs(target, exist_ok=True)
+        else:
+            open(target, 'w').close()
+        _bind(path, target)
+
+    os.makedirs(root + '/dev')
+    for device in DEVICES:
+        open(f'{root}/dev/{device}', 'w').close()
+        _bind(f'/dev/{device}', f'{root}/dev/{device}', MS_NOSUID)
+
+    os.makedirs(root + '/work')
+    _mount('tmpfs', root + '/work', 'tmpfs', MS_NOSUID | MS_NODEV,
+           f'size={tmpfs_mb}m,mode=0700,uid={owner[0]},gid={owner[1]}')
+    os.symlink('/work', root + '/tmp')
+
+    _pivot_root(root)
+    _mount(None, '/', None, MS_REMOUNT | MS_BIND | MS_RDONLY | MS_NOSUID | MS_NODEV)
+
+
+def jail(root, readonly_paths, tmpfs_mb):
+    namespaces = CLONE_NEWNET | CLONE_NEWPID | CLONE_NEWIPC | CLONE_NEWUTS
+    proc = os.open('/proc', os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    try:
+        if os.getuid() == 0:
+            # Root builds the filesystem first, with its own permissions, so
+            # paths under /root can be bound; the sandbox uid cannot reach them
+            _check(_libc.unshare(CLONE_NEWNS), "unshare")
+            build_root(root, readonly_paths, tmpfs_mb, _outer_ids())
+            enter_namespaces(namespaces, proc)
+        else:
+            enter_namespaces(namespaces | CLONE_NEWNS, proc)
+            build_root(root, readonly_paths, tmpfs_mb, (SANDBOX_UID, SANDBOX_UID))
+    finally:
+        os.close(proc)
+
+
+def _apply_limits(args):
+    resource.setrlimit(resource.RLIMIT_CPU, (args.cpu, args.cpu + 1))
+    if args.memory:
+        limit = args.memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    file_limit = args.file * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_limit, file_limit))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+    # Counted per uid in the new user namespace, so only this process and
+    # whatever it starts count against it
+    resource.setrlimit(resource.RLIMIT_NPROC, (args.processes, args.processes))
+
+
+def _wait_and_exit(pid):
+    # The parent stays outside the PID namespace and reports the child's exit
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        if signum != signal.SIGKILL:
+            signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+    os._exit(os.waitstatus_to_exitcode(status))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    for name in ('cpu', 'memory', 'file', 'processes', 'tmpfs', 'result-fd'):
+        parser.add_argument(f'--{name}', type=int, required=True)
+    parser.add_argument('--root', required=True)
+    parser.add_argument('--ro', action='append', default=[])
+    split = sys.argv.index('--')
+    args = parser.parse_args(sys.argv[1:split])
+    argv = sys.argv[split + 1:]
+
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    try:
+        jail(args.root, args.ro, args.tmpfs)
+    except OSError as e:
+        sys.stderr.write(f"sandbox unavailable: {e}\n")
+        os._exit(JAIL_FAILED)
+
+    pid = os.fork()
+    if pid:
+        os.close(args.result_fd)
+        _wait_and_exit(pid)
+
+    try:
+        _check(_libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0), "prctl")
+        _check(_libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "prctl")
+        os.dup2(args.result_fd, RESULT_FD)
+        os.closerange(RESULT_FD + 1, 1024)
+        os.setresgid(SANDBOX_UID, SANDBOX_UID, SANDBOX_UID)
+        os.setresuid(SANDBOX_UID, SANDBOX_UID, SANDBOX_UID)
+        os.chdir('/work')
+        _apply_limits(args)
+        os.write(1, b'1')
+        os.dup2(os.open('/dev/null', os.O_WRONLY), 1)
+        os.execve(argv[0], argv, {'PATH': '/usr/bin:/bin', 'HOME': '/work',
+                                  'TMPDIR': '/work', 'LANG': 'C.UTF-8'})
+    except OSError as e:
+        sys.stderr.write(f"sandbox unavailable: {e}\n")
+    os._exit(JAIL_FAILED)
+
+
+if __name__ == '__main__':
+    main()
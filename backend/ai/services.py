@@ -1,54 +1,62 @@
 import json
 from api.models import Course, Question, Week, Material, Code
-from .client import get_ai_client
+from .async_llm import gather_sync, submit
+from .llm import LLMUnavailable, achat, astream_chat, chat, is_circuit_open
+from .grading_cache import grading_cache, make_key as grading_cache_key
+from . import sandbox, submission_cache
 from .constants import (
-    QUESTION_GEN_TEMPLATE, MAX_CHUNK_SIZE, QUESTION_TYPE_CHOICES,
+    QUESTION_GEN_TEMPLATE, QUESTION_TYPE_CHOICES,
     DIFFICULTIES,
     DIFFICULTY_MAPPING, ANSWER_COMPARISON_TEMPLATE, CODE_COMPARISON_TEMPLATE,
-    CODE_DIFFICULTIES, CODE_GENERATION_TEMPLATE, CODE_SUMMARY_TEMPLATE, DISTRIBUTIONS
+    BATCH_ANSWER_COMPARISON_TEMPLATE, BATCH_ANSWER_ITEM_TEMPLATE,
+    CODE_DIFFICULTIES, CODE_DIFFICULTY_NAMES, CODE_GENERATION_TEMPLATE, CODE_GENERATION_JSON_TEMPLATE,
+    CODE_HINT_TEMPLATE, CODE_SUMMARY_TEMPLATE, DISTRIBUTIONS,
+    SUMMARIZATION_MODEL, BART_CHUNK_TOKENS, CHUNK_MIN_FILL, CHUNK_BREAK_EVERY
 )
+from .model_manager import model_manager
+from .chunking import chunk_text, count_tokens, iter_chunks
+from .summary_cache import make_key, summary_cache
+from .summarizer_backends import (
+    SUMMARIZER_BACKENDS, get_backend_name, get_device, inference_mode, load_summarizer
+)
+from django.conf import settings
 from itertools import product
-from transformers import pipeline, AutoTokenizer
-import textwrap
+import asyncio
 import json
-import textwrap
 import os
+import queue
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-import torch
 import random
-import platform
-
-# Check CUDA availability and set device
-system = platform.system()
-if system == 'Darwin':  # macOS
-    os.environ["TOKENIZERS_PARALLELISM"] = "false"
-    if torch.backends.mps.is_available():
-        device = "mps"
-        print("Using MPS (Metal Performance Shaders)")
-    else:
-        device = -1  # Use CPU
-        print("MPS not available, using CPU")
-else:  # Windows or other OS
-    if torch.cuda.is_available():
-        device = 0  # Use first GPU
-        print(f"Using GPU: {torch.cuda.get_device_name(0)}")
-    else:
-        device = -1  # Use CPU
-        print("CUDA not available, using CPU")
+
+
+def _generation_params() -> dict:
+    """Summarizer generation settings; summaries are only as reusable as these."""
+    return {
+        'min_length': getattr(settings, 'SUMMARY_MIN_LENGTH', 30),
+        'max_min_length': getattr(settings, 'SUMMARY_MAX_MIN_LENGTH', 142),
+        'min_length_ratio': getattr(settings, 'SUMMARY_MIN_LENGTH_RATIO', 0.81),
+        'do_sample': getattr(settings, 'SUMMARY_DO_SAMPLE', False),
+    }
+
+
+def _min_summary_length(chunk: str, params: dict = None) -> int:
+    params = params or _generation_params()
+    min_len = max(params['min_length'], int(len(chunk.split()) * params['min_length_ratio']))
+    return min(min_len, params['max_min_length'])
 
 
 def _summarize_chunk(chunk: str, summarizer) -> str:
-    input_length = len(chunk.split())
-    target_length = int(input_length * 0.9)
-    min_len = max(30, int(target_length * 0.9))
-    min_len = min(min_len, 142)
+    params = _generation_params()
+    min_len = _min_summary_length(chunk, params)
 
     try:
-        with torch.no_grad():  # Disable gradient calculation
+        with inference_mode():  # Disable gradient calculation
             result = summarizer(
                 chunk,
                 min_length=min_len,
-                do_sample=False,
+                do_sample=params['do_sample'],
                 clean_up_tokenization_spaces=True
             )
             summary = result[0]['summary_text'].strip()
@@ -58,70 +66,325 @@ def _summarize_chunk(chunk: str, summarizer) -> str:
         return chunk
 
 
-def generate_material_summary(material: str) -> str:
-    print("Starting material summary generation...")
-    chunks = textwrap.wrap(material, width=1024)
-    print(f"Material split into {len(chunks)} chunks")
+def _summarize_chunks_threaded(chunks: list, summarizer, on_progress=None) -> list:
+    """Summarize chunks with one pipeline call per chunk across a thread pool."""
+    # Calculate optimal number of workers based on system
+    cpu_count = os.cpu_count() or 4
+    max_workers = min(4, cpu_count)  # Cap at 4 workers
+    print(f"Using {max_workers} workers for processing")
 
-    try:
-        print("Loading summarization model...")
-        summarizer = pipeline(
-            "summarization",
-            model="facebook/bart-large-cnn",
-            device=device,
-            torch_dtype=torch.float16 if device != -
-            1 else torch.float32  # Use half precision if not CPU
-        )
-        print("Model loaded successfully")
+    chunk_results = [None] * len(chunks)  # Pre-allocate results array
 
-        # Calculate optimal number of workers based on system
-        cpu_count = os.cpu_count() or 4
-        max_workers = min(4, cpu_count)  # Cap at 4 workers
-        print(f"Using {max_workers} workers for processing")
+    def process_chunk(chunk_idx):
+        try:
+            chunk = chunks[chunk_idx]
+            result = _summarize_chunk(chunk, summarizer)
+            return chunk_idx, result
+        except Exception as e:
+            print(f"Error processing chunk {chunk_idx + 1}: {str(e)}")
+            return chunk_idx, chunks[chunk_idx]
 
-        full_summary = []
-        chunk_results = [None] * len(chunks)  # Pre-allocate results array
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        print("Starting parallel processing of chunks...")
+        futures = [executor.submit(process_chunk, i)
+                   for i in range(len(chunks))]
 
-        def process_chunk(chunk_idx):
+        for done, future in enumerate(futures, start=1):
             try:
-                chunk = chunks[chunk_idx]
-                result = _summarize_chunk(chunk, summarizer)
-                return chunk_idx, result
+                chunk_idx, result = future.result()
+                chunk_results[chunk_idx] = result
+                print(f"Processed chunk {chunk_idx + 1}/{len(chunks)}")
             except Exception as e:
-                print(f"Error processing chunk {chunk_idx + 1}: {str(e)}")
-                return chunk_idx, chunks[chunk_idx]
+                print(f"Error getting result: {str(e)}")
+            if on_progress:
+                on_progress(done, len(chunks))
+
+    return chunk_results
+
+
+def _summarize_chunks_batched(chunks: list, summarizer, batch_size: int, on_progress=None) -> list:
+    """Summarize chunks by passing whole batches to the pipeline.
+
+    A batch only holds chunks with the same minimum summary length, so each
+    chunk is summarized with the bound it would get on its own. Within that,
+    chunks are sorted by length so every batch holds inputs of similar size
+    and little compute is wasted on padding. Results come back in the
+    original chunk order.
+    """
+    chunk_results = [None] * len(chunks)
+    params = _generation_params()
+    bounds = [_min_summary_length(chunk, params) for chunk in chunks]
+    batches = []
+    for i in sorted(range(len(chunks)), key=lambda i: (bounds[i], len(chunks[i])), reverse=True):
+        if batches and len(batches[-1]) < batch_size and bounds[batches[-1][0]] == bounds[i]:
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    print(f"Summarizing {len(chunks)} chunks in {len(batches)} batches of up to {batch_size}")
+
+    done = 0
+    for batch_idx in batches:
+        batch = [chunks[i] for i in batch_idx]
+        try:
+            with inference_mode():
+                results = summarizer(
+                    batch,
+                    min_length=bounds[batch_idx[0]],
+                    do_sample=params['do_sample'],
+                    clean_up_tokenization_spaces=True,
+                    batch_size=batch_size
+                )
+            for i, result in zip(batch_idx, results):
+                # Pipelines return a list per input when given a list
+                if isinstance(result, list):
+                    result = result[0]
+                chunk_results[i] = ' '.join(result['summary_text'].split())
+        except Exception as e:
+            print(f"Error summarizing batch, retrying chunk by chunk: {str(e)}")
+            for i in batch_idx:
+                chunk_results[i] = _summarize_chunk(chunks[i], summarizer)
+        done += len(batch_idx)
+        print(f"Processed {done}/{len(chunks)} chunks")
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    return chunk_results
+
+
+def summarize_chunks(chunks: list, summarizer=None, mode: str = None, batch_size: int = None,
+                     on_progress=None) -> list:
+    """Summarize a list of chunks and return one summary per chunk, in order.
+
+    ``mode`` is either ``"batched"`` or ``"threaded"`` and defaults to the
+    SUMMARIZER_MODE setting. ``on_progress(done, total)`` is called as chunks
+    complete.
+    """
+    if not chunks:
+        return []
+    summarizer = summarizer or get_summarizer()
+    mode = mode or getattr(settings, 'SUMMARIZER_MODE', 'batched')
+    if mode == 'threaded':
+        return _summarize_chunks_threaded(chunks, summarizer, on_progress)
+    batch_size = batch_size or getattr(settings, 'SUMMARIZER_BATCH_SIZE', 8)
+    return _summarize_chunks_batched(chunks, summarizer, batch_size, on_progress)
+
+
+for _backend in SUMMARIZER_BACKENDS:
+    model_manager.register(
+        f"{SUMMARIZATION_MODEL}:{_backend}",
+        lambda backend=_backend: load_summarizer(backend, get_device())
+    )
+
+
+def get_summarizer(backend: str = None):
+    """Return the process-wide summarization pipeline, loading it on first use.
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            print("Starting parallel processing of chunks...")
-            futures = [executor.submit(process_chunk, i)
-                       for i in range(len(chunks))]
+    ``backend`` defaults to the SUMMARIZER_BACKEND setting.
+    """
+    backend = backend or get_backend_name()
+    return model_manager.get(f"{SUMMARIZATION_MODEL}:{backend}")
 
-            for future in futures:
+
+def _summary_cache_params() -> dict:
+    """Parameters that change summarizer output and so belong in cache keys."""
+    return {
+        'backend': get_backend_name(),
+        'chunk_tokens': BART_CHUNK_TOKENS,
+        # Document summaries also depend on where chunks end
+        'chunk_breaks': [CHUNK_MIN_FILL, CHUNK_BREAK_EVERY],
+        **_generation_params(),
+    }
+
+
+def ingestion_params() -> dict:
+    """Settings that change the text and summaries stored for an uploaded file."""
+    from file_manager.pdf import get_engine_names
+
+    return {
+        'pdf_engines': get_engine_names(),
+        'summarizer': {'model': SUMMARIZATION_MODEL, **_summary_cache_params()},
+        'hierarchical': getattr(settings, 'SUMMARY_HIERARCHICAL', True),
+        'token_budget': getattr(settings, 'SUMMARY_TOKEN_BUDGET', 4000),
+        'max_levels': getattr(settings, 'SUMMARY_MAX_LEVELS', 5),
+    }
+
+
+def _summarize_text(material: str, on_progress=None) -> str:
+    """Summarize text chunk by chunk, reusing cached summaries. Raises on failure."""
+    params = _summary_cache_params()
+    document_key = make_key(material, SUMMARIZATION_MODEL, params, kind='D')
+    cached = summary_cache.get(document_key)
+    if cached is not None:
+        print("Material summary served from cache")
+        return cached
+
+    chunks = chunk_text(material, target='bart')
+    print(f"Material split into {len(chunks)} chunks")
+    chunk_results = _summarize_chunks_cached(chunks, params, on_progress=on_progress)
+
+    # Filter out None results and join
+    full_summary = [r for r in chunk_results if r is not None]
+    print("All chunks processed successfully")
+    result = "\n\n".join(full_summary)
+    if len(full_summary) == len(chunks):
+        summary_cache.set(document_key, result, kind='D')
+    return result
+
+
+def _summarize_chunks_cached(chunks: list, params: dict, on_progress=None) -> list:
+    """Summaries of ``chunks`` in order, from the cache where possible (None if failed)."""
+    chunk_keys = [make_key(chunk, SUMMARIZATION_MODEL, params) for chunk in chunks]
+    cached_chunks = summary_cache.get_many(chunk_keys)
+    missing = [i for i, key in enumerate(chunk_keys) if key not in cached_chunks]
+    print(f"{len(chunks) - len(missing)}/{len(chunks)} chunk summaries served from cache")
+
+    summaries = summarize_chunks([chunks[i] for i in missing], on_progress=on_progress)
+    chunk_results = [cached_chunks.get(key) for key in chunk_keys]
+    for i, summary in zip(missing, summaries):
+        chunk_results[i] = summary
+
+    # Chunks that failed to summarize come back unchanged; don't cache them
+    summary_cache.set_many({
+        chunk_keys[i]: summary for i, summary in zip(missing, summaries)
+        if summary is not None and summary != chunks[i]
+    })
+    return chunk_results
+
+
+def summarize_material_stream(pieces, on_progress=None) -> tuple:
+    """Chunk and summarize text while it is still being extracted.
+
+    ``pieces`` is an iterable of text pieces such as
+    ``file_manager.iter_text``. A producer thread pulls them through
+    ``iter_chunks`` into a queue holding at most SUMMARY_STREAM_WINDOW_CHUNKS
+    chunks, and this thread summarizes whatever has arrived in batches of up
+    to SUMMARIZER_BATCH_SIZE, so the model starts on the first pages while
+    later ones are being parsed and extraction waits when it gets a window
+    ahead. ``on_progress(done)`` gets the number of chunks summarized so far.
+
+    Returns ``(material, summary)``. If summarization fails, extraction
+    still runs to the end and summary is None. Extraction errors are raised.
+    Chunk summaries are reused from the cache as chunks arrive; the
+    document summary is only written for ``_summarize_text``, since its key
+    is known once every chunk has already been summarized.
+    """
+    window = max(getattr(settings, 'SUMMARY_STREAM_WINDOW_CHUNKS', 16), 1)
+    window_chars = getattr(settings, 'SUMMARY_STREAM_WINDOW_CHARS', None)
+    batch_size = getattr(settings, 'SUMMARIZER_BATCH_SIZE', 8)
+    chunks = queue.Queue(maxsize=window)
+    stop = threading.Event()
+    end = object()
+    # The Material row stores the full text, so the pieces are kept for it
+    material = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def recorded():
+        for piece in pieces:
+            material.append(piece)
+            yield piece
+
+    def produce():
+        try:
+            for chunk in iter_chunks(recorded(), target='bart', window_chars=window_chars):
+                if not put(chunk):
+                    return
+            put(end)
+        except Exception as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, name='summary-stream', daemon=True)
+    producer.start()
+    params = _summary_cache_params()
+    summaries, summarizing, done = [], True, 0
+    try:
+        while True:
+            batch = [chunks.get()]
+            while len(batch) < batch_size and batch[-1] is not end and not isinstance(batch[-1], Exception):
+                try:
+                    batch.append(chunks.get_nowait())
+                except queue.Empty:
+                    break
+            last = batch[-1]
+            if last is end or isinstance(last, Exception):
+                batch.pop()
+            if batch and summarizing:
                 try:
-                    chunk_idx, result = future.result()
-                    chunk_results[chunk_idx] = result
-                    print(f"Processed chunk {chunk_idx + 1}/{len(chunks)}")
+                    summaries.extend(_summarize_chunks_cached(batch, params))
                 except Exception as e:
-                    print(f"Error getting result: {str(e)}")
+                    print(f"Error summarizing streamed chunks, finishing extraction only: {str(e)}")
+                    summarizing = False
+            done += len(batch)
+            if on_progress and batch:
+                on_progress(done)
+            if isinstance(last, Exception):
+                raise last
+            if last is end:
+                break
+    finally:
+        stop.set()
+        producer.join()
 
-        # Filter out None results and join
-        full_summary = [r for r in chunk_results if r is not None]
-        print("All chunks processed successfully")
-        return "\n\n".join(full_summary)
+    material = ''.join(material)
+    print(f"Streamed {len(material)} characters in {done} chunks")
+    if not summarizing:
+        return material, None
+    full_summary = [summary for summary in summaries if summary is not None]
+    result = "\n\n".join(full_summary)
+    if len(full_summary) == done:
+        summary_cache.set(make_key(material, SUMMARIZATION_MODEL, params, kind='D'), result, kind='D')
+    return material, result
 
+
+def generate_material_summary(material: str, on_progress=None) -> str:
+    print("Starting material summary generation...")
+    try:
+        return _summarize_text(material, on_progress=on_progress)
     except Exception as e:
         print(f"Error in summary generation: {str(e)}")
         return material[:500] + "..."
-    finally:
-        # Clean up resources
-        if 'summarizer' in locals():
-            del summarizer
-            import gc
-            gc.collect()
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-            elif torch.backends.mps.is_available():
-                torch.mps.empty_cache()
+
+
+def condense_summary(summary: str, budget_tokens: int = None, on_progress=None) -> list:
+    """Re-summarize a summary in rounds until it fits ``budget_tokens``.
+
+    Each round summarizes the chunks of the previous level in batches.
+    Returns the additional levels, most detailed first; the last one fits the
+    budget unless SUMMARY_MAX_LEVELS was reached or a round stopped shrinking
+    the text. ``on_progress(level, done, total)`` reports chunk progress.
+    """
+    budget_tokens = budget_tokens or getattr(settings, 'SUMMARY_TOKEN_BUDGET', 4000)
+    max_levels = getattr(settings, 'SUMMARY_MAX_LEVELS', 5)
+    levels = []
+    current_tokens = count_tokens(summary, target='llm')
+
+    # Level 1 is the summary passed in
+    while current_tokens > budget_tokens and len(levels) + 1 < max_levels:
+        level = len(levels) + 2
+        print(f"Condensing summary to level {level} ({current_tokens} > {budget_tokens} tokens)")
+        try:
+            condensed = _summarize_text(
+                levels[-1] if levels else summary,
+                on_progress=(lambda done, total: on_progress(level, done, total)) if on_progress else None
+            )
+        except Exception as e:
+            print(f"Error condensing summary to level {level}: {str(e)}")
+            break
+        condensed_tokens = count_tokens(condensed, target='llm')
+        if condensed_tokens >= current_tokens * 0.9:
+            print("Summary stopped shrinking, keeping previous level")
+            break
+        levels.append(condensed)
+        current_tokens = condensed_tokens
+
+    return levels
 
 
 def parse_question_lines(response_text):
@@ -147,7 +410,7 @@ def parse_question_lines(response_text):
     return questions
 
 
-def generate_questions_for_chunk(chunk, client):
+def _question_prompt(chunk):
     word_count = len(chunk.split())
     questions_per_level = max(2, min(12, (word_count * 2) // 1000))
 
@@ -158,93 +421,181 @@ def generate_questions_for_chunk(chunk, client):
         question_types=", ".join(QUESTION_TYPE_CHOICES),
         distributions=DISTRIBUTIONS
     )
+    return prompt, questions_per_level
+
+
+async def agenerate_questions_for_chunk(chunk):
+    """Generate questions for one chunk, or return None if the LLM call failed."""
+    prompt, _ = _question_prompt(chunk)
 
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        questions = parse_question_lines(response.choices[0].message.content)
+        content = await achat('question_generation', prompt, temperature=0.7)
+        questions = parse_question_lines(content)
         return questions
     except Exception as e:
         print(f"Error generating questions: {str(e)}")
-        fallback_questions = []
-        for difficulty in DIFFICULTIES:
-            for _ in range(questions_per_level):
-                fallback_questions.append({
-                    "question": f"Sample {difficulty} question about this section",
-                    "answer": f"Sample {difficulty} answer",
-                    "explanation": f"Sample {difficulty} explanation",
-                    "type": "multiple_choice",
-                    "difficulty": difficulty
-                })
-        return fallback_questions
+        return None
 
 
-def generate_questions_for_week(week: Week) -> dict:
+def _week_question_chunks(week: Week) -> list:
     try:
         material = week.materials.first()
-        if not material or not material.summarized_material:
+        if not material or not material.summary_text:
             raise ValueError("Material summary not generated yet")
     except Material.DoesNotExist:
         raise ValueError(f"No material found for week {week.week_number}")
 
-    client = get_ai_client()
-    raw_questions = []
+    summarized_material = material.summary_for_budget(
+        getattr(settings, 'QUESTION_SUMMARY_BUDGET_TOKENS', 16000))
+    return chunk_text(summarized_material, target='llm')
 
-    summarized_material = material.summarized_material
-    chunks = textwrap.wrap(summarized_material, width=MAX_CHUNK_SIZE)
-
-    with ThreadPoolExecutor(max_workers=16) as executor:
-        futures = []
-        for chunk in chunks:
-            futures.append(
-                executor.submit(
-                    generate_questions_for_chunk,
-                    chunk=chunk,
-                    client=client
-                )
-            )
 
-        for future in futures:
-            raw_questions.extend(future.result())
+def _question_fields(q: dict):
+    """Model fields for a parsed question, or None if the LLM mislabeled it."""
+    difficulty = DIFFICULTY_MAPPING.get(q['difficulty'])
+    if difficulty is None or q['type'] not in QUESTION_TYPE_CHOICES:
+        print(f"Skipping question with difficulty '{q['difficulty']}' and type '{q['type']}'")
+        return None
+    return {
+        "difficulty": difficulty,
+        "question_type": q['type'],
+        "question_text": q['question'],
+        "answer": q['answer'],
+        "explanation": q['explanation'],
+    }
+
+
+def generate_questions_for_week(week: Week) -> dict:
+    raw_questions = []
+    chunks = _week_question_chunks(week)
+
+    # All chunks are requested concurrently on the shared event loop
+    results = gather_sync([agenerate_questions_for_chunk(chunk) for chunk in chunks])
+    failed = sum(1 for questions in results if questions is None)
+    if chunks and failed == len(chunks):
+        raise LLMUnavailable("Question generation failed, please try again later")
+    if failed:
+        print(f"Warning: question generation failed for {failed}/{len(chunks)} chunks")
+    for questions in results:
+        raw_questions.extend(questions or [])
 
     # Format for output
-    questions_data = [
-        {
-            "week": week.id,
-            "difficulty": DIFFICULTY_MAPPING[q['difficulty']],
-            "question_type": q['type'],
-            "question_text": q['question'],
-            "answer": q['answer'],
-            "explanation": q['explanation'],
-        }
-        for q in raw_questions
-    ]
+    questions_data = []
+    for q in raw_questions:
+        fields = _question_fields(q)
+        if fields is not None:
+            questions_data.append({"week": week.id, **fields})
 
     return questions_data
 
 
-def compare_open_answers(answer: str, user_answer: str) -> dict:
-    client = get_ai_client()
+async def astream_questions_for_chunk(chunk, emit):
+    """Stream questions for one chunk, passing each one to ``emit`` as soon
+    as its line is complete.
+
+    Returns how many questions were emitted, or None if the call failed
+    before producing any.
+    """
+    prompt, _ = _question_prompt(chunk)
+    emitted = 0
+    pending = ""
+    try:
+        async for text in astream_chat('question_generation', prompt, temperature=0.7):
+            pending += text
+            if '\n' not in pending:
+                continue
+            complete, pending = pending.rsplit('\n', 1)
+            for question in parse_question_lines(complete):
+                emit(question)
+                emitted += 1
+        for question in parse_question_lines(pending):
+            emit(question)
+            emitted += 1
+    except Exception as e:
+        print(f"Error streaming questions: {str(e)}")
+        return emitted or None
+    return emitted
+
 
+def stream_questions_for_week(week: Week, flush_size: int = None, flush_interval: float = None) -> int:
+    """Generate questions for a week and save them while the LLM is still writing.
+
+    Chunks are streamed concurrently on the shared event loop; this thread
+    validates parsed questions with ``QuestionCreateSerializer``, as the
+    non-streaming path does, and writes them with ``bulk_create`` every
+    ``flush_size`` questions or ``flush_interval`` seconds, so the first
+    questions are in the database within seconds and only one flush worth
+    of questions is held in memory. Invalid questions are skipped. Returns
+    the number of questions created.
+    """
+    from api.serializers import QuestionCreateSerializer
+
+    flush_size = flush_size or getattr(settings, 'QUESTION_STREAM_FLUSH_SIZE', 20)
+    flush_interval = flush_interval or getattr(settings, 'QUESTION_STREAM_FLUSH_SECONDS', 2)
+    chunks = _week_question_chunks(week)
+
+    parsed = queue.Queue()
+
+    async def stream_all():
+        return await asyncio.gather(*[astream_questions_for_chunk(chunk, parsed.put) for chunk in chunks])
+
+    future = submit(stream_all())
+    buffer = []
+    created = 0
+    last_flush = time.monotonic()
+
+    while True:
+        try:
+            question = parsed.get(timeout=0.2)
+        except queue.Empty:
+            question = None
+        if question is not None:
+            fields = _question_fields(question)
+            if fields is not None:
+                serializer = QuestionCreateSerializer(data={'week': week.pk, **fields})
+                if serializer.is_valid():
+                    buffer.append(Question(**serializer.validated_data))
+                else:
+                    print(f"Skipping invalid generated question: {serializer.errors}")
+        due = buffer and time.monotonic() - last_flush >= flush_interval
+        if len(buffer) >= flush_size or due:
+            Question.objects.bulk_create(buffer)
+            created += len(buffer)
+            buffer = []
+            last_flush = time.monotonic()
+        if question is None and future.done() and parsed.empty():
+            break
+
+    if buffer:
+        Question.objects.bulk_create(buffer)
+        created += len(buffer)
+
+    results = future.result()
+    failed = sum(1 for count in results if count is None)
+    if chunks and failed == len(chunks):
+        raise LLMUnavailable("Question generation failed, please try again later")
+    if failed:
+        print(f"Warning: question generation failed for {failed}/{len(chunks)} chunks")
+    return created
+
+
+def _answer_text(user_answer) -> str:
     # Convert user_answer to string if it's a list
     if isinstance(user_answer, list):
-        user_answer = " ".join(user_answer)
+        return " ".join(user_answer)
+    return user_answer
 
+
+def _grade_open_answer(answer: str, user_answer: str, cache_key: str) -> dict:
+    """Grade one answer pair with its own LLM call and cache the verdict."""
     prompt = ANSWER_COMPARISON_TEMPLATE.format(
         answer=answer,
         user_answer=user_answer
     )
 
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-        result = {'is_correct': response.choices[0].message.content}
+        result = {'is_correct': chat('open_grading', prompt, temperature=0.3)}
+        grading_cache.set(cache_key, result['is_correct'])
         return result
 
     except Exception as e:
@@ -255,9 +606,126 @@ def compare_open_answers(answer: str, user_answer: str) -> dict:
         return result
 
 
+def compare_open_answers(answer: str, user_answer: str, use_cache: bool = True) -> dict:
+    """Grade an open answer against the reference answer.
+
+    Grades are cached by answer pair (see ai.grading_cache). ``use_cache=False``
+    skips the lookup and regrades, replacing the cached grade.
+    """
+    user_answer = _answer_text(user_answer)
+
+    cache_key = grading_cache_key(answer, user_answer)
+    if use_cache:
+        cached = grading_cache.get(cache_key)
+        if cached is not None:
+            return {'is_correct': cached}
+    else:
+        grading_cache.record_bypass()
+
+    return _grade_open_answer(answer, user_answer, cache_key)
+
+
+def parse_grading_lines(content: str) -> dict:
+    """Parse ``number|verdict`` lines into ``{number: 'true' | 'false'}``."""
+    verdicts = {}
+    for line in content.strip().split('\n'):
+        parts = [part.strip().strip('.').lower() for part in line.split('|')]
+        if len(parts) != 2 or not parts[0].isdigit() or parts[1] not in ('true', 'false'):
+            continue
+        verdicts[int(parts[0])] = parts[1]
+    return verdicts
+
+
+async def _agrade_open_answer_batch(pairs: list) -> dict:
+    """Grade ``pairs`` of (answer, user_answer) in one LLM call.
+
+    Returns ``{position: verdict}`` for the items the reply covered; an
+    empty dict if the call failed.
+    """
+    items = "\n\n".join(
+        BATCH_ANSWER_ITEM_TEMPLATE.format(index=index, answer=answer, user_answer=user_answer)
+        for index, (answer, user_answer) in enumerate(pairs, start=1)
+    )
+    try:
+        content = await achat(
+            'batch_grading',
+            BATCH_ANSWER_COMPARISON_TEMPLATE.format(items=items),
+            temperature=0.3
+        )
+    except Exception as e:
+        print(f"Error in batched answer comparison: {str(e)}")
+        return {}
+    verdicts = parse_grading_lines(content)
+    return {index - 1: verdict for index, verdict in verdicts.items() if 1 <= index <= len(pairs)}
+
+
+def grade_open_answers(pairs: list, use_cache: bool = True, batch_size: int = None) -> list:
+    """Grade a list of (answer, user_answer) pairs, e.g. all open questions of a quiz.
+
+    With GRADING_MODE "batched" the uncached pairs are packed
+    ``batch_size`` at a time into one prompt each, so a quiz costs a few
+    LLM calls instead of one per question. Items a batch reply did not
+    cover are graded one by one. Returns ``{'is_correct': ...}`` per pair.
+    Verdicts are cached per prompt template, and one from either is reused.
+    """
+    pairs = [(answer, _answer_text(user_answer)) for answer, user_answer in pairs]
+    keys = [grading_cache_key(answer, user_answer) for answer, user_answer in pairs]
+    batch_keys = [grading_cache_key(answer, user_answer, template='batch') for answer, user_answer in pairs]
+    results = [None] * len(pairs)
+
+    if use_cache:
+        for i, key in enumerate(keys):
+            cached = grading_cache.get(key, batch_keys[i])
+            if cached is not None:
+                results[i] = {'is_correct': cached}
+    else:
+        for _ in pairs:
+            grading_cache.record_bypass()
+
+    # Identical answer pairs in one quiz are graded once
+    pending = {}
+    for i, key in enumerate(keys):
+        if results[i] is None:
+            pending.setdefault(key, []).append(i)
+    if not pending:
+        return results
+
+    mode = getattr(settings, 'GRADING_MODE', 'batched')
+    batch_size = batch_size or getattr(settings, 'GRADING_BATCH_SIZE', 10)
+    remaining = list(pending)
+
+    if mode == 'batched' and batch_size > 1 and len(remaining) > 1:
+        batches = [remaining[i:i + batch_size] for i in range(0, len(remaining), batch_size)]
+        replies = gather_sync([
+            _agrade_open_answer_batch([pairs[pending[key][0]] for key in batch])
+            for batch in batches
+        ])
+        remaining = []
+        for batch, verdicts in zip(batches, replies):
+            for position, key in enumerate(batch):
+                if position in verdicts:
+                    grading_cache.set(batch_keys[pending[key][0]], verdicts[position])
+                    for i in pending[key]:
+                        results[i] = {'is_correct': verdicts[position]}
+                else:
+                    remaining.append(key)
+        if remaining:
+            print(f"Batched grading missed {len(remaining)} items, grading them one by one")
+
+    def grade_one(key):
+        answer, user_answer = pairs[pending[key][0]]
+        return key, _grade_open_answer(answer, user_answer, key)
+
+    if remaining:
+        with ThreadPoolExecutor(max_workers=min(32, len(remaining))) as executor:
+            for key, result in executor.map(grade_one, remaining):
+                for i in pending[key]:
+                    results[i] = result
+    return results
+
+
 def compare_coding_solutions(problem_statement: str, solution: str, user_solution: str, programming_language: str = "python") -> dict:
     """Compare coding question answers."""
-    client = get_ai_client()
     prompt = CODE_COMPARISON_TEMPLATE.format(
         problem_statement=problem_statement,
         solution=solution,
@@ -266,12 +734,7 @@ def compare_coding_solutions(problem_statement: str, solution: str, user_solutio
     )
 
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-        result = response.choices[0].message.content.split("|")
+        result = chat('code_grading', prompt, temperature=0.3).split("|")
         return {
             'user_score': result[0],
             'hint': result[1]
@@ -282,9 +745,126 @@ def compare_coding_solutions(problem_statement: str, solution: str, user_solutio
         # Fallback to basic string comparison if AI fails
         return {
             'user_score': 0,
-            'hint': str(e)
+            'hint': str(e),
+            'fallback': True
         }
 
+
+def _code_hint(code: Code, user_solution: str, language: str, run: dict) -> str:
+    """Ask the LLM for a hint about the tests ``user_solution`` failed."""
+    if run['status'] != 'ok':
+        failures = f"The code did not run: {run['error']}"
+    else:
+        failures = "\n".join(
+            f"{test['call']} should return {test['expected']}"
+            + (f" (raised {result['error']})" if result['error'] else "")
+            for test, result in zip(code.test_cases, run['tests']) if not result['passed']
+        )
+    prompt = CODE_HINT_TEMPLATE.format(
+        programming_language=language,
+        problem_statement=code.problem_statement,
+        user_solution=user_solution,
+        failures=failures,
+    )
+    try:
+        return chat('code_hint', prompt, temperature=0.3).strip()
+    except Exception as e:
+        print(f"Error generating code hint: {str(e)}")
+        return failures
+
+
+def evaluate_code_submission(code: Code, user_solution: str, language: str, use_cache: bool = True) -> dict:
+    """Score a submission by running it against the problem's test cases.
+
+    The score is the percentage of tests passed; the LLM is only asked for
+    a hint when some fail. Problems without test cases, or in a language the
+    sandbox cannot run, are graded by the LLM as before. Resubmitting the
+    same code returns the stored evaluation (see ai.submission_cache).
+    """
+    cache_key = submission_cache.make_key(code, user_solution, language)
+    if use_cache:
+        cached = submission_cache.get(code, cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+
+    run = None
+    if code.test_cases and sandbox.is_supported(language):
+        try:
+            run = sandbox.run_tests(language, user_solution, code.test_cases)
+        except sandbox.SandboxUnavailable as e:
+            print(f"Sandbox unavailable, grading with the LLM: {e}")
+    if run is None:
+        result = compare_coding_solutions(code.problem_statement, code.solution, user_solution, language)
+        if not result.get('fallback'):
+            submission_cache.store(code, cache_key, result)
+        return result
+
+    score = round(100 * run['passed'] / run['total'])
+    hint = "" if score == 100 else _code_hint(code, user_solution, language, run)
+    result = {
+        'user_score': score,
+        'hint': hint,
+        'tests': {key: run[key] for key in ('status', 'error', 'passed', 'total', 'time_ms', 'tests')},
+    }
+    # A wall-clock timeout can come from a busy host rather than the code
+    if run['status'] != 'timeout':
+        submission_cache.store(code, cache_key, result)
+    return result
+
+
+def validate_test_cases(codes: list, language: str) -> list:
+    """Drop generated test cases whose expected value the reference solution contradicts.
+
+    Only tests the reference solution ran to completion with another value
+    are dropped. Tests it raised on or timed out on say nothing about the
+    expected value and are kept unvalidated, as are all tests of a run that
+    did not finish.
+    """
+    if not sandbox.is_supported(language):
+        return codes
+
+    def check(code):
+        if not code['test_cases']:
+            return code
+        try:
+            run = sandbox.run_tests(language, code['solution'], code['test_cases'])
+        except sandbox.SandboxUnavailable:
+            return code
+        if run['status'] != 'ok':
+            print(f"Could not validate test cases, keeping them unvalidated: "
+                  f"reference solution run ended with {run['status']} ({run['error']})")
+            return code
+        # Tests without a result (a truncated report) are kept as well
+        wrong = {i for i, result in enumerate(run['tests']) if not result['passed'] and not result['error']}
+        errors = [result['error'] for result in run['tests'] if result['error']]
+        if wrong:
+            print(f"Dropped {len(wrong)} test cases whose expected value the reference solution contradicts")
+        if errors:
+            print(f"Kept {len(errors)} test cases unvalidated, the reference solution failed on them "
+                  f"({errors[0]})")
+        return {**code, 'test_cases': [test for i, test in enumerate(code['test_cases']) if i not in wrong]}
+
+    with ThreadPoolExecutor(max_workers=min(4, len(codes) or 1)) as executor:
+        return list(executor.map(check, codes))
+
+
+def parse_test_lines(text: str) -> list:
+    """Parse ``expression => expected JSON`` lines into test cases."""
+    test_cases = []
+    for line in text.strip().split('\n'):
+        line = line.strip().strip('`')
+        if ' => ' not in line:
+            continue
+        call, expected = (part.strip() for part in line.rsplit(' => ', 1))
+        try:
+            json.loads(expected)
+        except ValueError:
+            continue
+        if call:
+            test_cases.append({'call': call, 'expected': expected})
+    return test_cases
+
+
 def parse_code_lines(response_text):
     codes = []
     # Split on both ==== and --- to handle different AI output formats
@@ -346,6 +926,7 @@ def parse_code_lines(response_text):
                 
                 # Look for next section marker
                 next_section = min(
+                    block.find("Tests:") if "Tests:" in block else len(block),
                     block.find("Difficulty") if "Difficulty" in block else len(block),
                     block.find("**Difficulty**") if "**Difficulty**" in block else len(block)
                 )
@@ -358,6 +939,15 @@ def parse_code_lines(response_text):
                     if code_end > code_start:
                         template_code = template_code[code_start:code_end].strip()
 
+            # Find tests
+            test_cases = []
+            if "Tests:" in block:
+                tests_start = block.find("Tests:")
+                tests_end = block.find("Difficulty", tests_start)
+                tests_end = tests_end if tests_end != -1 else len(block)
+                test_cases = parse_test_lines(
+                    block[tests_start + len("Tests:"):tests_end].replace("**", ""))
+
             # Find difficulty
             if "Difficulty" in block:
                 difficulty_start = block.find("Difficulty")
@@ -392,7 +982,8 @@ def parse_code_lines(response_text):
                 "problem_statement": problem_statement,
                 "solution": solution,
                 "template_code": template_code,
-                'user_code': template_code
+                'user_code': template_code,
+                'test_cases': test_cases
             })
 
         except Exception as e:
@@ -402,50 +993,30 @@ def parse_code_lines(response_text):
     return codes
 
 
-def _summarize_code_chunk(chunk: str, client, language: str) -> str:
+async def _asummarize_code_chunk(chunk: str, language: str) -> str:
     """Generate a focused summary for a single code chunk."""
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{
-                "role": "user",
-                "content": CODE_SUMMARY_TEMPLATE.format(
-                    chunk=chunk,
-                    language=language
-                )
-            }],
-            temperature=0.4,
+        content = await achat(
+            'code_summary',
+            CODE_SUMMARY_TEMPLATE.format(chunk=chunk, language=language),
+            temperature=0.4
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
     except Exception as e:
         print(f"Error in code chunk summary generation: {str(e)}")
         # Return original chunk if summarization fails
         return chunk
 
 
-def generate_code_specific_summary(material: str, client, language: str) -> str:
-    """Generate a focused summary for code generation using chunking and threading."""
+def generate_code_specific_summary(material: str, language: str) -> str:
+    """Generate a focused summary for code generation, summarizing chunks concurrently."""
     try:
         print("Starting code-specific summary generation...")
-        chunks = textwrap.wrap(material, width=MAX_CHUNK_SIZE)
+        chunks = chunk_text(material, target='llm')
         print(f"Material split into {len(chunks)} chunks for code summary.")
 
-        full_summary = []
-        max_workers = 16
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(
-                _summarize_code_chunk, chunk, client, language) for chunk in chunks]
-
-            for i, future in enumerate(futures):
-                try:
-                    result = future.result()
-                    full_summary.append(result)
-                    print(f"Processed code summary chunk {i+1}/{len(chunks)}")
-                except Exception as e:
-                    print(
-                        f"Error processing code summary chunk {i+1}: {str(e)}")
-                    full_summary.append(chunks[i])
+        full_summary = gather_sync(
+            [_asummarize_code_chunk(chunk, language) for chunk in chunks])
 
         print("All code summary chunks processed successfully.")
         return "\n\n".join(full_summary)
@@ -455,20 +1026,146 @@ def generate_code_specific_summary(material: str, client, language: str) -> str:
         return material
 
 
+def parse_code_json(content: str, difficulty: str) -> list:
+    """Parse a JSON-mode reply of CODE_GENERATION_JSON_TEMPLATE into code dicts."""
+    try:
+        problems = json.loads(content).get('problems', [])
+    except (ValueError, AttributeError) as e:
+        print(f"Error parsing generated problems: {str(e)}")
+        return []
+
+    codes = []
+    for problem in problems if isinstance(problems, list) else []:
+        if not isinstance(problem, dict):
+            continue
+        fields = [problem.get(name) for name in ('problem_statement', 'solution', 'template')]
+        if not all(isinstance(field, str) and field.strip() for field in fields):
+            print("Skipping generated problem with missing fields")
+            continue
+        problem_statement, solution, template_code = (field.strip() for field in fields)
+        test_cases = [
+            {'call': test['call'].strip(), 'expected': json.dumps(test['expected'])}
+            for test in problem.get('tests') or []
+            if isinstance(test, dict) and isinstance(test.get('call'), str)
+            and test['call'].strip() and 'expected' in test
+        ]
+        codes.append({
+            "difficulty": difficulty,
+            "problem_statement": problem_statement,
+            "solution": solution,
+            "template_code": template_code,
+            'user_code': template_code,
+            'test_cases': test_cases
+        })
+    return codes
+
+
+async def _agenerate_codes_for_difficulty(code_summary: str, language: str, difficulty: str,
+                                          count: int, avoid=()) -> list:
+    """Generate ``count`` problems of one difficulty with a JSON-mode request.
+
+    Returns None if the LLM was unavailable, so callers can tell an outage
+    from a reply without usable problems.
+    """
+    avoid_text = ""
+    if avoid:
+        avoid_text = "Do not repeat these existing challenges:\n" + "\n".join(
+            f"- {statement.splitlines()[0][:120]}" for statement in avoid) + "\n"
+    prompt = CODE_GENERATION_JSON_TEMPLATE.format(
+        num_codes=count,
+        difficulty_name=CODE_DIFFICULTY_NAMES[difficulty],
+        programming_language=language,
+        avoid=avoid_text,
+        chunk=code_summary,
+    )
+    try:
+        content = await achat('code_generation', prompt, temperature=0.7,
+                              response_format={'type': 'json_object'})
+    except LLMUnavailable as e:
+        print(f"LLM unavailable for {CODE_DIFFICULTY_NAMES[difficulty]} problems: {str(e)}")
+        return None
+    except Exception as e:
+        print(f"Error generating {CODE_DIFFICULTY_NAMES[difficulty]} problems: {str(e)}")
+        return []
+    return parse_code_json(content, difficulty)[:count]
+
+
+def _generate_codes_parallel(code_summary: str, language: str, problems_per_difficulty: int) -> list:
+    """One concurrent request per difficulty, then one top-up round for the
+    difficulties that came back short.
+
+    Raises LLMUnavailable if the LLM was unavailable for every difficulty,
+    or for some of them and nothing was generated.
+    """
+    results = gather_sync([
+        _agenerate_codes_for_difficulty(code_summary, language, difficulty, problems_per_difficulty)
+        for difficulty in CODE_DIFFICULTIES
+    ])
+    failed = sum(1 for codes in results if codes is None)
+    if failed == len(CODE_DIFFICULTIES):
+        raise LLMUnavailable("Code generation failed, please try again later")
+    by_difficulty = {difficulty: codes or [] for difficulty, codes in zip(CODE_DIFFICULTIES, results)}
+
+    short = [d for d in CODE_DIFFICULTIES if len(by_difficulty[d]) < problems_per_difficulty]
+    if short and is_circuit_open():
+        # The top-up would only fail fast
+        print(f"LLM circuit is open, not topping up coding problems for: {', '.join(short)}")
+    elif short:
+        print(f"Topping up coding problems for difficulties: {', '.join(short)}")
+        extra = gather_sync([
+            _agenerate_codes_for_difficulty(
+                code_summary, language, difficulty,
+                problems_per_difficulty - len(by_difficulty[difficulty]),
+                avoid=[code['problem_statement'] for code in by_difficulty[difficulty]])
+            for difficulty in short
+        ])
+        for difficulty, codes in zip(short, extra):
+            by_difficulty[difficulty].extend(codes or [])
+
+    codes = [code for difficulty in CODE_DIFFICULTIES
+             for code in by_difficulty[difficulty][:problems_per_difficulty]]
+    if not codes and failed:
+        raise LLMUnavailable("Code generation failed, please try again later")
+    return codes
+
+
+def _generate_codes_single(code_summary: str, language: str, problems_per_difficulty: int) -> list:
+    """All difficulties in one CODE_GENERATION_TEMPLATE completion."""
+    prompt = CODE_GENERATION_TEMPLATE.format(
+        num_codes=problems_per_difficulty,
+        difficulties=", ".join(CODE_DIFFICULTIES),
+        chunk=code_summary,
+        programming_language=language,
+    )
+    return parse_code_lines(chat('code_generation', prompt, temperature=0.7))
+
+
+def generate_coding_problems(code_summary: str, language: str, problems_per_difficulty: int,
+                             mode: str = None) -> list:
+    """Generate problems for every difficulty from a code summary.
+
+    ``mode`` (default CODE_GENERATION_MODE) is "parallel" for concurrent
+    per-difficulty JSON-mode requests or "single" for one prompt covering
+    all difficulties.
+    """
+    mode = mode or getattr(settings, 'CODE_GENERATION_MODE', 'parallel')
+    if mode == 'single':
+        return _generate_codes_single(code_summary, language, problems_per_difficulty)
+    return _generate_codes_parallel(code_summary, language, problems_per_difficulty)
+
+
 def generate_coding_problems_for_week(week: Week) -> dict:
     """Generate balanced set of coding problems for a week."""
     # Validate input
     material = week.materials.first()
-    if not material or not material.summarized_material:
+    if not material or not material.summary_text:
         raise ValueError("Material summary required")
 
-    client = get_ai_client()
     language = week.course.language
 
     # Generate focused summary
     code_summary = generate_code_specific_summary(
-        material.summarized_material,
-        client,
+        material.summary_for_budget(getattr(settings, 'CODE_SUMMARY_BUDGET_TOKENS', 8000)),
         language
     )
 
@@ -481,25 +1178,13 @@ def generate_coding_problems_for_week(week: Week) -> dict:
     else:
         problems_per_difficulty = 3
 
-    # Generate problems with balanced distribution
-    prompt = CODE_GENERATION_TEMPLATE.format(
-        num_codes=problems_per_difficulty,
-        difficulties=", ".join(CODE_DIFFICULTIES),
-        chunk=code_summary,
-        programming_language=language,
-    )
-
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-        )
-        codes = parse_code_lines(response.choices[0].message.content)
+        codes = generate_coding_problems(code_summary, language, problems_per_difficulty)
 
         # Validate generated codes
         if not codes:
             raise ValueError("No valid coding problems generated")
+        codes = validate_test_cases(codes, language)
 
         # Ensure balanced distribution
         difficulty_counts = {diff: 0 for diff in CODE_DIFFICULTIES}
@@ -0,0 +1,97 @@
+"""Memoized evaluation of coding submissions.
+
+The last evaluation of each ``Code`` problem is stored on its row together
+with the key it was computed for. The key hashes the problem, its solution,
+template and test cases, the language, and the submission with comments and
+insignificant whitespace removed, so resubmitting unchanged code returns
+instantly and editing the problem invalidates the stored result.
+"""
+import hashlib
+import io
+import json
+import re
+import threading
+import tokenize
+
+from api.models import Code
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+# Strings are matched first so comment markers inside them are kept
+_C_LIKE_TOKENS = re.compile(
+    r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`)'''
+    r'|(?:\s+|//[^\n]*|/\*.*?\*/)+',
+    re.DOTALL
+)
+
+
+def _normalize_python(code: str) -> str:
+    # Indentation is significant, so it is kept as INDENT/DEDENT markers
+    skip = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+    tokens = []
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        if token.type in skip:
+            continue
+        if token.type == tokenize.INDENT:
+            tokens.append('<indent>')
+        elif token.type == tokenize.DEDENT:
+            tokens.append('<dedent>')
+        elif token.type == tokenize.NEWLINE:
+            tokens.append('\n')
+        else:
+            tokens.append(token.string)
+    return ' '.join(tokens)
+
+
+def _normalize_c_like(code: str) -> str:
+    # Runs of comments and whitespace become one space; string literals are kept
+    return _C_LIKE_TOKENS.sub(lambda match: match.group(1) or ' ', code).strip()
+
+
+def normalize_code(code: str, language: str) -> str:
+    """Drop comments and layout-only whitespace from ``code``."""
+    if (language or "").strip().lower() in ('python', 'python3', 'py'):
+        try:
+            return _normalize_python(code)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            # Code that does not tokenize is keyed on its trimmed lines
+            return '\n'.join(line.rstrip() for line in code.splitlines() if line.strip())
+    return _normalize_c_like(code)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_key(code: Code, user_code: str, language: str) -> str:
+    payload = json.dumps({
+        'problem': code.pk,
+        'solution': _digest(code.solution),
+        'template': _digest(code.template_code),
+        'tests': _digest(json.dumps(code.test_cases, sort_keys=True)),
+        'language': (language or "").strip().lower(),
+        'code': normalize_code(user_code, language),
+    }, sort_keys=True)
+    return _digest(payload)
+
+
+def get(code: Code, key: str):
+    """Return the stored evaluation if it was computed for ``key``."""
+    hit = bool(key) and code.last_evaluation_key == key and code.last_evaluation is not None
+    with _lock:
+        _stats['hits' if hit else 'misses'] += 1
+    return code.last_evaluation if hit else None
+
+
+def store(code: Code, key: str, evaluation: dict):
+    Code.objects.filter(pk=code.pk).update(last_evaluation=evaluation, last_evaluation_key=key)
+    code.last_evaluation, code.last_evaluation_key = evaluation, key
+    with _lock:
+        _stats['writes'] += 1
+
+
+def get_stats() -> dict:
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {**_stats, 'hit_rate': _stats['hits'] / lookups if lookups else 0.0}
@@ -0,0 +1,129 @@
+"""Inference backends for the summarization model.
+
+Every backend returns a transformers ``summarization`` pipeline, so callers
+use the same interface regardless of how the model runs underneath:
+
+- ``pytorch``: the stock model, float16 on GPU/MPS and float32 on CPU.
+- ``quantized``: the model with its Linear layers dynamically quantized to
+  int8, for CPU-only hosts.
+- ``onnx``: the model exported to ONNX and run by ONNX Runtime on CPU.
+  Requires ``optimum[onnxruntime]``; the export is cached on disk.
+
+torch and transformers are imported inside the functions below, never at
+module import, so Django processes that never summarize don't pay for them.
+"""
+import os
+import platform
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from .constants import SUMMARIZATION_MODEL
+
+SUMMARIZER_BACKENDS = ('pytorch', 'quantized', 'onnx')
+
+if platform.system() == 'Darwin':
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+@lru_cache(maxsize=None)
+def get_device():
+    """Pick the inference device on first use: MPS on macOS, else CUDA, else CPU."""
+    import torch
+
+    if platform.system() == 'Darwin':  # macOS
+        if torch.backends.mps.is_available():
+            print("Using MPS (Metal Performance Shaders)")
+            return "mps"
+        print("MPS not available, using CPU")
+        return -1
+    # Windows or other OS
+    if torch.cuda.is_available():
+        print(f"Using GPU: {torch.cuda.get_device_name(0)}")
+        return 0  # Use first GPU
+    print("CUDA not available, using CPU")
+    return -1
+
+
+def inference_mode():
+    """Context manager disabling gradient tracking during inference."""
+    import torch
+    return torch.no_grad()
+
+
+def get_backend_name() -> str:
+    backend = getattr(settings, 'SUMMARIZER_BACKEND', 'pytorch')
+    if backend not in SUMMARIZER_BACKENDS:
+        raise ValueError(
+            f"Unknown SUMMARIZER_BACKEND '{backend}'. Choose one of: {', '.join(SUMMARIZER_BACKENDS)}")
+    return backend
+
+
+def _load_pytorch(model_name, device):
+    import torch
+    from transformers import pipeline
+    return pipeline(
+        "summarization",
+        model=model_name,
+        device=device,
+        torch_dtype=torch.float16 if device != -
+        1 else torch.float32  # Use half precision if not CPU
+    )
+
+
+def _load_quantized(model_name, device):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    model = torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # Dynamically quantized kernels only exist for CPU
+    return pipeline("summarization", model=model, tokenizer=tokenizer, device=-1)
+
+
+def _onnx_export_dir(model_name) -> Path:
+    base = Path(getattr(settings, 'SUMMARIZER_ONNX_DIR', settings.BASE_DIR / 'ai_models' / 'onnx'))
+    return base / model_name.replace('/', '--')
+
+
+def _load_onnx(model_name, device):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer, pipeline
+
+    export_dir = _onnx_export_dir(model_name)
+    if (export_dir / 'config.json').exists():
+        model = ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    else:
+        print(f"Exporting {model_name} to ONNX in {export_dir}...")
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        model.save_pretrained(export_dir)
+        tokenizer.save_pretrained(export_dir)
+    return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+
+_LOADERS = {
+    'pytorch': _load_pytorch,
+    'quantized': _load_quantized,
+    'onnx': _load_onnx,
+}
+
+
+def load_summarizer(backend: str, device, model_name: str = SUMMARIZATION_MODEL):
+    """Load the summarization pipeline for ``backend``.
+
+    If an optional backend cannot be loaded (e.g. ONNX Runtime is not
+    installed) the stock PyTorch pipeline is used instead.
+    """
+    try:
+        return _LOADERS[backend](model_name, device)
+    except ImportError as e:
+        if backend == 'pytorch':
+            raise
+        print(f"Summarizer backend '{backend}' unavailable, falling back to pytorch: {str(e)}")
+        return _load_pytorch(model_name, device)
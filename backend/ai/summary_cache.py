@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import SummaryCacheEntry
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so layout-only differences hash the same."""
+    return ' '.join(text.split())
+
+
+def make_key(text: str, model: str, params: dict, kind: str = 'C') -> str:
+    payload = json.dumps({
+        'kind': kind,
+        'model': model,
+        'params': params,
+        'text': normalize_text(text),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """Database-backed summary cache bounded to ``max_entries`` rows.
+
+    When the table grows past the limit the least recently used entries are
+    deleted. Hit/miss counters are kept per process; each row also counts
+    how often it was reused.
+    """
+
+    def __init__(self, max_entries=None):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, 'SUMMARY_CACHE_MAX_ENTRIES', 20000)
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'SUMMARY_CACHE_ENABLED', True)
+
+    def get_many(self, keys) -> dict:
+        """Return ``{key: summary}`` for every key that is cached."""
+        keys = list(set(keys))
+        if not keys or not self.enabled:
+            return {}
+        found = dict(SummaryCacheEntry.objects.filter(
+            key__in=keys).values_list('key', 'summary'))
+        if found:
+            SummaryCacheEntry.objects.filter(key__in=found).update(
+                hits=F('hits') + 1, last_used_at=timezone.now())
+        with self._lock:
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: dict, kind: str = 'C'):
+        if not items or not self.enabled:
+            return
+        now = timezone.now()
+        SummaryCacheEntry.objects.bulk_create(
+            [SummaryCacheEntry(key=key, kind=kind, summary=summary, last_used_at=now)
+             for key, summary in items.items()],
+            ignore_conflicts=True
+        )
+        with self._lock:
+            self._stats['writes'] += len(items)
+        self.evict()
+
+    def set(self, key, summary, kind: str = 'C'):
+        self.set_many({key: summary}, kind=kind)
+
+    def evict(self):
+        """Delete least recently used entries beyond ``max_entries``."""
+        limit = self.max_entries
+        if not limit:
+            return 0
+        overflow = SummaryCacheEntry.objects.count() - limit
+        if overflow <= 0:
+            return 0
+        stale = list(SummaryCacheEntry.objects.order_by(
+            'last_used_at').values_list('pk', flat=True)[:overflow])
+        deleted, _ = SummaryCacheEntry.objects.filter(pk__in=stale).delete()
+        with self._lock:
+            self._stats['evictions'] += deleted
+        return deleted
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+                'max_entries': self.max_entries,
+            }
+
+
+summary_cache = SummaryCache()
@@ -0,0 +1,186 @@
+"""Job handlers run by the AI worker processes, and their web-side entry points."""
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from api.models import Material, MaterialSummaryLevel, Week
+from .chunking import count_tokens
+from . import material_store
+from .jobs import PermanentJobError, enqueue, register_handler, run_in_background, set_progress
+from .services import condense_summary, generate_material_summary, summarize_material_stream
+
+
+def _extract_and_summarize(job, upload_name: str):
+    """Extract the whole text, then summarize it. Returns ``(material, summary)``."""
+    from file_manager.file_manager import extract_text
+
+    # Read through the storage API so remote backends work too
+    with default_storage.open(upload_name, 'rb') as upload:
+        material = extract_text(upload, upload_name)
+    if not material:
+        return material, None
+    print(f"Text extracted successfully. Length: {len(material)}")
+
+    set_progress(job, 'summarizing', 20)
+
+    def on_progress(done, total):
+        set_progress(job, 'summarizing', 20 + int(60 * done / max(total, 1)))
+
+    try:
+        return material, generate_material_summary(material, on_progress=on_progress)
+    except Exception as e:
+        print(f"Error generating summary, using fallback: {str(e)}")
+        return material, None
+
+
+def _extract_and_summarize_streaming(job, upload_name: str):
+    """Summarize chunks while later pages are still being extracted.
+
+    The total number of chunks is unknown until extraction ends, so progress
+    reports the chunks done so far.
+    """
+    from file_manager.file_manager import ExtractionError, iter_text
+
+    def on_progress(done):
+        set_progress(job, f'extracting and summarizing ({done} chunks done)', 20)
+
+    with default_storage.open(upload_name, 'rb') as upload:
+        try:
+            return summarize_material_stream(iter_text(upload, upload_name), on_progress=on_progress)
+        except ExtractionError as e:
+            # extract_text treats unparseable files as empty; do the same here.
+            # Storage and database errors are raised so the job is retried
+            print(f"Error extracting text from {upload_name}: {str(e)}")
+            return "", None
+
+
+def _create_material(payload, week, **fields):
+    return Material.objects.create(
+        title=payload['title'],
+        description=payload['description'],
+        week=week,
+        **fields
+    )
+
+
+@register_handler('ingest_material')
+def ingest_material_job(job):
+    """Extract, summarize and store an uploaded material file.
+
+    The payload holds the stored upload name plus the week and the title and
+    description submitted with it. The Material row is created only once
+    summarization has finished. When the same file was ingested before, the
+    payload holds a reference to its stored content instead of an upload and
+    the material is created from it right away.
+    """
+    payload = job.payload
+    finished = False
+    referenced = False
+    try:
+        week = Week.objects.select_related('course').filter(pk=payload['week_id']).first()
+        if week is None:
+            finished = True
+            raise PermanentJobError('Week no longer exists')
+
+        if payload.get('content_id'):
+            # Same file as an earlier upload: the reference was taken when
+            # the upload was received
+            set_progress(job, 'saving', 95)
+            created = _create_material(payload, week, content_id=payload['content_id'])
+            referenced = True
+            week.course.update_difficulty_if_complete()
+            finished = True
+            return {'material_id': created.pk, 'deduplicated': True}
+
+        set_progress(job, 'extracting', 5)
+        if getattr(settings, 'SUMMARY_STREAMING', True):
+            material, summarized_material = _extract_and_summarize_streaming(job, payload['upload'])
+        else:
+            material, summarized_material = _extract_and_summarize(job, payload['upload'])
+        if not material:
+            finished = True
+            raise PermanentJobError('Could not extract text from file')
+        # Only real summaries are shared with later uploads of the file
+        shareable = bool(payload.get('sha256')) and summarized_material is not None
+        if summarized_material is None:
+            summarized_material = material[:500] + "..."
+
+        levels = [summarized_material]
+        if getattr(settings, 'SUMMARY_HIERARCHICAL', True):
+            set_progress(job, 'condensing', 80)
+
+            def on_level_progress(level, done, total):
+                set_progress(job, f'condensing level {level}', 80 + int(15 * done / max(total, 1)))
+
+            levels += condense_summary(summarized_material, on_progress=on_level_progress)
+
+        set_progress(job, 'saving', 95)
+        with transaction.atomic():
+            if shareable:
+                # Versioned with this process's settings, which produced the results
+                content = material_store.store(
+                    payload['sha256'], material_store.get_version(), material, summarized_material,
+                    levels, size=payload.get('size', 0))
+                created = _create_material(payload, week, content=content)
+            else:
+                created = _create_material(
+                    payload, week, material=material, summarized_material=summarized_material)
+                MaterialSummaryLevel.objects.bulk_create([
+                    MaterialSummaryLevel(
+                        material=created,
+                        level=number,
+                        text=text,
+                        token_count=count_tokens(text, target='llm')
+                    )
+                    for number, text in enumerate(levels, start=1)
+                ])
+        week.course.update_difficulty_if_complete()
+        finished = True
+        return {'material_id': created.pk}
+    finally:
+        # Keep the upload around while the job can still be retried
+        if finished or job.attempts >= job.max_attempts:
+            if payload.get('upload'):
+                default_storage.delete(payload['upload'])
+            if payload.get('content_id') and not referenced:
+                material_store.release(payload['content_id'])
+
+
+def start_material_ingestion(week, upload, title: str, description: str):
+    """Store an uploaded material file and queue its ingestion.
+
+    Uploads are hashed first (MATERIAL_DEDUP_ENABLED); a file that was
+    ingested before is not stored again and its job only creates the
+    Material. Returns the BackgroundJob tracking it. Without a worker pool
+    (SUMMARY_QUEUE_ENABLED off) the job starts on a background thread of
+    this process.
+    """
+    payload = {
+        'upload': None,
+        'filename': upload.name,
+        'week_id': week.pk,
+        'user_id': week.course.user_id,
+        'title': title,
+        'description': description,
+    }
+    if material_store.is_enabled():
+        payload['sha256'] = material_store.hash_upload(upload)
+        payload['size'] = upload.size
+        content = material_store.acquire(payload['sha256'], material_store.get_version())
+        if content is not None:
+            print(f"Upload matches stored content {content.pk}, skipping extraction")
+            payload['content_id'] = content.pk
+    if not payload.get('content_id'):
+        payload['upload'] = default_storage.save(f'uploads/{uuid.uuid4().hex}_{upload.name}', upload)
+
+    try:
+        job = enqueue('ingest_material', payload)
+    except Exception:
+        if payload.get('content_id'):
+            material_store.release(payload['content_id'])
+        raise
+    if not getattr(settings, 'SUMMARY_QUEUE_ENABLED', False):
+        run_in_background(job)
+    return job
@@ -0,0 +1,130 @@
+"""Process pool that executes queued background jobs.
+
+``WorkerPool`` runs in the foreground (``manage.py run_ai_workers``) and
+spawns one process per worker. Each worker claims jobs from the queue, runs
+them and sends heartbeats while busy. The pool restarts workers that die,
+kills workers whose job exceeded its timeout, and re-queues the jobs of
+workers that disappeared, including ones on other hosts.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+
+
+def _worker_main(worker_id, kinds, poll_interval, heartbeat_interval):
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+    from django.db import close_old_connections
+    from ai import tasks  # noqa: F401  registers the job handlers
+    from ai.jobs import claim_next, run_job
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stopping.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the pool handles Ctrl+C
+    print(f"Worker {worker_id} started (pid {os.getpid()})")
+
+    while not stopping.is_set():
+        close_old_connections()
+        try:
+            job = claim_next(worker_id, kinds)
+        except Exception as e:
+            print(f"Worker {worker_id} could not claim a job: {str(e)}")
+            job = None
+        if job is None:
+            stopping.wait(poll_interval)
+            continue
+
+        print(f"Worker {worker_id} running job {job.pk} ({job.kind})")
+        run_job(job, heartbeat_interval=heartbeat_interval)
+        print(f"Worker {worker_id} finished job {job.pk}: {job.get_status_display()}")
+
+    print(f"Worker {worker_id} stopped")
+
+
+class WorkerPool:
+    def __init__(self, workers=None, kinds=None):
+        self.size = workers or getattr(settings, 'AI_WORKERS', 2)
+        self.kinds = kinds or None
+        self.poll_interval = getattr(settings, 'AI_JOB_POLL_INTERVAL', 2)
+        self.heartbeat_interval = getattr(settings, 'AI_JOB_HEARTBEAT', 15)
+        self._ctx = multiprocessing.get_context('spawn')
+        self._slots = {}
+        self._generation = 0
+        self._stopping = False
+
+    def _worker_id(self, slot):
+        self._generation += 1
+        return f"{socket.gethostname()}:{os.getpid()}:{slot}:{self._generation}"
+
+    def _spawn(self, slot):
+        worker_id = self._worker_id(slot)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.kinds, self.poll_interval, self.heartbeat_interval),
+            name=f"ai-worker-{slot}",
+        )
+        process.start()
+        self._slots[slot] = (worker_id, process)
+
+    def _release_jobs(self, worker_id, error):
+        from api.models import BackgroundJob
+        from ai.jobs import fail
+        for job in BackgroundJob.objects.filter(status='R', worker_id=worker_id):
+            if fail(job, error):
+                print(f"Re-queued job {job.pk} from worker {worker_id}: {error}")
+
+    def _check_workers(self):
+        from api.models import BackgroundJob
+        from django.utils import timezone
+
+        now = timezone.now()
+        for slot, (worker_id, process) in list(self._slots.items()):
+            if not process.is_alive():
+                print(f"Worker {worker_id} exited with code {process.exitcode}, restarting")
+                self._release_jobs(worker_id, "Worker process died")
+                self._spawn(slot)
+                continue
+            for job in BackgroundJob.objects.filter(status='R', worker_id=worker_id):
+                if job.started_at and (now - job.started_at).total_seconds() > job.timeout_seconds:
+                    print(f"Job {job.pk} exceeded {job.timeout_seconds}s, killing worker {worker_id}")
+                    process.kill()
+                    process.join()
+                    self._release_jobs(worker_id, "Job timed out")
+                    self._spawn(slot)
+                    break
+
+    def stop(self, *args):
+        self._stopping = True
+
+    def run(self):
+        from django.db import close_old_connections
+        from ai.jobs import recover_stale_jobs
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Starting {self.size} AI workers")
+        for slot in range(self.size):
+            self._spawn(slot)
+
+        try:
+            while not self._stopping:
+                close_old_connections()
+                try:
+                    self._check_workers()
+                    recover_stale_jobs()
+                except Exception as e:
+                    print(f"Error supervising workers: {str(e)}")
+                time.sleep(self.poll_interval)
+        finally:
+            print("Stopping AI workers...")
+            for _, process in self._slots.values():
+                process.terminate()
+            for worker_id, process in self._slots.values():
+                process.join()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ai.worker import WorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run the pool of AI worker processes that execute queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Number of worker processes (default: AI_WORKERS setting)")
+        parser.add_argument('--kinds', nargs='+', default=None,
+                            help="Only run jobs of these kinds")
+
+    def handle(self, *args, **options):
+        WorkerPool(workers=options['workers'], kinds=options['kinds']).run()
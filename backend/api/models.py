@@ -65,10 +65,10 @@ class Course(models.Model):
 
     def update_difficulty(self):
         total_word_count = 0
-        for week in self.weeks.prefetch_related('materials'):
+        for week in self.weeks.prefetch_related('materials__content'):
             for material in week.materials.all():
-                if material.summarized_material:
-                    total_word_count += len(material.summarized_material.split())
+                if material.summary_text:
+                    total_word_count += len(material.summary_text.split())
         
         if total_word_count < 2000:
             self.difficulty = 'E'
@@ -78,6 +78,19 @@ class Course(models.Model):
             self.difficulty = 'H'
         self.save(update_fields=['difficulty'])
 
+    def update_difficulty_if_complete(self):
+        """Recompute difficulty once every week of the course has material."""
+        weeks_with_materials = self.weeks.annotate(
+            num_materials=models.Count('materials')
+        ).filter(num_materials__gt=0).count()
+
+        if self.weeks.count() == self.duration_weeks and weeks_with_materials == self.duration_weeks:
+            print("All materials for all weeks are uploaded. Updating course difficulty.")
+            self.update_difficulty()
+            print(f"Course difficulty updated to: {self.get_difficulty_display()}")
+            return True
+        return False
+
     def delete(self, *args, **kwargs):
         if self.image:
             self.image.delete(save=False)
@@ -139,8 +152,7 @@ class Course(models.Model):
                     Quiz.objects.create(
                         week=new_week,
                         difficulty=quiz.difficulty,
-                        user_score=0,
-                        questions=quiz.questions.all()
+                        user_score=0
                     )
 
                 for code in week.codes.all():
@@ -187,11 +199,45 @@ class Week(models.Model):
         return f"Week {self.week_number} of {self.course.title}"
 
 
+class MaterialContent(models.Model):
+    """Extracted text and summaries of one uploaded file, shared by hash.
+
+    Uploads are keyed by the SHA-256 of their bytes, so the same file
+    uploaded to several weeks or courses is extracted and summarized once
+    and every ``Material`` made from it references this row. ``version``
+    identifies the extraction and summarization settings the row was made
+    with; uploads under other settings do not reuse it. ``ref_count``
+    counts those materials; the row is deleted when the last one goes
+    (see ``ai.material_store``).
+    """
+    sha256 = models.CharField(max_length=64)
+    version = models.CharField(max_length=64)
+    material = models.TextField()
+    summarized_material = models.TextField(blank=True, null=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['sha256', 'version']
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} references)"
+
+
 class Material(models.Model):
     title = models.CharField(max_length=50)
     description = models.TextField()
-    material = models.TextField()  # this is extracted text for ai client
+    # Extracted text and summary; empty when they are shared through content
+    material = models.TextField(blank=True)  # this is extracted text for ai client
     summarized_material = models.TextField(blank=True, null=True)
+    content = models.ForeignKey(
+        MaterialContent,
+        on_delete=models.PROTECT,
+        related_name='materials',
+        blank=True,
+        null=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_read = models.BooleanField(default=False)
@@ -214,6 +260,65 @@ class Material(models.Model):
         super().save(*args, **kwargs)
         self.week.save()
 
+    @property
+    def extracted_text(self):
+        return self.content.material if self.content_id else self.material
+
+    @property
+    def summary_text(self):
+        return self.content.summarized_material if self.content_id else self.summarized_material
+
+    def summary_for_budget(self, max_tokens):
+        """Most detailed summary level that fits in ``max_tokens``.
+
+        Falls back to the shortest level when none fits, and to
+        ``summary_text`` for materials without stored levels.
+        """
+        owner = self.content if self.content_id else self
+        levels = list(owner.summary_levels.order_by('level'))
+        if not levels:
+            return self.summary_text
+        for level in levels:
+            if level.token_count <= max_tokens:
+                return level.text
+        return levels[-1].text
+
+
+class MaterialSummaryLevel(models.Model):
+    """One level of a hierarchical material summary.
+
+    Level 1 is the chunk-by-chunk summary stored in
+    ``summarized_material``; every further level re-summarizes the previous
+    one until it fits the configured token budget. Levels belong to the
+    shared ``MaterialContent`` when there is one, otherwise to the material.
+    """
+    material = models.ForeignKey(
+        Material,
+        on_delete=models.CASCADE,
+        related_name='summary_levels',
+        blank=True,
+        null=True
+    )
+    content = models.ForeignKey(
+        MaterialContent,
+        on_delete=models.CASCADE,
+        related_name='summary_levels',
+        blank=True,
+        null=True
+    )
+    level = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
+    text = models.TextField()
+    token_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [['material', 'level'], ['content', 'level']]
+        ordering = ['material', 'level']
+
+    def __str__(self):
+        owner = self.content if self.content_id else self.material
+        return f"Level {self.level} summary of {owner}"
+
 
 class Question(models.Model):
     DIFFICULTY_CHOICES = [
@@ -244,6 +349,10 @@ class Question(models.Model):
     question_text = models.TextField()
     answer = models.TextField()
     explanation = models.TextField()
+    # Embedding of ``answer`` for open-answer pre-grading (see ai.embeddings);
+    # answer_embedding_key changes when the answer or the model does.
+    answer_embedding = models.BinaryField(null=True, blank=True, editable=False)
+    answer_embedding_key = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -291,6 +400,12 @@ class Quiz(models.Model):
         choices=DIFFICULTY_LEVEL_CHOICES,
         default='S'
     )
+    # The questions last served to the user, which submissions are graded against
+    questions = models.ManyToManyField(
+        Question,
+        blank=True,
+        related_name='quizzes'
+    )
     user_score = models.PositiveSmallIntegerField(
         default=0,
         validators=[MinValueValidator(0), MaxValueValidator(100)]
@@ -354,6 +469,12 @@ class Quiz(models.Model):
 
         return selected_questions
 
+    def draw_questions(self):
+        """Pick a new set of questions and record it as the quiz's current set"""
+        questions = self.get_questions()
+        self.questions.set(questions)
+        return questions
+
     def get_difficulty_distribution(self):
         distributions = {
             'N': {'B': 40, 'K': 30, 'I': 15, 'A': 10, 'E': 5},    # Normal
@@ -385,10 +506,74 @@ class Code(models.Model):
     problem_statement = models.TextField()
     solution = models.TextField()
     template_code = models.TextField()
+    # [{"call": "<expression>", "expected": "<JSON>"}, ...] run by ai.sandbox
+    test_cases = models.JSONField(default=list, blank=True)
     user_code = models.TextField(default="")
+    # Result of the last evaluate_coding_solution call and the key it was
+    # computed for (see ai.submission_cache)
+    last_evaluation = models.JSONField(null=True, blank=True)
+    last_evaluation_key = models.CharField(max_length=64, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     user_score = models.PositiveSmallIntegerField(
         default=0,
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
+
+
+class SummaryCacheEntry(models.Model):
+    """Summary of a document or chunk, keyed by a hash of its normalized text,
+    the summarization model and the generation parameters."""
+    KIND_CHOICES = [
+        ('D', 'Document'),
+        ('C', 'Chunk'),
+    ]
+
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES, default='C')
+    summary = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} summary {self.key[:12]}"
+
+
+class BackgroundJob(models.Model):
+    """Unit of work handed from the web tier to the AI worker processes."""
+    STATUS_CHOICES = [
+        ('Q', 'Queued'),
+        ('R', 'Running'),
+        ('D', 'Done'),
+        ('F', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    result = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='Q')
+    stage = models.CharField(max_length=50, blank=True, default="")
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    timeout_seconds = models.PositiveIntegerField(default=30 * 60)
+    worker_id = models.CharField(max_length=100, blank=True, default="")
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.pk} ({self.get_status_display()})"
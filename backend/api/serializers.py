@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Course, Week, Question, Material, User, Quiz, Code
+from .models import Course, Week, Question, Material, User, Quiz, Code, BackgroundJob
 from django.contrib.auth.hashers import make_password, check_password
 from django.contrib.auth.password_validation import validate_password
 from django.utils.text import slugify
@@ -104,6 +104,8 @@ class MaterialRetrieveSerializer(serializers.ModelSerializer):
 
 
 class MaterialSerializer(serializers.ModelSerializer):
+    summarized_material = serializers.CharField(source='summary_text', read_only=True, allow_null=True)
+
     class Meta:
         model = Material
         fields = ['title', 'description', 'summarized_material']
@@ -114,6 +116,23 @@ class MaterialCreateSerializer(serializers.ModelSerializer):
         model = Material
         fields = ['title', 'description']
 
+
+class MaterialJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source='pk', read_only=True)
+    status_display = serializers.SerializerMethodField()
+    material_id = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BackgroundJob
+        fields = ['job_id', 'status', 'status_display', 'stage', 'progress',
+                  'error', 'attempts', 'material_id', 'created_at', 'finished_at']
+
+    def get_status_display(self, obj):
+        return obj.get_status_display()
+
+    def get_material_id(self, obj):
+        return (obj.result or {}).get('material_id')
+
 # ====================#
 
 # Questions Section
@@ -182,8 +201,7 @@ class QuizSerializer(serializers.ModelSerializer):
         return obj.get_passing_requirement_display()
         
     def get_questions(self, obj):
-        questions = obj.get_questions()
-        return QuestionSerializer(questions, many=True).data
+        return QuestionSerializer(obj.questions.all(), many=True).data
 
 
 # ====================#
@@ -195,7 +213,8 @@ class CodeCreateSerializer(serializers.ModelSerializer):
             'problem_statement',
             'solution',
             'template_code',
-            'user_code'
+            'user_code',
+            'test_cases'
         ]
 
 
@@ -311,4 +330,4 @@ class CourseListSerializer(serializers.ModelSerializer):
 class QuestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Question
-        fields = '__all__'
+        exclude = ['answer_embedding', 'answer_embedding_key']
@@ -1,7 +1,15 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Course
+from .models import Course, Material
+
+
+@receiver(post_delete, sender=Material)
+def release_material_content(sender, instance, **kwargs):
+    """Drop the deleted material's reference to its shared extracted text."""
+    if instance.content_id:
+        from ai import material_store
+        material_store.release(instance.content_id)
 
 # User = get_user_model()
 
@@ -12,7 +12,8 @@ from api.views import (
     QuestionViewSet,
     QuizViewSet,
     MaterialViewSet,
-    CodeViewSet
+    CodeViewSet,
+    ai_stats
 )
 from rest_framework.routers import DefaultRouter
 
@@ -42,4 +43,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('ai/stats/', ai_stats, name='ai_stats'),
 ]
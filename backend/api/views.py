@@ -1,11 +1,17 @@
-from rest_framework.decorators import api_view, APIView, action
+from rest_framework.decorators import api_view, APIView, action, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 import random
-from ai.services import compare_coding_solutions, generate_questions_for_week, compare_open_answers, generate_coding_problems_for_week
-from api.models import Course, Week, Question, Material, User, Quiz, Code
+from ai.services import evaluate_code_submission, generate_questions_for_week, grade_open_answers, generate_coding_problems_for_week, stream_questions_for_week
+from ai import llm, material_store, sandbox, submission_cache
+from ai.grading import grade_quiz
+from ai.model_manager import model_manager
+from ai.summary_cache import summary_cache
+from ai.grading_cache import grading_cache
+from ai.embeddings import pregrader
+from api.models import Course, Week, Question, Material, User, Quiz, Code, BackgroundJob
 from api.serializers import CourseSerializer, QuestionSerializer, QuizSerializer, WeekSerializer
-from file_manager.file_manager import extract_text, process_material_file
+from ai.tasks import start_material_ingestion
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from rest_framework import generics
@@ -14,7 +20,8 @@ from api.serializers import (CourseSerializer,
                              PasswordChangeSerializer, UserPublicSerializer, AdminSerializer, CourseCreateSerializer, CourseRetrieveSerializer,
                              CourseListSerializer, WeekCreateSerializer, MaterialCreateSerializer,
                              QuestionCreateSerializer, QuizCreateSerializer, CodeSerializer,
-                             CodeCreateSerializer, QuizListSerializer, QuizSerializer, CodeListSerializer)
+                             CodeCreateSerializer, QuizListSerializer, QuizSerializer, CodeListSerializer,
+                             MaterialJobSerializer)
 
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
@@ -29,7 +36,6 @@ from django.db.models import Q, Count
 from api.pagination import StandardResultsSetPagination
 from rest_framework import mixins, viewsets
 from django.db import transaction
-from concurrent.futures import ThreadPoolExecutor
 from api.permissions import IsCourseOwner, IsWeekOwner, IsMaterialOwner, IsQuizOwner
 
 
@@ -434,7 +440,7 @@ class WeekViewSet(mixins.CreateModelMixin,
         user = self.request.user
         title_slug = self.kwargs['title_slug']
         week_number = self.kwargs[self.lookup_field]
-        queryset = Week.objects.prefetch_related('materials').select_related(
+        queryset = Week.objects.prefetch_related('materials__content').select_related(
             'course',
             'course__user').filter(
             course__title_slug=title_slug,
@@ -546,19 +552,14 @@ class MaterialViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     permission_classes = [IsAuthenticated]
     parser_classes = (JSONParser, MultiPartParser, FormParser)
 
-    def process_material_file(self, file):
-        """Process uploaded material file and return extracted text and summary. 
-        Args:
-            file: Uploaded file object
-            week: Week instance to associate with material      
-        Returns:
-            tuple: (extracted_text, summarized_text)       
-        Raises:
-            ValueError: If file processing fails
-        """
-        return process_material_file(file)
-
     def create(self, request, *args, **kwargs):
+        """Store the upload and queue its ingestion.
+
+        Extraction and summarization continue in the background; the
+        response is 202 Accepted with a job id to poll at
+        ``materials/jobs/<job_id>/``. The Material row is created once
+        summarization finishes.
+        """
         try:
             print("Starting material creation process...")
             user = request.user
@@ -603,22 +604,7 @@ class MaterialViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
 
             print(f"File type validated: {file_ext}")
 
-            # Process file
-            try:
-                print("Starting file processing...")
-                material, summarized_material = self.process_material_file(
-                    file)
-                print(
-                    f"File processed. Material length: {len(material)}, Summary length: {len(summarized_material)}")
-            except ValueError as e:
-                print(f"Error processing file: {str(e)}")
-                return Response(
-                    {'detail': str(e)},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Create material
-            print("Creating material record...")
+            # Validate title and description before doing any work
             serializer = self.get_serializer(data=request.data)
             if not serializer.is_valid():
                 print(f"Serializer validation failed: {serializer.errors}")
@@ -627,30 +613,17 @@ class MaterialViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            serializer.save(
-                material=material,
-                summarized_material=summarized_material,
-                week=week
+            job = start_material_ingestion(
+                week,
+                file,
+                title=serializer.validated_data['title'],
+                description=serializer.validated_data['description']
             )
-            print("Material record created successfully")
-
-            course = week.course
-            weeks_with_materials = course.weeks.annotate(
-                num_materials=Count('materials')
-            ).filter(num_materials__gt=0).count()
+            print(f"Material ingestion queued as job {job.pk}")
 
-            if course.weeks.count() == course.duration_weeks and weeks_with_materials == course.duration_weeks:
-                print("All materials for all weeks are uploaded. Updating course difficulty.")
-                course.update_difficulty()
-                print(
-                    f"Course difficulty updated to: {course.get_difficulty_display()}")
-
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                serializer.data,
-                status=status.HTTP_201_CREATED,
-                headers=headers
-            )
+            data = MaterialJobSerializer(job).data
+            data['status_url'] = request.build_absolute_uri(f'jobs/{job.pk}/')
+            return Response(data, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             print(f"Error in material creation: {str(e)}")
@@ -659,6 +632,23 @@ class MaterialViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['GET'], url_path=r'jobs/(?P<job_id>\d+)')
+    def job_status(self, request, *args, **kwargs):
+        """Report stage, percent complete and errors of a material ingestion job."""
+        week = get_object_or_404(
+            Week.objects.select_related('course'),
+            course__title_slug=self.kwargs['title_slug'],
+            week_number=self.kwargs['week_number'],
+            course__user=request.user
+        )
+        job = get_object_or_404(
+            BackgroundJob,
+            pk=self.kwargs['job_id'],
+            kind='ingest_material',
+            payload__week_id=week.pk
+        )
+        return Response(MaterialJobSerializer(job).data, status=status.HTTP_200_OK)
+
 # ====================#
 
 # Question section
@@ -693,7 +683,18 @@ class QuestionViewSet(mixins.CreateModelMixin,
         if week.course.user != user:
             return Response({'detail': 'Not allowed to add Questions to this course.'}, status=status.HTTP_403_FORBIDDEN)
 
-        question_data = generate_questions_for_week(week=week)
+        if getattr(settings, 'QUESTION_STREAMING', True):
+            # Questions are saved in batches while they are generated
+            try:
+                created = stream_questions_for_week(week=week)
+            except llm.LLMUnavailable as e:
+                return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+        try:
+            question_data = generate_questions_for_week(week=week)
+        except llm.LLMUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         serializer = self.get_serializer(many=True, data=question_data)
 
         serializer.is_valid(raise_exception=True)
@@ -766,12 +767,12 @@ class QuizViewSet(mixins.RetrieveModelMixin,
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Get questions for this quiz using the model's method
-        questions = instance.get_questions()
+        if isinstance(instance, Response):
+            return instance
+        # Draw this attempt's questions; grading is checked against them
+        instance.draw_questions()
         serializer = self.get_serializer(instance)
-        data = serializer.data
-        data['questions'] = QuestionSerializer(questions, many=True).data
-        return Response(data)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='create_quizzes')
     def create_quizzes(self, request, *args, **kwargs):
@@ -815,15 +816,11 @@ class QuizViewSet(mixins.RetrieveModelMixin,
         try:
             with transaction.atomic():
                 instance = self.get_object()
-                week = instance.week  # Get the week object from the instance
-                difficulty = self.kwargs[self.lookup_field]
-
-                # Get new questions
-                new_questions = self.get_questions(
-                    week=week, difficulty=difficulty)
+                if isinstance(instance, Response):
+                    return instance
 
-                # Update the quiz
-                instance.questions.set(new_questions)
+                # Draw a new set of questions for the quiz
+                instance.draw_questions()
 
                 # Serialize the updated instance
                 serializer = self.get_serializer(instance)
@@ -838,31 +835,45 @@ class QuizViewSet(mixins.RetrieveModelMixin,
                 'error': f'Failed to update quiz: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['put'], url_path='set_user_score')
-    def set_user_score(self, request, *args, **kwargs):
-        try:
-            new_score = request.data.get('user_score')
-            if new_score is None:
-                return Response({'error': 'user_score is required'}, status=status.HTTP_400_BAD_REQUEST)
+    @action(detail=True, methods=['post'], url_path='grade')
+    def grade(self, request, *args, **kwargs):
+        """Grade a submitted quiz and store the score.
 
-            try:
-                new_score = float(new_score)
-                if not 0 <= new_score <= 100:
-                    return Response({'error': 'Score must be between 0 and 100'}, status=status.HTTP_400_BAD_REQUEST)
-            except ValueError:
-                return Response({'error': 'Invalid score format'}, status=status.HTTP_400_BAD_REQUEST)
+        Body: ``{"answers": [{"id": <question id>, "user_answer": ...}, ...]}``.
+        The quiz is graded against the questions last served for it, not the
+        submitted ids: answers to other questions are ignored and unanswered
+        questions count as wrong. Closed question types are graded locally,
+        open ones by the LLM.
+        """
+        answers = request.data.get('answers')
+        if not isinstance(answers, list):
+            return Response({'error': 'answers must be an array'}, status=status.HTTP_400_BAD_REQUEST)
 
-            instance = self.get_object()
-            instance.user_score = new_score
-            instance.save()
+        instance = self.get_object()
+        if isinstance(instance, Response):
+            return instance
 
-            return Response({
-                'message': 'Score updated successfully',
-                'new_score': new_score
-            }, status=status.HTTP_200_OK)
+        try:
+            user_answers = {int(item['id']): item.get('user_answer') for item in answers}
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Every answer needs a question id'}, status=status.HTTP_400_BAD_REQUEST)
+        questions = list(instance.questions.all())
+        if not questions:
+            return Response({'error': 'Open the quiz before submitting answers'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        use_cache = request.query_params.get('refresh') not in ('1', 'true')
+        result = grade_quiz(questions, user_answers, use_cache=use_cache)
+
+        instance.user_score = round(result['score'])
+        instance.save(update_fields=['user_score', 'updated_at'])
+
+        passing_score = dict(Quiz.PASSING_THRESHOLD)[instance.passing_requirement]
+        return Response({
+            **result,
+            'passing_score': passing_score,
+            'passed': result['score'] >= passing_score,
+        }, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'], url_path='evaluate_open_questions')
     def evaluate_open_questions(self, request, *args, **kwargs):
@@ -871,22 +882,12 @@ class QuizViewSet(mixins.RetrieveModelMixin,
             return Response({
                 'error': 'Request body must be an array'
             }, status=status.HTTP_400_BAD_REQUEST)
+        # ?refresh=1 regrades instead of reusing cached grades
+        use_cache = request.query_params.get('refresh') not in ('1', 'true')
 
-        def process_item(item):
-            id = item['id']
-            user_answer = item['user_answer']
-            answer = item['answer']
-            result = {'id': id}
-            result.update(compare_open_answers(answer, user_answer))
-            return result
-
-        # Calculate optimal number of workers
-        cpu_count = os.cpu_count() or 4  # fallback to 4 if cpu_count returns None
-        # cap at 32 to prevent resource exhaustion
-        max_workers = min(32, (2 * cpu_count) + 1)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(process_item, items))
+        grades = grade_open_answers(
+            [(item['answer'], item['user_answer']) for item in items], use_cache=use_cache)
+        results = [{'id': item['id'], **grade} for item, grade in zip(items, grades)]
 
         return Response(results, status=status.HTTP_200_OK)
 
@@ -1017,6 +1018,11 @@ class CodeViewSet(mixins.CreateModelMixin,
                     } for code in created_codes]
                 }, status=status.HTTP_201_CREATED)
 
+        except llm.LLMUnavailable as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except ValueError as e:
             return Response(
                 {'error': str(e)},
@@ -1030,11 +1036,35 @@ class CodeViewSet(mixins.CreateModelMixin,
 
     @action(detail=True, methods=['POST'])
     def evaluate_coding_solution(self, request, *arg, **kwargs):
+        """Run the submission against the problem's test cases; see
+        ai.services.evaluate_code_submission."""
         items = request.data
-        problem_statement = items['problem_statement']
-        solution = items['solution']
         user_solution = items['user_solution']
-        programming_language = items['programming_language']
-        result = compare_coding_solutions(
-            problem_statement, solution, user_solution, programming_language)
+        instance = self.get_object()
+        programming_language = items.get('programming_language') or instance.week.course.language
+        # ?refresh=1 re-evaluates instead of returning the stored result
+        use_cache = request.query_params.get('refresh') not in ('1', 'true')
+        result = evaluate_code_submission(
+            instance, user_solution, programming_language, use_cache=use_cache)
         return Response(result, status=status.HTTP_200_OK)
+
+# ====================#
+
+
+# AI section
+# ====================#
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_stats(request):
+    """Runtime statistics of the AI layer in this worker process."""
+    return Response({
+        'models': model_manager.get_stats(),
+        'summary_cache': summary_cache.get_stats(),
+        'grading_cache': grading_cache.get_stats(),
+        'pregrader': pregrader.get_stats(),
+        'sandbox': sandbox.get_pool().get_stats(),
+        'submission_cache': submission_cache.get_stats(),
+        'material_store': material_store.get_stats(),
+        'llm': llm.get_stats(),
+        'jobs': dict(BackgroundJob.objects.values_list('status').annotate(count=Count('pk'))),
+    }, status=status.HTTP_200_OK)
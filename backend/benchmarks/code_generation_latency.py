@@ -0,0 +1,152 @@
+"""Wall-clock latency of coding problem generation: one prompt vs per difficulty.
+
+Starts a local stub of the chat completions API that "writes" at a fixed
+token rate, so a reply takes time proportional to its length like the real
+provider, and drops a share of the requested problems to mimic incomplete
+replies. Times ai.services.generate_coding_problems in "single" mode (all
+difficulties in one completion) and "parallel" mode (one JSON-mode request
+per difficulty plus a top-up round).
+
+    python -m benchmarks.code_generation_latency --per-difficulty 3 --tokens-per-sec 60
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.utils import print_table, sample_text, setup_django
+
+CHARS_PER_TOKEN = 4
+SINGLE_PROMPT = re.compile(r'Generate (\d+) coding challenges for each difficulty level')
+JSON_PROMPT = re.compile(r'Generate (\d+) (Easy|Medium|Hard) coding challenges')
+
+
+class GenerationStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    first_token_ms = 500
+    tokens_per_sec = 60
+    problem_tokens = 350
+    drop_rate = 0.1
+    rng = random.Random(0)
+    lock = threading.Lock()
+    calls = 0
+
+    def _dropped(self):
+        with self.lock:
+            return self.rng.random() < self.drop_rate
+
+    def _problem(self, index):
+        body = "x" * (self.problem_tokens * CHARS_PER_TOKEN // 3)
+        return {
+            'problem_statement': f"Problem {index}: {body}",
+            'solution': f"def solve_{index}(x):\n    return x  # {body}",
+            'template': f"def solve_{index}(x):\n    # TODO {body}\n    pass",
+            'tests': [{'call': f"solve_{index}(1)", 'expected': 1}],
+        }
+
+    def _reply(self, prompt):
+        single = SINGLE_PROMPT.search(prompt)
+        if single:
+            blocks = []
+            for difficulty in ('E', 'M', 'H'):
+                for i in range(int(single.group(1))):
+                    if self._dropped():
+                        continue
+                    problem = self._problem(f"{difficulty}{i}")
+                    blocks.append(
+                        f"Problem Statement: {problem['problem_statement']}\n"
+                        f"Solution: {problem['solution']}\n"
+                        f"Template: {problem['template']}\n"
+                        f"Tests:\nsolve_{difficulty}{i}(1) => 1\n"
+                        f"Difficulty: {difficulty}")
+            return "\n==============\n".join(blocks)
+        requested = JSON_PROMPT.search(prompt)
+        count = int(requested.group(1)) if requested else 1
+        return json.dumps({'problems': [
+            self._problem(i) for i in range(count) if not self._dropped()]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        with self.lock:
+            GenerationStub.calls += 1
+        reply = self._reply(body['messages'][0]['content'])
+        output_tokens = len(reply) // CHARS_PER_TOKEN
+        time.sleep(self.first_token_ms / 1000 + output_tokens / self.tokens_per_sec)
+
+        payload = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'deepseek-chat',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': reply}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': output_tokens,
+                      'total_tokens': output_tokens},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--per-difficulty', type=int, default=3)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--tokens-per-sec', type=float, default=60)
+    parser.add_argument('--first-token-ms', type=float, default=500)
+    parser.add_argument('--problem-tokens', type=int, default=350)
+    parser.add_argument('--drop-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    GenerationStub.tokens_per_sec = args.tokens_per_sec
+    GenerationStub.first_token_ms = args.first_token_ms
+    GenerationStub.problem_tokens = args.problem_tokens
+    GenerationStub.drop_rate = args.drop_rate
+
+    setup_django()
+    from django.conf import settings
+    from ai.services import generate_coding_problems
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GenerationStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.LLM_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    settings.LLM_REQUESTS_PER_MINUTE = 10 ** 6
+    settings.LLM_TOKENS_PER_MINUTE = 10 ** 9
+    os.environ.setdefault('DEEPSEEK_API_KEY', 'stub')
+    summary = sample_text(paragraphs=20)
+
+    rows = []
+    for mode in ('single', 'parallel'):
+        walls, calls, counts = [], [], []
+        for run in range(args.runs):
+            GenerationStub.rng.seed(run)
+            GenerationStub.calls = 0
+            started = time.perf_counter()
+            codes = generate_coding_problems(summary, 'python', args.per_difficulty, mode=mode)
+            walls.append(time.perf_counter() - started)
+            calls.append(GenerationStub.calls)
+            counts.append({d: sum(1 for c in codes if c['difficulty'] == d) for d in 'EMH'})
+        rows.append({
+            'mode': mode,
+            'wall_s': round(statistics.mean(walls), 2),
+            'max_wall_s': round(max(walls), 2),
+            'calls': round(statistics.mean(calls), 1),
+            'problems': round(statistics.mean(sum(c.values()) for c in counts), 1),
+            'complete_runs': f"{sum(all(v == args.per_difficulty for v in c.values()) for c in counts)}/{args.runs}",
+        })
+    server.shutdown()
+
+    print(f"{args.per_difficulty} problems per difficulty, {args.tokens_per_sec:g} tokens/s, "
+          f"{args.drop_rate:.0%} of problems dropped by the stub")
+    print_table(rows, ['mode', 'wall_s', 'max_wall_s', 'calls', 'problems', 'complete_runs'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Tokens and wall time per quiz for single vs batched open-answer grading.
+
+Starts a local stub of the chat completions API that answers both the
+single and the batched grading prompts and counts prompt/completion tokens
+the way the provider bills them (estimated at CHARS_PER_TOKEN). Each quiz is
+graded through ai.services.grade_open_answers with the grading cache off.
+
+    python -m benchmarks.grading_batching --questions 20 --latency-ms 800
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.utils import print_table, sample_text, setup_django
+
+CHARS_PER_TOKEN = 4
+ITEM_LINE = re.compile(r'^(\d+)\.$', re.MULTILINE)
+
+
+class GradingStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_latency = 0.0
+    lock = threading.Lock()
+    counters = {}
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.counters = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        prompt = body['messages'][0]['content']
+        items = ITEM_LINE.findall(prompt)
+        reply = "\n".join(f"{index}|true" for index in items) if items else "true"
+        usage = {
+            'prompt_tokens': len(prompt) // CHARS_PER_TOKEN,
+            'completion_tokens': len(reply) // CHARS_PER_TOKEN + 1,
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        with self.lock:
+            self.counters['calls'] += 1
+            self.counters['prompt_tokens'] += usage['prompt_tokens']
+            self.counters['completion_tokens'] += usage['completion_tokens']
+        if self.server_latency:
+            time.sleep(self.server_latency)
+
+        payload = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'deepseek-chat',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': reply}}],
+            'usage': usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_quiz(questions, seed):
+    rng = random.Random(seed)
+    sentences = sample_text(paragraphs=questions, seed=seed).replace("\n\n", " ").split(". ")
+    return [(rng.choice(sentences), rng.choice(sentences)) for _ in range(questions)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--quizzes', type=int, default=5)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[5, 10, 20])
+    parser.add_argument('--latency-ms', type=float, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from ai.services import grade_open_answers
+
+    GradingStub.server_latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GradingStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.LLM_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    settings.GRADING_CACHE_ENABLED = False
+    settings.LLM_REQUESTS_PER_MINUTE = 10 ** 6
+    settings.LLM_TOKENS_PER_MINUTE = 10 ** 9
+    os.environ.setdefault('DEEPSEEK_API_KEY', 'stub')
+
+    quizzes = [make_quiz(args.questions, seed) for seed in range(args.quizzes)]
+    configs = [('single', 1)] + [('batched', size) for size in args.batch_sizes]
+
+    rows = []
+    for mode, batch_size in configs:
+        settings.GRADING_MODE = mode
+        GradingStub.reset()
+        started = time.perf_counter()
+        for quiz in quizzes:
+            grade_open_answers(quiz, batch_size=batch_size)
+        wall = time.perf_counter() - started
+        counters = GradingStub.counters
+        rows.append({
+            'mode': mode,
+            'batch_size': batch_size,
+            'calls/quiz': round(counters['calls'] / args.quizzes, 1),
+            'prompt_tok/quiz': counters['prompt_tokens'] // args.quizzes,
+            'completion_tok/quiz': counters['completion_tokens'] // args.quizzes,
+            'wall_ms/quiz': round(wall / args.quizzes * 1000, 1),
+        })
+    server.shutdown()
+
+    print(f"{args.quizzes} quizzes x {args.questions} open questions, "
+          f"stub latency {args.latency_ms:g} ms")
+    print_table(rows, ['mode', 'batch_size', 'calls/quiz', 'prompt_tok/quiz',
+                       'completion_tok/quiz', 'wall_ms/quiz'])
+
+
+if __name__ == '__main__':
+    main()
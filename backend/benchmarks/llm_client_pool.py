@@ -0,0 +1,144 @@
+"""Latency saved by the shared, pooled LLM client.
+
+Starts a local stub of the chat completions API and times calls made the
+old way (a new OpenAI client, and so a new connection, per call) against
+calls through the shared client from ai.client, both sequentially and from
+a thread pool like evaluate_open_questions uses. With --tls the stub serves
+HTTPS with a throwaway self-signed certificate (needs the openssl CLI), so
+the handshake cost is included.
+
+    python -m benchmarks.llm_client_pool --calls 200 --threads 32 --tls
+"""
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.utils import print_table, setup_django
+
+COMPLETION = json.dumps({
+    'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'deepseek-chat',
+    'choices': [{'index': 0, 'finish_reason': 'stop',
+                 'message': {'role': 'assistant', 'content': 'true'}}],
+    'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server_latency:
+            time.sleep(self.server_latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def _self_signed_cert(directory):
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1',
+         '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def start_stub(latency_ms, cert=None, key=None):
+    StubHandler.server_latency = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    scheme = 'http'
+    if cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def _call(client):
+    started = time.perf_counter()
+    client.chat.completions.create(
+        model='deepseek-chat', messages=[{'role': 'user', 'content': 'ping'}])
+    return time.perf_counter() - started
+
+
+def _measure(label, make_client, calls, threads):
+    def one(_):
+        return _call(make_client())
+
+    started = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            latencies = list(executor.map(one, range(calls)))
+    else:
+        latencies = [one(i) for i in range(calls)]
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'client': label,
+        'threads': threads,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+        'calls/sec': round(calls / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--tls', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from openai import OpenAI
+    import httpx
+    from ai import client as ai_client
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = _self_signed_cert(tmp) if args.tls else (None, None)
+        server, base_url = start_stub(args.latency_ms, cert, key)
+        settings.LLM_BASE_URL = base_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'stub')
+        verify = cert or True
+
+        def fresh_client():
+            # What get_ai_client() used to do on every call
+            return OpenAI(api_key='stub', base_url=base_url,
+                          http_client=httpx.Client(verify=verify))
+
+        shared = ai_client.build_client(base_url, 'stub', verify=verify)
+
+        rows = []
+        for threads in (1, args.threads):
+            rows.append(_measure('new per call', fresh_client, args.calls, threads))
+            rows.append(_measure('shared pool', lambda: shared, args.calls, threads))
+        server.shutdown()
+
+    for fresh, pooled in zip(rows[::2], rows[1::2]):
+        pooled['saved_ms/call'] = round(fresh['mean_ms'] - pooled['mean_ms'], 2)
+    print_table(rows, ['client', 'threads', 'mean_ms', 'p95_ms', 'calls/sec', 'saved_ms/call'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare the PDF text extraction engines over a local corpus.
+
+Every engine runs in its own process, extracting each PDF of the corpus
+page by page without the process pool, and reports pages/sec, peak RSS,
+extracted characters and pages that failed. Engines that are not installed
+are listed as unavailable. Without --corpus a few synthetic PDFs are used.
+
+    python -m benchmarks.pdf_engines --corpus ~/pdfs --engines pypdf2 pypdf pdfminer pypdfium2
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.utils import peak_rss_mb, print_table, run_isolated, synthetic_pdf
+
+
+def _run(engine, paths):
+    from file_manager import pdf
+
+    pages = chars = failed = 0
+    seconds = 0.0
+    try:
+        for path in paths:
+            started = time.perf_counter()
+            document = pdf.open_document(engine, path)
+            try:
+                results = pdf._extract_pages(document, 0, document.page_count)
+            finally:
+                document.close()
+            seconds += time.perf_counter() - started
+            pages += len(results)
+            chars += sum(len(text) for text, _ in results)
+            failed += sum(1 for _, error in results if error)
+    except ImportError as e:
+        return {'engine': engine, 'status': f"unavailable ({e.name})"}
+
+    return {
+        'engine': engine,
+        'status': 'ok',
+        'pages': pages,
+        'seconds': round(seconds, 2),
+        'pages/sec': round(pages / seconds, 1) if seconds else '',
+        'peak_rss_mb': round(peak_rss_mb()),
+        'chars': chars,
+        'failed_pages': failed,
+    }
+
+
+def main():
+    from file_manager.pdf import PDF_ENGINES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', type=Path, help="directory searched recursively for *.pdf")
+    parser.add_argument('--engines', nargs='+', default=list(PDF_ENGINES), choices=list(PDF_ENGINES))
+    parser.add_argument('--synthetic-pages', type=int, nargs='+', default=[20, 150, 400])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(str(path) for path in args.corpus.rglob('*.pdf'))
+        else:
+            paths = []
+            for seed, pages in enumerate(args.synthetic_pages):
+                path = os.path.join(tmp, f'synthetic-{pages}.pdf')
+                Path(path).write_bytes(synthetic_pdf(pages, seed=seed))
+                paths.append(path)
+        if not paths:
+            parser.error(f"No PDFs found under {args.corpus}")
+
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+        rows = [run_isolated(_run, engine, paths) for engine in args.engines]
+
+    print(f"{len(paths)} PDFs, {size_mb:.1f} MB")
+    print_table(rows, ['engine', 'status', 'pages', 'seconds', 'pages/sec',
+                       'peak_rss_mb', 'chars', 'failed_pages'])
+
+
+if __name__ == '__main__':
+    main()
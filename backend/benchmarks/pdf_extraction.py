@@ -0,0 +1,76 @@
+"""Pages per second of PDF text extraction, sequential vs process pool.
+
+Builds a synthetic text PDF and extracts it with file_manager.pdf using 1
+(sequential) and N worker processes, both from a path on disk and from an
+in-memory buffer (handed to workers through shared memory). Also checks
+that every run returns the same text as the sequential one.
+
+    python -m benchmarks.pdf_extraction --pages 600 --workers 1 2 4 8
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.utils import print_table, setup_django, synthetic_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=600)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--pages-per-task', type=int, default=25)
+    parser.add_argument('--runs', type=int, default=2)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from file_manager import pdf
+
+    data = synthetic_pdf(args.pages)
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as file:
+        file.write(data)
+    settings.PDF_PARALLEL_PAGES_PER_TASK = args.pages_per_task
+    settings.PDF_PARALLEL_MIN_PAGES = 1
+
+    rows, reference = [], None
+    try:
+        for workers in sorted(set(args.workers)):
+            settings.PDF_PARALLEL_WORKERS = workers
+            pdf.shutdown_pool()
+            if workers > 1:
+                # Start the workers outside the timed runs
+                pdf.get_pool().submit(os.getpid).result()
+            for source in ('path', 'memory'):
+                best, text = None, None
+                for _ in range(args.runs):
+                    stream = file.name if source == 'path' else io.BytesIO(data)
+                    started = time.perf_counter()
+                    text = pdf.extract_text(stream)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                reference = reference if reference is not None else text
+                rows.append({
+                    'workers': workers,
+                    'source': source,
+                    'seconds': round(best, 2),
+                    'pages/sec': round(args.pages / best, 1),
+                    'chars': len(text),
+                    'same_text': text == reference,
+                })
+    finally:
+        pdf.shutdown_pool()
+        os.unlink(file.name)
+
+    sequential = {row['source']: row['seconds'] for row in rows if row['workers'] == 1}
+    for row in rows:
+        if row['source'] in sequential:
+            row['speedup'] = round(sequential[row['source']] / row['seconds'], 2)
+
+    print(f"{args.pages} pages, {len(data) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+    print_table(rows, ['workers', 'source', 'seconds', 'pages/sec', 'speedup', 'chars', 'same_text'])
+
+
+if __name__ == '__main__':
+    main()
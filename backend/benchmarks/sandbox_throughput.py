@@ -0,0 +1,81 @@
+"""Submissions per second through the sandboxed test runner.
+
+Submits a small Python solution with a handful of test cases from N client
+threads at once, with and without pre-started sandbox processes, and
+reports throughput and latency percentiles.
+
+    python -m benchmarks.sandbox_throughput --submissions 200 --concurrency 1 4 8
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import print_table, setup_django
+
+SOLUTION = '''
+class Solution:
+    def two_sum(self, nums, target):
+        seen = {}
+        for i, n in enumerate(nums):
+            if target - n in seen:
+                return [seen[target - n], i]
+            seen[n] = i
+        return []
+'''
+
+TESTS = [
+    {'call': 'Solution().two_sum([2, 7, 11, 15], 9)', 'expected': '[0, 1]'},
+    {'call': 'Solution().two_sum([3, 2, 4], 6)', 'expected': '[1, 2]'},
+    {'call': 'Solution().two_sum([3, 3], 6)', 'expected': '[0, 1]'},
+    {'call': 'Solution().two_sum(list(range(10000)), 19997)', 'expected': '[9998, 9999]'},
+    {'call': 'Solution().two_sum([1, 2], 7)', 'expected': '[]'},
+]
+
+
+def _measure(pool, submissions, concurrency):
+    def submit(_):
+        started = time.perf_counter()
+        result = pool.run('python', SOLUTION, TESTS)
+        assert result['passed'] == len(TESTS), result
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(submit, range(submissions)))
+    wall = time.perf_counter() - started
+    return {
+        'submissions/sec': round(submissions / wall, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--warm', type=int, default=4, help="pre-started processes for the warm pool")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from ai.sandbox import SandboxPool
+
+    rows = []
+    for concurrency in args.concurrency:
+        settings.SANDBOX_MAX_CONCURRENCY = concurrency
+        for label, warm in (('cold', 0), ('warm', args.warm)):
+            pool = SandboxPool(warm_workers=warm)
+            pool.prestart(['python'])
+            row = _measure(pool, args.submissions, concurrency)
+            stats = pool.get_stats()
+            pool.shutdown()
+            rows.append({'pool': label, 'concurrency': concurrency,
+                         'cold_starts': stats['cold_starts'], **row})
+
+    print_table(rows, ['pool', 'concurrency', 'submissions/sec', 'p50_ms', 'p95_ms', 'cold_starts'])
+
+
+if __name__ == '__main__':
+    main()
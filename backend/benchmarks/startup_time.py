@@ -0,0 +1,100 @@
+"""Measure what importing the AI layer costs a Django process.
+
+Runs ``python -X importtime`` on a fresh interpreter that sets up Django and
+imports ``ai`` (what every manage.py command and web worker does through
+``api.views``), then on one that additionally imports torch and transformers
+(what the AI layer used to do at import time). Reports wall time, the
+cumulative import time of the top-level packages and peak RSS.
+
+    python -m benchmarks.startup_time --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.utils import print_table
+
+SETUP = (
+    "import os, django;"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings');"
+    "django.setup();"
+    "import ai, api.views;"
+)
+SCENARIOS = {
+    'lazy (current)': SETUP,
+    'eager torch+transformers': SETUP + "import torch, transformers;",
+}
+REPORT = (
+    "import resource, sys;"
+    "print('RSS', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss);"
+    "print('TORCH', 'torch' in sys.modules)"
+)
+TOP_LEVEL = ('django', 'rest_framework', 'openai', 'ai', 'api', 'torch', 'transformers')
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """Cumulative microseconds per top-level package from -X importtime output."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            cumulative = int(cumulative)
+        except ValueError:
+            continue
+        # Nested imports are indented in the module column; count a package
+        # wherever it is first imported.
+        name = name.strip()
+        if name in TOP_LEVEL:
+            totals[name] = max(totals.get(name, 0), cumulative)
+    return totals
+
+
+def _run(code: str) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code + REPORT],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    out = dict(line.split(' ', 1) for line in proc.stdout.splitlines() if ' ' in line)
+    rss_kb = int(out.get('RSS', 0))
+    return {
+        'wall': wall,
+        'rss_mb': rss_kb / (1024 * 1024) if sys.platform == 'darwin' else rss_kb / 1024,
+        'torch_loaded': out.get('TORCH') == 'True',
+        'imports': _parse_importtime(proc.stderr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for label, code in SCENARIOS.items():
+        runs = [_run(code) for _ in range(args.runs)]
+        row = {
+            'scenario': label,
+            'wall_s': round(statistics.median(r['wall'] for r in runs), 3),
+            'peak_rss_mb': round(statistics.median(r['rss_mb'] for r in runs)),
+            'torch_loaded': runs[-1]['torch_loaded'],
+        }
+        for name in TOP_LEVEL:
+            values = [r['imports'].get(name, 0) for r in runs]
+            row[f'{name}_ms'] = round(statistics.median(values) / 1000)
+        rows.append(row)
+
+    print_table(rows, ['scenario', 'wall_s', 'peak_rss_mb', 'torch_loaded']
+                + [f'{name}_ms' for name in TOP_LEVEL])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare summarizer inference backends on CPU.
+
+For every backend reports load time, latency per chunk, throughput and how
+close the summaries are to the stock PyTorch pipeline (mean output length
+ratio and share of identical outputs). Each backend runs in its own process.
+
+    python -m benchmarks.summarizer_backends --backends pytorch quantized onnx
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.utils import (
+    peak_rss_mb, print_table, run_isolated, sample_text, setup_django
+)
+
+
+def _run(backend, chunks):
+    setup_django()
+    from ai.services import get_summarizer, summarize_chunks
+
+    started = time.perf_counter()
+    summarizer = get_summarizer(backend)
+    load_seconds = time.perf_counter() - started
+
+    latencies, outputs = [], []
+    for chunk in chunks:
+        started = time.perf_counter()
+        outputs.extend(summarize_chunks([chunk], summarizer=summarizer, mode='threaded'))
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        'backend': backend,
+        'load_s': round(load_seconds, 1),
+        'ms/chunk': round(statistics.mean(latencies) * 1000),
+        'p95_ms': round(sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000),
+        'chunks/sec': round(len(chunks) / sum(latencies), 3),
+        'peak_rss_mb': round(peak_rss_mb()),
+        'outputs': outputs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['pytorch', 'quantized', 'onnx'])
+    parser.add_argument('--chunks', type=int, default=8)
+    args = parser.parse_args()
+
+    paragraphs = sample_text(paragraphs=args.chunks * 2).split('\n\n')
+    chunks = ['\n\n'.join(paragraphs[i:i + 2]) for i in range(0, len(paragraphs), 2)][:args.chunks]
+
+    backends = ['pytorch'] + [b for b in args.backends if b != 'pytorch']
+    rows = [run_isolated(_run, backend, chunks) for backend in backends]
+
+    baseline = rows[0]['outputs']
+    for row in rows:
+        outputs = row.pop('outputs')
+        ratios = [len(o.split()) / max(1, len(b.split())) for o, b in zip(outputs, baseline)]
+        row['len_ratio'] = round(statistics.mean(ratios), 3)
+        row['identical'] = f"{sum(o == b for o, b in zip(outputs, baseline))}/{len(outputs)}"
+
+    print_table(rows, ['backend', 'load_s', 'ms/chunk', 'p95_ms', 'chunks/sec',
+                       'peak_rss_mb', 'len_ratio', 'identical'])
+
+
+if __name__ == '__main__':
+    main()
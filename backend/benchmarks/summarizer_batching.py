@@ -0,0 +1,54 @@
+"""Compare thread-per-chunk and batched BART summarization.
+
+Reports chunks/sec and peak RSS for each mode. Every mode runs in its own
+process so the model load and peak memory of one run do not leak into the
+next one.
+
+    python -m benchmarks.summarizer_batching --chunks 16 --batch-sizes 4 8 16
+"""
+import argparse
+import textwrap
+import time
+
+from benchmarks.utils import (
+    peak_rss_mb, print_table, run_isolated, sample_text, setup_django
+)
+
+
+def _run(mode, chunks, batch_size):
+    setup_django()
+    from ai.services import get_summarizer, summarize_chunks
+
+    summarizer = get_summarizer()
+    # Warm up so the timing excludes model load and first-call allocations
+    summarize_chunks(chunks[:1], summarizer=summarizer, mode=mode, batch_size=batch_size)
+
+    started = time.perf_counter()
+    results = summarize_chunks(chunks, summarizer=summarizer, mode=mode, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    return {
+        'mode': mode if mode == 'threaded' else f'batched({batch_size})',
+        'chunks': len(results),
+        'seconds': round(elapsed, 2),
+        'chunks/sec': round(len(results) / elapsed, 3),
+        'peak_rss_mb': round(peak_rss_mb()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=16)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[4, 8])
+    args = parser.parse_args()
+
+    text = sample_text(paragraphs=args.chunks * 2)
+    chunks = textwrap.wrap(text, width=1024)[:args.chunks]
+
+    rows = [run_isolated(_run, 'threaded', chunks, None)]
+    for batch_size in args.batch_sizes:
+        rows.append(run_isolated(_run, 'batched', chunks, batch_size))
+    print_table(rows, ['mode', 'chunks', 'seconds', 'chunks/sec', 'peak_rss_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Helpers shared by the benchmark scripts.
+
+Benchmarks are run from the backend directory, e.g.::
+
+    python -m benchmarks.summarizer_batching
+"""
+import os
+import sys
+import multiprocessing
+
+
+def setup_django():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of the current process in megabytes."""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+
+def run_isolated(target, *args):
+    """Run ``target(*args)`` in a fresh process and return its result.
+
+    Each measurement gets its own process so peak RSS numbers are not
+    polluted by whatever ran before it.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(target, args)
+
+
+def sample_text(paragraphs: int = 40, seed: int = 0) -> str:
+    """Deterministic prose-like text for benchmarks that need course material."""
+    import random
+    rng = random.Random(seed)
+    words = (
+        "algorithm data structure memory process thread queue stack heap "
+        "function variable loop condition recursion complexity network "
+        "database index query transaction cache latency throughput model "
+        "student course lecture example problem solution test result"
+    ).split()
+    out = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(4, 9)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 22)))
+            sentences.append(sentence.capitalize() + ".")
+        out.append(" ".join(sentences))
+    return "\n\n".join(out)
+
+
+def synthetic_pdf(pages: int = 300, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """A text-only PDF of ``pages`` pages filled with ``sample_text`` prose."""
+    import textwrap
+    words = sample_text(paragraphs=pages * 2, seed=seed)
+    lines = textwrap.wrap(words.replace("\n\n", " "), 90)
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % i for i in page_ids), pages),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for index, page_id in enumerate(page_ids):
+        start = (index * lines_per_page) % max(len(lines) - lines_per_page, 1)
+        text = b"".join(b"(%s) '\n" % line.encode('latin-1') for line in lines[start:start + lines_per_page])
+        stream = b"BT /F1 10 Tf 12 TL 40 800 Td\n" + text + b"ET"
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (page_id + 1))
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offsets[number] for number in sorted(objects))
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def print_table(rows: list, columns: list):
+    widths = [max(len(str(c)), *(len(str(r.get(c, ''))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(row.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Without a worker pool, background jobs run on threads of the web process;
+# with AI_INLINE_JOB_RECOVERY, pick up the ones a previous process left
+# unfinished
+from ai.jobs import start_inline_recovery  # noqa: E402
+
+start_inline_recovery()
@@ -209,3 +209,191 @@ CLEANUP_KEEP_EMPTY_FOLDERS = True
 # AWS_S3_OBJECT_PARAMETERS = {
 #     'CacheControl': 'max-age=86400',
 # }
+
+# AI settings
+# Summarization models stay loaded per worker process and are reused across
+# requests; they are unloaded after AI_MODEL_IDLE_TTL seconds without use or
+# when loading another model would exceed AI_MODEL_MEMORY_BUDGET_MB.
+AI_MODEL_MEMORY_BUDGET_MB = 4096
+AI_MODEL_IDLE_TTL = 15 * 60
+# "batched" feeds lists of chunks to the summarizer, "threaded" runs one
+# pipeline call per chunk across a small thread pool.
+SUMMARIZER_MODE = 'batched'
+SUMMARIZER_BATCH_SIZE = 8
+# Summary length and sampling. A chunk's summary is at least
+# SUMMARY_MIN_LENGTH_RATIO of its word count, clamped to
+# [SUMMARY_MIN_LENGTH, SUMMARY_MAX_MIN_LENGTH] tokens. These are part of the
+# summary cache keys, so changing them regenerates summaries.
+SUMMARY_MIN_LENGTH = 30
+SUMMARY_MAX_MIN_LENGTH = 142
+SUMMARY_MIN_LENGTH_RATIO = 0.81
+SUMMARY_DO_SAMPLE = False
+# Document and chunk summaries are cached in the database by content hash;
+# the least recently used entries are dropped beyond the limit.
+SUMMARY_CACHE_ENABLED = True
+SUMMARY_CACHE_MAX_ENTRIES = 20000
+# Summarizer inference backend: "pytorch" (stock model), "quantized" (int8
+# dynamic quantization, CPU) or "onnx" (ONNX Runtime, CPU; needs
+# optimum[onnxruntime], the export is cached in SUMMARIZER_ONNX_DIR).
+SUMMARIZER_BACKEND = 'pytorch'
+SUMMARIZER_ONNX_DIR = BASE_DIR / 'ai_models' / 'onnx'
+
+# Background AI jobs
+# Material ingestion is queued in the BackgroundJob table. With
+# SUMMARY_QUEUE_ENABLED the jobs are executed by
+# `python manage.py run_ai_workers` instead of inside the web process.
+SUMMARY_QUEUE_ENABLED = False
+AI_WORKERS = 2
+AI_JOB_TIMEOUT = 30 * 60
+AI_JOB_MAX_ATTEMPTS = 3
+AI_JOB_HEARTBEAT = 15
+AI_JOB_STALE_AFTER = 120
+# Without the worker pool jobs run on at most AI_INLINE_JOB_WORKERS threads
+# of each web process, and a failed job is retried there after
+# AI_JOB_RETRY_DELAY seconds per attempt made. AI_INLINE_JOB_RECOVERY makes
+# web processes also resume jobs that a stopped process left unfinished.
+AI_INLINE_JOB_WORKERS = 2
+AI_INLINE_JOB_RECOVERY = False
+AI_JOB_RETRY_DELAY = 5
+AI_JOB_POLL_INTERVAL = 2
+
+# Hierarchical summaries: after the chunk-by-chunk summary, materials are
+# re-summarized in rounds until they fit SUMMARY_TOKEN_BUDGET tokens. Every
+# level is stored, and question/code generation pick the most detailed level
+# that fits their own budget.
+SUMMARY_HIERARCHICAL = True
+SUMMARY_TOKEN_BUDGET = 4000
+SUMMARY_MAX_LEVELS = 5
+QUESTION_SUMMARY_BUDGET_TOKENS = 16000
+CODE_SUMMARY_BUDGET_TOKENS = 8000
+
+# LLM client
+# One pooled client is shared by all threads of a process; connections are
+# kept alive between calls.
+LLM_BASE_URL = "https://api.deepseek.com"
+LLM_TIMEOUT = 120
+LLM_CONNECT_TIMEOUT = 10
+LLM_TIMEOUTS = {
+    'grading': 30,
+    'generation': 180,
+    'summary': 120,
+}
+LLM_POOL_MAX_CONNECTIONS = 64
+LLM_POOL_MAX_KEEPALIVE = 32
+LLM_KEEPALIVE_EXPIRY = 60
+# Upper bound on concurrent LLM requests from the shared event loop of a
+# process (question generation and code summary fan-out).
+LLM_MAX_CONCURRENCY = 32
+
+# LLM rate limiting and resilience (ai/llm.py)
+# Limits are per process and should stay under the provider quota divided by
+# the number of processes calling it.
+LLM_REQUESTS_PER_MINUTE = 300
+LLM_TOKENS_PER_MINUTE = 500000
+# Consecutive provider failures before calls fail fast, and how long to wait
+# before letting a trial call through.
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_SECONDS = 30
+# Retry budget per call site. 'purpose' selects the LLM_TIMEOUTS entry; grading
+# is interactive, so it retries less and gives up sooner.
+LLM_POLICIES = {
+    'question_generation': {'purpose': 'generation', 'max_retries': 3, 'expected_output_tokens': 1500},
+    'code_summary': {'purpose': 'generation', 'max_retries': 3, 'expected_output_tokens': 800},
+    'code_generation': {'purpose': 'generation', 'max_retries': 3, 'expected_output_tokens': 3000},
+    'open_grading': {'purpose': 'grading', 'max_retries': 1, 'max_delay': 5.0, 'expected_output_tokens': 10},
+    'code_grading': {'purpose': 'grading', 'max_retries': 1, 'max_delay': 5.0, 'expected_output_tokens': 300},
+    'batch_grading': {'purpose': 'grading', 'max_retries': 1, 'max_delay': 5.0, 'expected_output_tokens': 100},
+    'code_hint': {'purpose': 'grading', 'max_retries': 1, 'max_delay': 5.0, 'expected_output_tokens': 150},
+}
+
+# Open-answer grading cache (ai/grading_cache.py)
+# Grades are keyed by the normalized (reference, student) answer pair and
+# the prompt that graded it: GRADING_PROMPT_VERSION for single prompts,
+# BATCH_GRADING_PROMPT_VERSION for batches (ai/constants.py). Point the "grading" cache at a shared backend such
+# as Redis so every worker sees the same grades; LocMemCache is per process
+# and evicts the least recently used entries beyond MAX_ENTRIES.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'grading': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'grading',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+GRADING_CACHE_ENABLED = True
+GRADING_CACHE_ALIAS = 'grading'
+GRADING_CACHE_TTL = 7 * 24 * 60 * 60
+# "batched" grades up to GRADING_BATCH_SIZE open answers per LLM call, "single"
+# makes one call per answer.
+GRADING_MODE = 'batched'
+GRADING_BATCH_SIZE = 10
+# Open answers are pre-graded on the CPU by sentence-embedding similarity;
+# only answers between the two cosine thresholds, or whose reference answer
+# is shorter than GRADING_EMBEDDING_MIN_WORDS words, are sent to the LLM.
+GRADING_EMBEDDING_ENABLED = True
+GRADING_EMBEDDING_ACCEPT = 0.85
+GRADING_EMBEDDING_REJECT = 0.35
+GRADING_EMBEDDING_MIN_WORDS = 4
+
+# Coding exercises are graded by running the submission against the
+# problem's test cases in a sandboxed process (ai/sandbox), jailed in Linux
+# user, mount, network and PID namespaces. Hosts that do not allow
+# unprivileged user namespaces fall back to LLM grading. Limits apply per
+# submission; SANDBOX_WARM_WORKERS processes per language are kept started.
+SANDBOX_WARM_WORKERS = 2
+SANDBOX_MAX_CONCURRENCY = 4
+SANDBOX_CPU_SECONDS = 5
+SANDBOX_MEMORY_MB = 256
+SANDBOX_FILE_MB = 1
+SANDBOX_TEST_TIMEOUT = 2
+SANDBOX_WALL_TIMEOUT = 15
+# Size of the writable tmpfs the submission runs in
+SANDBOX_TMPFS_MB = 16
+# Working directories are created here; defaults to /dev/shm (tmpfs)
+SANDBOX_TMP_ROOT = None
+# Extra read-only paths for the jail, besides /usr, /lib* and the interpreter
+SANDBOX_READONLY_PATHS = []
+
+# Question generation streams the LLM reply and saves questions as their
+# lines complete, in bulk_create batches of QUESTION_STREAM_FLUSH_SIZE or
+# every QUESTION_STREAM_FLUSH_SECONDS, whichever comes first.
+QUESTION_STREAMING = True
+QUESTION_STREAM_FLUSH_SIZE = 20
+QUESTION_STREAM_FLUSH_SECONDS = 2
+
+# Coding problems are generated with one JSON-mode request per difficulty,
+# run concurrently, plus a top-up round for difficulties that came back
+# short. 'single' asks for every difficulty in one completion.
+CODE_GENERATION_MODE = 'parallel'
+
+# PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted by a process
+# pool in ranges of PDF_PARALLEL_PAGES_PER_TASK pages (file_manager/pdf.py).
+# PDF_PARALLEL_WORKERS defaults to the number of CPUs.
+PDF_PARALLEL_ENABLED = True
+PDF_PARALLEL_MIN_PAGES = 32
+PDF_PARALLEL_PAGES_PER_TASK = 25
+PDF_PARALLEL_WORKERS = None
+
+# PDF text extraction engines, tried in order until one succeeds: 'pypdf2',
+# 'pypdf', 'pdfminer' (pdfminer.six) or 'pypdfium2'. Only PyPDF2 is in the
+# requirements; install the others to use them. Compare them on your own
+# files with: python -m benchmarks.pdf_engines --corpus <dir>
+PDF_ENGINES = ['pypdf2']
+
+# Material ingestion streams the upload: pages are extracted, chunked and
+# summarized concurrently instead of one stage after the other. At most
+# SUMMARY_STREAM_WINDOW_CHUNKS chunks wait for the summarizer, and the
+# chunker holds at most SUMMARY_STREAM_WINDOW_CHARS characters of a paragraph
+# (None: four chunks' worth).
+SUMMARY_STREAMING = True
+SUMMARY_STREAM_WINDOW_CHUNKS = 16
+SUMMARY_STREAM_WINDOW_CHARS = None
+
+# Uploads are deduplicated by the SHA-256 of their bytes: a file that was
+# ingested before skips extraction and summarization, and its Material rows
+# share one MaterialContent (reference counted, deleted with the last one).
+# Stored content is only reused while PDF_ENGINES and the summarizer and
+# summary settings are unchanged.
+MATERIAL_DEDUP_ENABLED = True
@@ -1,148 +1,286 @@
+import codecs
+import io
+import mmap
 import os
+from contextlib import contextmanager
 from docx import Document
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from django.conf import settings
-from ai.services import generate_material_summary
-from PyPDF2 import PdfReader
+from file_manager import pdf
 from striprtf.striprtf import rtf_to_text
 
-def extract_text_from_docx(file_path):
+# Extractors take a path, a binary file-like object (an upload, a storage
+# file) or a bytes-like object. Files with a descriptor are memory-mapped
+# and bytes-like objects are read in place, so no extra copy is made.
+TEXT_ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+# Plain text is streamed in pieces decoded from this many bytes
+TEXT_PIECE_BYTES = 1 << 16
+
+_extractors = {}
+_text_iterators = {}
+
+
+class ExtractionError(ValueError):
+    """The file could not be parsed, as opposed to read."""
+
+
+def register_extractor(*extensions):
+    """Decorator registering ``func(source) -> str`` for files with ``extensions``."""
+    def decorator(func):
+        for extension in extensions:
+            _extractors[extension.lower()] = func
+        return func
+    return decorator
+
+
+def get_extractor(extension):
+    return _extractors.get(extension.lower())
+
+
+def register_text_iterator(*extensions):
+    """Decorator registering a generator yielding the text of ``source`` in pieces.
+
+    ``''.join()`` of the pieces must equal what the extractor returns.
+    """
+    def decorator(func):
+        for extension in extensions:
+            _text_iterators[extension.lower()] = func
+        return func
+    return decorator
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def _is_buffer(source):
+    return isinstance(source, (bytes, bytearray, memoryview, mmap.mmap))
+
+
+def _unwrap(source):
+    # Django File/UploadedFile objects and tempfile wrappers keep the real
+    # file object in .file
+    while not isinstance(source, io.IOBase) and hasattr(source, 'file'):
+        source = source.file
+    return source
+
+
+def _source_name(source):
+    if _is_path(source):
+        return os.fspath(source)
+    return getattr(source, 'name', None) or type(source).__name__
+
+
+def _fileno(source):
     try:
-        doc = Document(file_path)
+        return source.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _byte_buffer(source):
+    """Yield the whole content of ``source`` as a bytes-like object."""
+    if _is_buffer(source):
+        yield source
+        return
+    if _is_path(source):
+        with open(source, 'rb') as file:
+            with _byte_buffer(file) as buffer:
+                yield buffer
+        return
+
+    source = _unwrap(source)
+    fileno = _fileno(source)
+    if fileno is not None:
+        if os.fstat(fileno).st_size == 0:
+            yield b""
+        else:
+            with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+    elif isinstance(source, io.BytesIO):
+        with source.getbuffer() as view:
+            yield view
+    else:
+        # Remote storage files: one read is the only copy
+        source.seek(0)
+        yield source.read()
+
+
+@contextmanager
+def _binary_stream(source):
+    """Yield a seekable binary stream (or a path) for parsers that need one."""
+    if _is_path(source):
+        yield source
+    elif _is_buffer(source):
+        with io.BufferedReader(pdf.BufferReader(source)) as stream:
+            yield stream
+    else:
+        source = _unwrap(source)
+        source.seek(0)
+        yield source
+
+
+def _decode(buffer, name):
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return str(buffer, encoding)
+        except UnicodeDecodeError:
+            continue
+    print(f"Failed to decode {name} with common encodings")
+    return ""
+
+
+def _text_encoding(buffer, encodings):
+    # Validate the whole buffer before anything is yielded
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            for start in range(0, len(buffer), TEXT_PIECE_BYTES):
+                decoder.decode(buffer[start:start + TEXT_PIECE_BYTES])
+            decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _iter_decoded(source, encodings):
+    with _byte_buffer(source) as buffer:
+        encoding = _text_encoding(buffer, encodings)
+        if encoding is None:
+            print(f"Failed to decode {_source_name(source)} with {', '.join(encodings)}")
+            return
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for start in range(0, len(buffer), TEXT_PIECE_BYTES):
+            piece = decoder.decode(buffer[start:start + TEXT_PIECE_BYTES])
+            if piece:
+                yield piece
+        piece = decoder.decode(b"", final=True)
+        if piece:
+            yield piece
+
+
+@register_text_iterator('.txt')
+def iter_text_from_txt(source):
+    return _iter_decoded(source, TEXT_ENCODINGS)
+
+
+@register_text_iterator('.md')
+def iter_text_from_markdown(source):
+    return _iter_decoded(source, ['utf-8'])
+
+
+@register_text_iterator('.docx')
+def iter_text_from_docx(source):
+    with _binary_stream(source) as stream:
+        doc = Document(stream)
+    for index, para in enumerate(doc.paragraphs):
+        yield '\n' + para.text if index else para.text
+
+
+@register_text_iterator('.pdf')
+def iter_text_from_pdf(source):
+    with _binary_stream(source) as stream:
+        yield from pdf.iter_text(stream)
+
+
+@register_extractor('.docx')
+def extract_text_from_docx(source):
+    try:
+        with _binary_stream(source) as stream:
+            doc = Document(stream)
         full_text = []
         for para in doc.paragraphs:
             full_text.append(para.text)
         return '\n'.join(full_text)
     except Exception as e:
-        print(f"Error extracting text from {file_path}: {e}")
+        print(f"Error extracting text from {_source_name(source)}: {e}")
         return ""
 
-def extract_text_from_txt(file_path):
+@register_extractor('.txt')
+def extract_text_from_txt(source):
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except UnicodeDecodeError:
-        encodings = ['latin-1', 'cp1252', 'iso-8859-1']
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as file:
-                    return file.read()
-            except UnicodeDecodeError:
-                continue
-        print(f"Failed to decode {file_path} with common encodings")
-        return ""
+        with _byte_buffer(source) as buffer:
+            return _decode(buffer, _source_name(source))
     except Exception as e:
-        print(f"Error extracting text from {file_path}: {e}")
+        print(f"Error extracting text from {_source_name(source)}: {e}")
         return ""
 
 
-def extract_text_from_pdf(file_path):
+@register_extractor('.pdf')
+def extract_text_from_pdf(source):
     try:
-        reader = PdfReader(file_path)
-        text = []
-        for page in reader.pages:
-            text.append(page.extract_text())
-        return '\n'.join(text)
+        with _binary_stream(source) as stream:
+            return pdf.extract_text(stream)
     except Exception as e:
-        print(f"Error extracting text from PDF {file_path}: {e}")
+        print(f"Error extracting text from PDF {_source_name(source)}: {e}")
         return ""
 
 
-def extract_text_from_markdown(file_path):
+@register_extractor('.md')
+def extract_text_from_markdown(source):
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+        with _byte_buffer(source) as buffer:
+            return str(buffer, 'utf-8')
     except Exception as e:
-        print(f"Error extracting text from Markdown {file_path}: {e}")
+        print(f"Error extracting text from Markdown {_source_name(source)}: {e}")
         return ""
 
 
-def extract_text_from_rtf(file_path):
+@register_extractor('.rtf')
+def extract_text_from_rtf(source):
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            rtf_content = file.read()
-            return rtf_to_text(rtf_content)
+        with _byte_buffer(source) as buffer:
+            rtf_content = str(buffer, 'utf-8')
+        return rtf_to_text(rtf_content)
     except Exception as e:
-        print(f"Error extracting text from RTF {file_path}: {e}")
+        print(f"Error extracting text from RTF {_source_name(source)}: {e}")
         return ""
 
-def extract_text(file_path):
-    if not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
+def _extension(source, filename):
+    name = filename or (os.fspath(source) if _is_path(source) else getattr(source, 'name', None))
+    if not name:
+        raise ValueError('A filename is needed to pick an extractor')
+    _, ext = os.path.splitext(name)
+    return ext.lower()
+
+
+def extract_text(source, filename=None):
+    """Extract the text of ``source``, picking the extractor by file extension.
+
+    ``source`` is a path, a file-like object or a bytes-like object. The
+    extension is taken from ``filename`` when given, otherwise from the path
+    or the object's ``name``.
+    """
+    if _is_path(source) and not os.path.exists(source):
+        print(f"File not found: {source}")
         return ""
-    
-    _, ext = os.path.splitext(file_path)
-    ext = ext.lower()
-    
-    extractors = {
-        '.docx': extract_text_from_docx,
-        '.txt': extract_text_from_txt,
-        '.pdf': extract_text_from_pdf,
-        '.md': extract_text_from_markdown,
-        '.rtf': extract_text_from_rtf
-    }
-
-    extractor = extractors.get(ext)
+
+    ext = _extension(source, filename)
+    extractor = get_extractor(ext)
     if extractor:
-        return extractor(file_path)
+        return extractor(source)
     else:
         raise ValueError(f'Unsupported file extension: {ext}')
 
 
-def process_material_file(file):
-    """Process uploaded material file and return extracted text and summary.
-    
-    Args:
-        file: Uploaded file object
-        
-    Returns:
-        tuple: (extracted_text, summarized_text)
-        
-    Raises:
-        ValueError: If file processing fails
+def iter_text(source, filename=None):
+    """Yield the text of ``source`` in pieces (pages, paragraphs, blocks) as it is extracted.
+
+    The pieces join to what ``extract_text`` returns. Formats without a
+    registered text iterator yield their whole text at once. Unlike
+    ``extract_text``, errors are raised rather than logged: ExtractionError
+    when the file cannot be parsed, and I/O errors as they are.
     """
+    ext = _extension(source, filename)
+    iterator = _text_iterators.get(ext)
     try:
-        print("Starting file processing in file_manager...")
-        # Save file temporarily
-        print(f"Saving temporary file: {file.name}")
-        file_path = default_storage.save(
-            f'temp_{file.name}', ContentFile(file.read()))
-        full_file_path = os.path.join(settings.MEDIA_ROOT, file_path)
-        print(f"File saved to: {full_file_path}")
-
-        try:
-            # Extract text from file
-            print("Extracting text from file...")
-            material = extract_text(full_file_path)
-            if not material:
-                raise ValueError('Could not extract text from file')
-            print(f"Text extracted successfully. Length: {len(material)}")
-
-            # Generate summary
-            try:
-                print("Generating summary...")
-                summarized_material = generate_material_summary(
-                    material=material)
-                print(
-                    f"Summary generated successfully. Length: {len(summarized_material)}")
-            except Exception as e:
-                print(f"Error generating summary: {str(e)}")
-                # Fallback summary if AI generation fails
-                print("Using fallback summary...")
-                summarized_material = material[:500] + "..."
-                print(
-                    f"Fallback summary created. Length: {len(summarized_material)}")
-
-            return material, summarized_material
-
-        finally:
-            # Clean up temp file
-            print("Cleaning up temporary file...")
-            if os.path.exists(full_file_path):
-                os.remove(full_file_path)
-                print("Temporary file removed")
-
+        if iterator:
+            yield from iterator(source)
+        elif get_extractor(ext):
+            yield get_extractor(ext)(source)
+        else:
+            raise ValueError(f'Unsupported file extension: {ext}')
+    except (OSError, MemoryError):
+        raise
     except Exception as e:
-        print(f"Error in process_material_file: {str(e)}")
-        raise ValueError(f'Error processing file: {str(e)}')
+        raise ExtractionError(f"Could not extract text from {_source_name(source)}: {e}") from e
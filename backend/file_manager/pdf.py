@@ -0,0 +1,383 @@
+"""PDF text extraction through pluggable engines, split across worker processes.
+
+The engines are tried in PDF_ENGINES order and the next one is used when an
+engine is not installed, cannot open the document or fails on every page:
+
+- ``pypdf2``: PyPDF2, pure Python (the default).
+- ``pypdf``: pypdf, PyPDF2's maintained successor.
+- ``pdfminer``: pdfminer.six, layout analysis; slowest, best reading order.
+- ``pypdfium2``: PDFium bindings, native code.
+
+Text extraction is CPU work, so documents with at least
+PDF_PARALLEL_MIN_PAGES pages are cut into ranges of PDF_PARALLEL_PAGES_PER_TASK
+pages and extracted by a process pool sized to the cores. Workers open the
+document themselves: from its path when it is a file on disk, otherwise from
+a shared memory copy of its bytes. Text is joined in page order, and a page
+that fails to extract is left empty instead of failing the whole document.
+
+Engines are imported on first use, and this module only imports
+django.conf, so worker processes start without setting up Django.
+"""
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+from django.conf import settings
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only stream over a bytes-like object, without copying it."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        chunk = self._view[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class PdfDocument:
+    """An open PDF read through one engine."""
+
+    page_count = 0
+
+    def page_text(self, number: int) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _PyPDF2Document(PdfDocument):
+    def __init__(self, stream):
+        self._reader = self._reader_class()(stream)
+        self.page_count = len(self._reader.pages)
+
+    def _reader_class(self):
+        from PyPDF2 import PdfReader
+        return PdfReader
+
+    def page_text(self, number):
+        return self._reader.pages[number].extract_text() or ""
+
+
+class _PypdfDocument(_PyPDF2Document):
+    def _reader_class(self):
+        from pypdf import PdfReader
+        return PdfReader
+
+
+class _PdfminerDocument(PdfDocument):
+    def __init__(self, stream):
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.utils import open_filename
+
+        self._stream = stream
+        with open_filename(stream, 'rb') as file:
+            self.page_count = sum(1 for _ in PDFPage.get_pages(file))
+
+    def page_text(self, number):
+        from pdfminer.high_level import extract_text
+        return extract_text(self._stream, page_numbers=[number]).rstrip('\f')
+
+
+class _PdfiumDocument(PdfDocument):
+    def __init__(self, stream):
+        import pypdfium2
+        self._pdf = pypdfium2.PdfDocument(stream)
+        self.page_count = len(self._pdf)
+
+    def page_text(self, number):
+        page = self._pdf[number]
+        try:
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_range()
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+
+    def close(self):
+        self._pdf.close()
+
+
+PDF_ENGINES = {
+    'pypdf2': _PyPDF2Document,
+    'pypdf': _PypdfDocument,
+    'pdfminer': _PdfminerDocument,
+    'pypdfium2': _PdfiumDocument,
+}
+
+
+def get_engine_names() -> list:
+    engines = getattr(settings, 'PDF_ENGINES', None) or ['pypdf2']
+    unknown = [engine for engine in engines if engine not in PDF_ENGINES]
+    if unknown:
+        raise ValueError(
+            f"Unknown PDF_ENGINES {unknown}. Choose from: {', '.join(PDF_ENGINES)}")
+    return list(engines)
+
+
+def open_document(engine: str, stream) -> PdfDocument:
+    """Open ``stream`` (a path or a seekable binary stream) with ``engine``."""
+    return PDF_ENGINES[engine](stream)
+
+
+def _page_text(document, number):
+    try:
+        return document.page_text(number), None
+    except Exception as e:
+        return "", f"{type(e).__name__}: {e}"
+
+
+def _extract_pages(document, start, stop):
+    return [_page_text(document, number) for number in range(start, stop)]
+
+
+def extract_page_range(location, engine, start, stop):
+    """Worker entry point: ``[(text, error), ...]`` for pages ``start`` to ``stop - 1``.
+
+    ``location`` is ``('path', path)`` or ``('shm', (name, size))``.
+    """
+    kind, value = location
+    if kind == 'path':
+        document = open_document(engine, value)
+        try:
+            return _extract_pages(document, start, stop)
+        finally:
+            document.close()
+
+    name, size = value
+    memory = shared_memory.SharedMemory(name=name)
+    view = memory.buf[:size]
+    try:
+        with io.BufferedReader(BufferReader(view)) as stream:
+            document = open_document(engine, stream)
+            try:
+                return _extract_pages(document, start, stop)
+            finally:
+                document.close()
+    finally:
+        view.release()
+        memory.close()
+
+
+def _file_path(stream):
+    if isinstance(stream, (str, os.PathLike)):
+        return os.fspath(stream)
+    name = getattr(stream, 'name', None)
+    if isinstance(name, str) and os.path.isabs(name) and os.path.isfile(name):
+        return name
+    return None
+
+
+@contextmanager
+def _worker_location(stream):
+    """Where workers can open ``stream``: its path, or a shared memory copy."""
+    path = _file_path(stream)
+    if path:
+        yield ('path', path)
+        return
+
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(0)
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        view = memory.buf[:size]
+        try:
+            filled = 0
+            while filled < size:
+                read = stream.readinto(view[filled:])
+                if not read:
+                    break
+                filled += read
+        finally:
+            view.release()
+        yield ('shm', (memory.name, size))
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+_pool = {'instance': None, 'pid': None}
+_pool_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return getattr(settings, 'PDF_PARALLEL_WORKERS', None) or os.cpu_count() or 1
+
+
+def _start_method() -> str:
+    # Workers must not be forked from the threaded web process; forkserver
+    # is not available on Windows, where spawn is the only choice
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return 'forkserver'
+    return 'spawn'
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return this process's extraction pool, creating it on first use."""
+    with _pool_lock:
+        if _pool['instance'] is None or _pool['pid'] != os.getpid():
+            _pool.update(
+                instance=ProcessPoolExecutor(
+                    max_workers=_worker_count(),
+                    mp_context=multiprocessing.get_context(_start_method()),
+                ),
+                pid=os.getpid(),
+            )
+        return _pool['instance']
+
+
+def shutdown_pool():
+    with _pool_lock:
+        pool, _pool['instance'] = _pool['instance'], None
+    if pool is not None and _pool['pid'] == os.getpid():
+        pool.shutdown(cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+def _iter_parallel(stream, document, engine):
+    page_count = document.page_count
+    per_task = max(getattr(settings, 'PDF_PARALLEL_PAGES_PER_TASK', 25), 1)
+    ranges = [(start, min(start + per_task, page_count)) for start in range(0, page_count, per_task)]
+    # Ranges are submitted a few at a time so finished pages don't pile up
+    # ahead of a slow consumer
+    in_flight = _worker_count() * 2
+
+    with _worker_location(stream) as location:
+        try:
+            pool = get_pool()
+        except (RuntimeError, ValueError, OSError) as e:
+            print(f"PDF extraction pool unavailable, extracting in-process: {e}")
+            pool = None
+        pending = deque()
+        submitted = 0
+        for start, stop in ranges:
+            while pool is not None and submitted < len(ranges) and len(pending) < in_flight:
+                try:
+                    pending.append(pool.submit(extract_page_range, location, engine, *ranges[submitted]))
+                    submitted += 1
+                except (BrokenProcessPool, RuntimeError, OSError) as e:
+                    print(f"PDF extraction pool unavailable, extracting in-process: {e}")
+                    shutdown_pool()
+                    pool = None
+
+            pages = None
+            if pending:
+                try:
+                    pages = pending.popleft().result()
+                except BrokenProcessPool as e:
+                    print(f"PDF extraction worker died: {e}")
+                    shutdown_pool()
+                    pool = None
+                except Exception as e:
+                    print(f"Error extracting PDF pages {start + 1}-{stop}: {e}")
+            if pool is None:
+                # Once the pool is gone every remaining range runs here
+                pending.clear()
+                submitted = len(ranges)
+            # Ranges a worker could not deliver are extracted here instead
+            yield from pages if pages is not None else _extract_pages(document, start, stop)
+
+
+def iter_pages(engine: str, stream):
+    """Yield ``(text, error)`` for every page of the PDF, in order, read with ``engine``."""
+    if not isinstance(stream, (str, os.PathLike)):
+        stream.seek(0)
+    document = open_document(engine, stream)
+    try:
+        parallel = (
+            getattr(settings, 'PDF_PARALLEL_ENABLED', True)
+            and document.page_count >= getattr(settings, 'PDF_PARALLEL_MIN_PAGES', 32)
+            and _worker_count() > 1
+        )
+        if parallel:
+            yield from _iter_parallel(stream, document, engine)
+        else:
+            for number in range(document.page_count):
+                yield _page_text(document, number)
+    finally:
+        document.close()
+
+
+def extract_pages(engine: str, stream) -> list:
+    """``[(text, error), ...]`` for every page of the PDF, read with ``engine``."""
+    return list(iter_pages(engine, stream))
+
+
+def iter_text(stream):
+    """Yield the text of the PDF in ``stream`` page by page, as pages are extracted.
+
+    The pieces join to the same text as ``extract_text``. Nothing is yielded
+    until a page extracts successfully, so an engine that fails to open the
+    document or fails on every page can still be replaced by the next one.
+    """
+    engines = get_engine_names()
+    for index, engine in enumerate(engines):
+        last = index == len(engines) - 1
+        total, failed, started = 0, [], False
+        try:
+            for text, error in iter_pages(engine, stream):
+                total += 1
+                if error:
+                    failed.append((total, error))
+                    if not started:
+                        continue
+                if started:
+                    yield '\n' + text
+                else:
+                    # Pages that failed before this one each add a line break
+                    started = True
+                    yield '\n' * (total - 1) + text
+        except Exception as e:
+            if started or last:
+                raise
+            print(f"PDF engine '{engine}' failed, trying '{engines[index + 1]}': {e}")
+            continue
+
+        if not started and total and not last:
+            print(f"PDF engine '{engine}' failed on every page, trying '{engines[index + 1]}'")
+            continue
+        if not started and total:
+            yield '\n' * (total - 1)
+        if failed:
+            print(f"Could not extract text from {len(failed)} of {total} PDF pages with "
+                  f"'{engine}' (first: page {failed[0][0]}, {failed[0][1]})")
+        return
+
+
+def extract_text(stream) -> str:
+    """Text of every page of the PDF in ``stream`` (a path or a seekable binary stream)."""
+    return ''.join(iter_text(stream))
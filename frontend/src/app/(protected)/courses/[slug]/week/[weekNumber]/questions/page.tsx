@@ -122,95 +122,40 @@ export default function WeekQuestions() {
   };
 
   const handleSubmit = async () => {
-    let correct = 0;
     const results: Record<number, "correct" | "incorrect"> = {};
 
-    const openQuestions = [];
-    const newExplanations: Record<number, string> = {};
-
-    for (const q of questions) {
-      if (q.question_type === "open") {
-        openQuestions.push({
-          id: q.id,
-          user_answer: userAnswers[q.id] || "",
-          answer: q.answer,
-        });
-      } else {
-        const userAnswer = userAnswers[q.id] || [];
-        const correctAnswer = q.answer;
-
-        const normalizedUserAnswer = userAnswer
-          .map((a) => a.trim().toLowerCase())
-          .sort()
-          .join(",");
-
-        const normalizedCorrectAnswer = correctAnswer
-          .split("|")
-          .map((a) => a.trim().toLowerCase())
-          .sort()
-          .join(",");
-
-        if (normalizedUserAnswer === normalizedCorrectAnswer) {
-          correct += 1;
-          results[q.id] = "correct";
-        } else {
-          results[q.id] = "incorrect";
-        }
-      }
-    }
-
-    console.log(openQuestions);
-
-    if (openQuestions.length > 0) {
-      try {
-        setLoading(true);
-        const response = await api.post(
-          `/courses/${slug}/weeks/${weekNumber}/quizzes/evaluate_open_questions/`,
-          openQuestions
-        );
+    // Closed questions are graded on the server without the LLM; the score
+    // is computed and saved in the same request.
+    const answers = questions.map((q) => ({
+      id: q.id,
+      user_answer:
+        q.question_type === "open"
+          ? userAnswers[q.id] || ""
+          : userAnswers[q.id] || [],
+    }));
 
-        console.log(response.data);
-
-        const openResults = await response.data;
-        for (const item of openResults) {
-          console.log(item.is_correct);
-          if (item.is_correct == "true") {
-            correct += 1;
-            results[item.id] = "correct";
-            console.log("correct");
-          } else {
-            results[item.id] = "incorrect";
-            console.log("incorrect");
-          }
-          if (item.explanation) {
-            newExplanations[item.id] = item.explanation;
-          }
-        }
-      } catch (error) {
-        console.error("Error evaluating open questions:", error);
+    let percentage = 0;
+    try {
+      setLoading(true);
+      const response = await api.post(
+        `/courses/${slug}/weeks/${weekNumber}/quizzes/${quizDifficulty}/grade/`,
+        { answers }
+      );
+      const data = response.data;
+      for (const item of data.results) {
+        results[item.id] = item.is_correct ? "correct" : "incorrect";
       }
+      percentage = data.score;
+    } catch (error) {
+      console.error("Error grading quiz:", error);
     }
 
-    const total = questions.length;
-    const percentage = (correct / total) * 100;
     if (percentage > 60) {
       setCompletedQuiz(true);
     }
     setScore(percentage);
     setAnswerResults(results);
-    setAnswerExplanations((prev) => ({ ...prev, ...newExplanations }));
-    console.log(results);
     setLoading(false);
-    console.log({ user_score: percentage });
-    try {
-      await api.put(
-        `/courses/${slug}/weeks/${weekNumber}/quizzes/${quizDifficulty}/set_user_score/`,
-        { user_score: percentage }
-      );
-      console.log("Score saved successfully");
-    } catch (err) {
-      console.error("Failed to save score:", err);
-    }
   };
   useEffect(() => {
     async function fetchSidebar() {
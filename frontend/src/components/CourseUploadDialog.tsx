@@ -3,6 +3,7 @@
 import { Dialog, Listbox, Transition } from "@headlessui/react";
 import { Fragment, useState } from "react";
 import api from "@/src/lib/axios";
+import { waitForMaterialJob } from "@/src/lib/materialJobs";
 import LoadingComponent from "./UploadLoadingComponent";
 
 interface UploadCourseDialogProps {
@@ -97,13 +98,16 @@ export default function UploadCourseDialog({
     try {
       setIsLoading(true);
       setLoadingMessage("Uploading material...");
-      await api.post(
+      const uploadResponse = await api.post(
         `/courses/${slug}/weeks/${selectedWeek}/materials/`,
         formData,
         {
           headers: { "Content-Type": "multipart/form-data" },
         }
       );
+      await waitForMaterialJob(slug, selectedWeek, uploadResponse.data.job_id, (job) =>
+        setLoadingMessage(`Processing material: ${job.stage || "queued"} (${job.progress}%)`)
+      );
 
       // Start both question generation and code generation in parallel
       setLoadingMessage("Generating quiz questions and coding challenges...");
@@ -3,6 +3,7 @@
 import { Dialog, Transition } from "@headlessui/react";
 import { Fragment, useState } from "react";
 import api from "@/src/lib/axios";
+import { waitForMaterialJob } from "@/src/lib/materialJobs";
 import LoadingComponent from "./UploadLoadingComponent";
 
 interface UploadWeekDialogProps {
@@ -77,13 +78,16 @@ export default function UploadWeekDialog({
     try {
       setIsLoading(true);
       setLoadingMessage("Uploading material...");
-      await api.post(
+      const uploadResponse = await api.post(
         `/courses/${slug}/weeks/${selectedWeek}/materials/`,
         formData,
         {
           headers: { "Content-Type": "multipart/form-data" },
         }
       );
+      await waitForMaterialJob(slug, selectedWeek, uploadResponse.data.job_id, (job) =>
+        setLoadingMessage(`Processing material: ${job.stage || "queued"} (${job.progress}%)`)
+      );
       setLoadingMessage("Generating quiz questions...");
       await api.post(`/courses/${slug}/weeks/${selectedWeek}/questions/`);
       setLoadingMessage("Creating quizes...");
@@ -0,0 +1,37 @@
+import api from "@/src/lib/axios";
+
+export interface MaterialJob {
+  job_id: number;
+  status: "Q" | "R" | "D" | "F";
+  status_display: string;
+  stage: string;
+  progress: number;
+  error: string;
+  material_id: number | null;
+}
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Material uploads return 202 with a job id; poll the job until the
+// material has been extracted, summarized and saved.
+export async function waitForMaterialJob(
+  slug: string,
+  weekNumber: number,
+  jobId: number,
+  onProgress?: (job: MaterialJob) => void,
+  intervalMs = 2000
+): Promise<MaterialJob> {
+  while (true) {
+    const { data } = await api.get<MaterialJob>(
+      `/courses/${slug}/weeks/${weekNumber}/materials/jobs/${jobId}/`
+    );
+    onProgress?.(data);
+    if (data.status === "D") {
+      return data;
+    }
+    if (data.status === "F") {
+      throw { response: { data: { detail: data.error || "Error processing material." } } };
+    }
+    await sleep(intervalMs);
+  }
+}